@@ -1,243 +1,282 @@
-from flask import Flask, render_template, request, jsonify
-import re
-from decimal import Decimal, ROUND_HALF_UP
-
-app = Flask(__name__)
-
-class RegrasPortabilidadeINSS:
-    def __init__(self):
-        # Bancos disponíveis para portabilidade
-        self.bancos = [
-            "Banco do Brasil", "Caixa Econômica Federal", "Bradesco", "Itaú", 
-            "Santander", "Banrisul", "Sicredi", "Sicoob", "BRB", "Bancoob",
-            "Cresol", "Unicred", "Ailos", "Sicredi Pioneira", "Sicoob Credisul",
-            "Sicredi Norte", "Sicredi Centro", "Sicredi Sul", "Sicoob Credisul",
-            "Sicredi Pioneira", "Sicoob Credisul", "Sicredi Norte", "Sicoob Centro"
-        ]
-        
-        # Regras de portabilidade baseadas no documento
-        self.regras = {
-            "idade_limite": 85,
-            "parcelas_minimas": {
-                "geral": 12,
-                "invalidez": 6
-            },
-            "bancos_bloqueados": ["BRB"],  # BRB não aceita portabilidade
-            "saldo_minimo": 500.00,
-            "troco_minimo": 100.00,
-            "taxa_maxima": 2.99
-        }
-        
-        # Regras específicas por banco
-        self.regras_bancos = {
-            "Banco do Brasil": {
-                "idade_maxima": 85,
-                "parcelas_minimas": 12,
-                "aceita_invalidez": True,
-                "taxa_padrao": 2.49
-            },
-            "Caixa Econômica Federal": {
-                "idade_maxima": 85,
-                "parcelas_minimas": 12,
-                "aceita_invalidez": True,
-                "taxa_padrao": 2.49
-            },
-            "Bradesco": {
-                "idade_maxima": 85,
-                "parcelas_minimas": 15,
-                "aceita_invalidez": True,
-                "taxa_padrao": 2.49
-            },
-            "Itaú": {
-                "idade_maxima": 85,
-                "parcelas_minimas": 15,
-                "aceita_invalidez": True,
-                "taxa_padrao": 2.49
-            },
-            "Santander": {
-                "idade_maxima": 85,
-                "parcelas_minimas": 12,
-                "aceita_invalidez": True,
-                "taxa_padrao": 2.49
-            },
-            "Banrisul": {
-                "idade_maxima": 85,
-                "parcelas_minimas": 12,
-                "aceita_invalidez": True,
-                "taxa_padrao": 2.49
-            },
-            "Sicredi": {
-                "idade_maxima": 85,
-                "parcelas_minimas": 12,
-                "aceita_invalidez": True,
-                "taxa_padrao": 2.49
-            },
-            "Sicoob": {
-                "idade_maxima": 85,
-                "parcelas_minimas": 12,
-                "aceita_invalidez": True,
-                "taxa_padrao": 2.49
-            }
-        }
-
-    def validar_dados(self, dados):
-        """Valida os dados de entrada"""
-        erros = []
-        
-        if not dados.get('nome') or len(dados['nome'].strip()) < 3:
-            erros.append("Nome deve ter pelo menos 3 caracteres")
-            
-        if not dados.get('cpf') or not self.validar_cpf(dados['cpf']):
-            erros.append("CPF inválido")
-            
-        idade = dados.get('idade')
-        if not idade or not str(idade).isdigit() or int(idade) < 18 or int(idade) > 120:
-            erros.append("Idade deve ser entre 18 e 120 anos")
-            
-        if not dados.get('codigo_beneficio'):
-            erros.append("Código do benefício é obrigatório")
-            
-        parcelas = dados.get('parcelas_pagas')
-        if not parcelas or not str(parcelas).isdigit() or int(parcelas) < 0:
-            erros.append("Quantidade de parcelas pagas deve ser um número positivo")
-            
-        if not dados.get('banco_atual'):
-            erros.append("Banco atual é obrigatório")
-            
-        try:
-            valor_parcela = Decimal(str(dados.get('valor_parcela', 0)))
-            if valor_parcela <= 0:
-                erros.append("Valor da parcela deve ser maior que zero")
-        except:
-            erros.append("Valor da parcela inválido")
-            
-        try:
-            saldo_devedor = Decimal(str(dados.get('saldo_devedor', 0)))
-            if saldo_devedor <= 0:
-                erros.append("Saldo devedor deve ser maior que zero")
-        except:
-            erros.append("Saldo devedor inválido")
-            
-        try:
-            valor_total = Decimal(str(dados.get('valor_total', 0)))
-            if valor_total <= 0:
-                erros.append("Valor total deve ser maior que zero")
-        except:
-            erros.append("Valor total inválido")
-            
+from flask import Flask, Response, current_app, request, jsonify, stream_with_context
+import io
+import time
+
+import estaticos
+import exportacao
+import historico
+import instrumentacao
+import limite_taxa
+import lote
+import memoria
+import projecao
+import ranking
+import serializacao
+import servico
+import simulacao
+from config import LOTE_CONFIG, PERFORMANCE_CONFIG, REGRAS_CONFIG
+from fonte_regras import ObservadorRegras
+from validacao import validar_consulta, validar_cpf
+
+# O motor de regras fica em regras_portabilidade (sem Flask); os nomes
+# continuam disponíveis aqui para quem já importava de app
+from regras_portabilidade import (  # noqa: F401
+    REGRA_BANCO_PADRAO, RegrasPortabilidadeINSS, TabelaRegras, catalogo_do_conjunto
+)
+
+
+def create_app(regras=None, servicos=None):
+    """Cria a aplicação web com o motor de regras e os serviços de apoio
+
+    `servicos=False` não inicia log, histórico nem observador de regras (ex.:
+    benchmarks); o padrão é iniciá-los aqui, exceto com preload.
+    """
+    app = Flask(__name__)
+
+    # Métricas por requisição
+    instrumentacao.configurar_metricas(app)
+
+    # Limite por cliente antes de ocupar uma vaga (SECURITY_CONFIG['rate_limit'])
+    limitador = limite_taxa.configurar_limite(app)
+
+    # Limite de requisições simultâneas, prazo e compressão (PERFORMANCE_CONFIG)
+    servico.configurar_servico(app)
+
+    # script.js e style.css minificados e com hash (python estaticos.py)
+    ativos = estaticos.configurar_estaticos(app)
+
+    app.extensions['portabilidade'] = {
+        'regras': regras or RegrasPortabilidadeINSS(),
+        'limitador': limitador,
+        'estaticos': ativos,
+        'gravador_historico': None,
+        'leitor_historico': None
+    }
+
+    # Com preload, o master só monta o estado somente leitura; as threads e
+    # conexões são abertas em cada worker (post_fork do gunicorn.conf.py)
+    if servicos is None:
+        servicos = not PERFORMANCE_CONFIG['preload']
+    if servicos:
+        iniciar_servicos(app)
+
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/consultar', view_func=consultar, methods=['POST'])
+    app.add_url_rule('/consultar/lote', view_func=consultar_lote, methods=['POST'])
+    app.add_url_rule('/simular', view_func=simular, methods=['POST'])
+    app.add_url_rule('/exportar/<tipo>', view_func=exportar, methods=['POST'])
+    app.add_url_rule('/historico', view_func=consultar_historico)
+    app.add_url_rule('/metrics', view_func=metrics)
+    return app
+
+
+def iniciar_servicos(app):
+    """Inicia as threads e conexões da aplicação no processo atual
+
+    Threads não sobrevivem ao fork e conexões SQLite não podem ser usadas por
+    dois processos, por isso ficam fora do estado herdado do master.
+    """
+    estado = app.extensions['portabilidade']
+
+    # Log estruturado gravado em segundo plano
+    instrumentacao.configurar_log()
+
+    # Recarrega o arquivo de regras externo sem reiniciar os workers
+    if REGRAS_CONFIG['arquivo']:
+        ObservadorRegras(estado['regras']).start()
+
+    # Histórico das consultas, gravado em segundo plano
+    gravador_historico = historico.iniciar_gravador()
+    estado['gravador_historico'] = gravador_historico
+    estado['leitor_historico'] = historico.LeitorHistorico() if gravador_historico is not None else None
+    return app
+
+
+def _estado():
+    """Regras e serviços da aplicação atual"""
+    return current_app.extensions['portabilidade']
+
+
+def _ranking():
+    """(top, ordem, erros) dos parâmetros ?top=k&ordem=taxa da requisição"""
+    top = request.args.get('top')
+    ordem = request.args.get('ordem', 'catalogo')
+    if top is not None:
         try:
-            taxa = Decimal(str(dados.get('taxa', 0)))
-            if taxa < 0 or taxa > 100:
-                erros.append("Taxa deve ser entre 0 e 100%")
-        except:
-            erros.append("Taxa inválida")
-            
-        return erros
-
-    def validar_cpf(self, cpf):
-        """Valida formato do CPF"""
-        cpf = re.sub(r'[^0-9]', '', cpf)
-        if len(cpf) != 11:
-            return False
-        if cpf == cpf[0] * 11:
-            return False
-        return True
-
-    def consultar_portabilidade(self, dados):
-        """Consulta portabilidade baseada nas regras"""
-        resultados = []
-        
-        # Verificar se é benefício por invalidez
-        is_invalidez = "invalidez" in dados.get('codigo_beneficio', '').lower()
-        
-        for banco in self.bancos:
-            if banco in self.regras['bancos_bloqueados']:
-                continue
-                
-            # Aplicar regras específicas do banco
-            regras_banco = self.regras_bancos.get(banco, {
-                "idade_maxima": 85,
-                "parcelas_minimas": 12,
-                "aceita_invalidez": True,
-                "taxa_padrao": 2.49
-            })
-            
-            # Verificar idade
-            if int(dados['idade']) > regras_banco['idade_maxima']:
-                continue
-                
-            # Verificar parcelas mínimas
-            parcelas_minimas = regras_banco['parcelas_minimas']
-            if is_invalidez:
-                parcelas_minimas = self.regras['parcelas_minimas']['invalidez']
-                
-            if int(dados['parcelas_pagas']) < parcelas_minimas:
-                continue
-                
-            # Verificar se aceita invalidez
-            if is_invalidez and not regras_banco['aceita_invalidez']:
-                continue
-                
-            # Verificar saldo mínimo
-            if Decimal(str(dados['saldo_devedor'])) < self.regras['saldo_minimo']:
-                continue
-                
-            # Verificar troco mínimo
-            troco = Decimal(str(dados['valor_total'])) - Decimal(str(dados['saldo_devedor']))
-            if troco < self.regras['troco_minimo']:
-                continue
-                
-            # Determinar tipo de operação
-            tipo_operacao = "Portabilidade"
-            if troco > 0:
-                tipo_operacao = "Port+Refin"
-                
-            # Calcular taxa aplicável
-            taxa_aplicavel = min(regras_banco['taxa_padrao'], 
-                               Decimal(str(dados['taxa'])) + Decimal('0.5'))
-            
-            # Observações
-            observacoes = []
-            if is_invalidez:
-                observacoes.append("Benefício por invalidez")
-            if troco > 0:
-                observacoes.append(f"Refinanciamento de R$ {troco:.2f}")
-            if int(dados['parcelas_pagas']) >= parcelas_minimas + 5:
-                observacoes.append("Cliente com histórico positivo")
-                
-            resultados.append({
-                'banco': banco,
-                'tipo_operacao': tipo_operacao,
-                'taxa_aplicavel': float(taxa_aplicavel),
-                'observacoes': '; '.join(observacoes) if observacoes else "Regras atendidas"
-            })
-            
-        return resultados
-
-# Instância global das regras
-regras = RegrasPortabilidadeINSS()
-
-@app.route('/')
+            top = int(top)
+        except ValueError:
+            return None, ordem, ["Top deve ser um número inteiro positivo"]
+    return top, ordem, ranking.validar_ranking(top, ordem)
+
+
+_app_padrao = None
+
+
+def __getattr__(nome):
+    """`app.app` e `app.regras` só são criados no primeiro acesso"""
+    global _app_padrao
+    if nome in ('app', 'regras'):
+        if _app_padrao is None:
+            _app_padrao = create_app()
+        return _app_padrao if nome == 'app' else _app_padrao.extensions['portabilidade']['regras']
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
 def index():
-    return render_template('index.html', bancos=regras.bancos)
+    estado = _estado()
+    # Renderizada de novo só quando o catálogo de bancos muda
+    return estado['estaticos'].pagina_inicial(estado['regras'].catalogo)
 
-@app.route('/consultar', methods=['POST'])
 def consultar():
+    estado = _estado()
+    regras = estado['regras']
     dados = request.form.to_dict()
+
+    # ?formato=colunar devolve {campo: [valores]}; o padrão é uma lista de bancos
+    formato = request.args.get('formato', 'linhas')
+    if formato not in serializacao.FORMATOS:
+        return serializacao.resposta_json(
+            {'erro': True, 'mensagens': ["Formato deve ser linhas ou colunar"]}, 400)
+
+    # ?top=k&ordem=taxa devolve só os k bancos de menor taxa aplicável
+    top, ordem, erros_ranking = _ranking()
+    if erros_ranking:
+        return serializacao.resposta_json({'erro': True, 'mensagens': erros_ranking}, 400)
     
-    # Validar dados
-    erros = regras.validar_dados(dados)
+    # Validar dados (cada campo é convertido uma única vez)
+    inicio = time.perf_counter()
+    consulta, erros = validar_consulta(dados)
+    validado = time.perf_counter()
     if erros:
-        return jsonify({'erro': True, 'mensagens': erros})
+        resposta = serializacao.resposta_json({'erro': True, 'mensagens': erros})
+        instrumentacao.registrar_consulta(dados.get('cpf'), (
+            ('validar_dados', validado - inicio),
+            ('montar_resposta', time.perf_counter() - validado)
+        ), erros=erros)
+        return resposta
     
     # Consultar portabilidade
-    resultados = regras.consultar_portabilidade(dados)
+    resultados = regras.consultar_portabilidade(consulta, top, ordem)
+    consultado = time.perf_counter()
+
+    # ?projecao=1 acrescenta parcela, juros e CET por prazo (fora do histórico)
+    exibidos = resultados
+    if request.args.get('projecao') == '1':
+        exibidos = projecao.adicionar_projecoes([dict(resultado) for resultado in resultados],
+                                                consulta.valor_total)
     
-    return jsonify({
-        'erro': False,
-        'resultados': resultados,
-        'total_bancos': len(resultados)
-    })
+    resposta = serializacao.resposta_consulta(exibidos, formato)
+    if estado['gravador_historico'] is not None:
+        estado['gravador_historico'].registrar(consulta, resultados, regras.versao)
+    instrumentacao.registrar_consulta(consulta.cpf, (
+        ('validar_dados', validado - inicio),
+        ('consultar_portabilidade', consultado - validado),
+        ('montar_resposta', time.perf_counter() - consultado)
+    ), total_bancos=len(resultados))
+    return resposta
+
+def simular():
+    """Elegibilidade de um cliente em faixas de parcelas, valor total e taxa
+
+    Corpo JSON: {"cliente": {campos do formulário}, "faixas": {"parcelas_pagas":
+    {"de": 10, "ate": 40}, "valor_total": {"de": ..., "ate": ..., "passo": ...}}}
+    """
+    dados = request.get_json(silent=True)
+    if dados is None:
+        return serializacao.resposta_json(
+            {'erro': True, 'mensagens': ["Envie os dados da simulação em JSON"]}, 400)
+
+    consulta, pontos, erros = simulacao.ler_simulacao(dados)
+    if erros:
+        return serializacao.resposta_json({'erro': True, 'mensagens': erros})
+    return serializacao.resposta_json(simulacao.simular(_estado()['regras'], consulta, pontos))
+
+def _entrada_carteira():
+    """Registros da carteira enviada (arquivo 'arquivo' ou corpo da requisição)
+
+    Retorna (registros, None) ou (None, resposta de erro).
+    """
+    arquivo = request.files.get('arquivo')
+    if arquivo is not None:
+        fluxo, nome_arquivo, tipo = arquivo.stream, arquivo.filename, arquivo.mimetype
+    else:
+        fluxo, nome_arquivo, tipo = request.stream, None, request.mimetype
+
+    formato = request.args.get('formato') or lote.detectar_formato(nome_arquivo, tipo)
+    if formato not in lote.FORMATOS:
+        return None, (jsonify({'erro': True, 'mensagens': ["Formato deve ser csv ou jsonl"]}), 400)
+
+    entrada = io.TextIOWrapper(fluxo, encoding=LOTE_CONFIG['encoding'], newline='')
+    return lote.ler_registros(entrada, formato), None
+
+def consultar_lote():
+    """Consulta uma carteira de clientes enviada como CSV ou JSON lines"""
+    top, ordem, erros_ranking = _ranking()
+    if erros_ranking:
+        return jsonify({'erro': True, 'mensagens': erros_ranking}), 400
+
+    registros, erro = _entrada_carteira()
+    if erro is not None:
+        return erro
+
+    linhas = lote.consultar_lote(_estado()['regras'], registros, interromper=servico.prazo_esgotado,
+                                 top=top, ordem=ordem)
+    return Response(stream_with_context(linhas), mimetype='application/x-ndjson')
+
+def exportar(tipo):
+    """Exporta os bancos elegíveis de uma carteira em CSV ou XLSX (streaming)"""
+    if tipo not in exportacao.TIPOS:
+        return jsonify({'erro': True, 'mensagens': ["Exportação deve ser csv ou xlsx"]}), 404
+
+    top, ordem, erros_ranking = _ranking()
+    if erros_ranking:
+        return jsonify({'erro': True, 'mensagens': erros_ranking}), 400
+
+    registros, erro = _entrada_carteira()
+    if erro is not None:
+        return erro
+
+    conteudo = exportacao.exportar(_estado()['regras'], registros, tipo, interromper=servico.prazo_esgotado,
+                                   top=top, ordem=ordem)
+    resposta = Response(stream_with_context(conteudo), mimetype=exportacao.TIPOS[tipo])
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{exportacao.nome_arquivo(tipo)}"'
+    return resposta
+
+def consultar_historico():
+    """Consultas gravadas de um CPF (?cpf=) ou de um banco oferecido (?banco=)"""
+    leitor_historico = _estado()['leitor_historico']
+    if leitor_historico is None:
+        return jsonify({'erro': True, 'mensagens': ["Histórico desativado"]}), 404
+
+    dias = request.args.get('dias', type=int)
+    if dias is not None and dias <= 0:
+        return jsonify({'erro': True, 'mensagens': ["Dias deve ser um número inteiro positivo"]}), 400
+    # LIMIT negativo no SQLite é "sem limite": o mínimo é 1
+    limite = max(1, min(request.args.get('limite', 100, type=int), 1000))
+    if request.args.get('cpf'):
+        if not validar_cpf(request.args['cpf']):
+            return jsonify({'erro': True, 'mensagens': ["CPF inválido"]}), 400
+        consultas = leitor_historico.por_cpf(request.args['cpf'], dias, limite)
+    elif request.args.get('banco'):
+        consultas = leitor_historico.por_banco(request.args['banco'], dias, limite)
+    else:
+        return jsonify({'erro': True, 'mensagens': ["Informe cpf ou banco"]}), 400
+
+    return serializacao.resposta_json({'erro': False, 'consultas': consultas, 'total': len(consultas)})
+
+def metrics():
+    """Histogramas de latência e contadores no formato do Prometheus"""
+    estado = _estado()
+    regras, gravador_historico = estado['regras'], estado['gravador_historico']
+    medidas = {'log_descartados': instrumentacao.registros_descartados()}
+    if gravador_historico is not None:
+        medidas['historico_gravados'] = gravador_historico.gravados
+        medidas['historico_descartados'] = gravador_historico.descartados
+    if regras.cache is not None:
+        medidas.update((f"cache_{nome}", valor) for nome, valor in regras.cache.estatisticas().items())
+    # Memória deste worker: a compartilhada vem do master (preload)
+    medidas.update((f"memoria_{nome}_bytes", valor) for nome, valor in memoria.uso_memoria().items())
+    return Response(instrumentacao.metricas.exportar(medidas),
+                    mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark do motor de regras de portabilidade INSS
+Compara a tabela compilada com o laço interpretado banco a banco
+"""
+
+import argparse
+import csv
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+from regras_portabilidade import RegrasPortabilidadeINSS, REGRA_BANCO_PADRAO
+from config import BENCHMARK_CONFIG
+from validacao import normalizar_cpf, normalizar_cpfs, validar_consulta
+
+
+def consultar_interpretado(regras, dados):
+    """Versão interpretada (um laço por banco), usada como referência"""
+    resultados = []
+    is_invalidez = "invalidez" in dados.get('codigo_beneficio', '').lower()
+
+    for banco in regras.bancos:
+        if banco in regras.regras['bancos_bloqueados']:
+            continue
+
+        regras_banco = regras.regras_bancos.get(banco, REGRA_BANCO_PADRAO)
+
+        if int(dados['idade']) > regras_banco['idade_maxima']:
+            continue
+
+        parcelas_minimas = regras_banco['parcelas_minimas']
+        if is_invalidez:
+            parcelas_minimas = regras.regras['parcelas_minimas']['invalidez']
+
+        if int(dados['parcelas_pagas']) < parcelas_minimas:
+            continue
+
+        if is_invalidez and not regras_banco['aceita_invalidez']:
+            continue
+
+        if Decimal(str(dados['saldo_devedor'])) < regras.regras['saldo_minimo']:
+            continue
+
+        troco = Decimal(str(dados['valor_total'])) - Decimal(str(dados['saldo_devedor']))
+        if troco < regras.regras['troco_minimo']:
+            continue
+
+        tipo_operacao = "Portabilidade"
+        if troco > 0:
+            tipo_operacao = "Port+Refin"
+
+        taxa_aplicavel = min(regras_banco['taxa_padrao'],
+                             Decimal(str(dados['taxa'])) + Decimal('0.5'))
+
+        observacoes = []
+        if is_invalidez:
+            observacoes.append("Benefício por invalidez")
+        if troco > 0:
+            observacoes.append(f"Refinanciamento de R$ {troco:.2f}")
+        if int(dados['parcelas_pagas']) >= parcelas_minimas + 5:
+            observacoes.append("Cliente com histórico positivo")
+
+        resultados.append({
+            'banco': banco,
+            'tipo_operacao': tipo_operacao,
+            'taxa_aplicavel': float(taxa_aplicavel),
+            'observacoes': '; '.join(observacoes) if observacoes else "Regras atendidas"
+        })
+
+    return resultados
+
+
+def validar_interpretado(dados):
+    """Validação campo a campo anterior ao validacao.py, usada como referência"""
+    erros = []
+
+    if not dados.get('nome') or len(dados['nome'].strip()) < 3:
+        erros.append("Nome deve ter pelo menos 3 caracteres")
+
+    cpf = re.sub(r'[^0-9]', '', dados.get('cpf') or '')
+    if not dados.get('cpf') or len(cpf) != 11 or cpf == cpf[0] * 11:
+        erros.append("CPF inválido")
+
+    idade = dados.get('idade')
+    if not idade or not str(idade).isdigit() or int(idade) < 18 or int(idade) > 120:
+        erros.append("Idade deve ser entre 18 e 120 anos")
+
+    if not dados.get('codigo_beneficio'):
+        erros.append("Código do benefício é obrigatório")
+
+    parcelas = dados.get('parcelas_pagas')
+    if not parcelas or not str(parcelas).isdigit() or int(parcelas) < 0:
+        erros.append("Quantidade de parcelas pagas deve ser um número positivo")
+
+    if not dados.get('banco_atual'):
+        erros.append("Banco atual é obrigatório")
+
+    try:
+        valor_parcela = Decimal(str(dados.get('valor_parcela', 0)))
+        if valor_parcela <= 0:
+            erros.append("Valor da parcela deve ser maior que zero")
+    except Exception:
+        erros.append("Valor da parcela inválido")
+
+    try:
+        saldo_devedor = Decimal(str(dados.get('saldo_devedor', 0)))
+        if saldo_devedor <= 0:
+            erros.append("Saldo devedor deve ser maior que zero")
+    except Exception:
+        erros.append("Saldo devedor inválido")
+
+    try:
+        valor_total = Decimal(str(dados.get('valor_total', 0)))
+        if valor_total <= 0:
+            erros.append("Valor total deve ser maior que zero")
+    except Exception:
+        erros.append("Valor total inválido")
+
+    try:
+        taxa = Decimal(str(dados.get('taxa', 0)))
+        if taxa < 0 or taxa > 100:
+            erros.append("Taxa deve ser entre 0 e 100%")
+    except Exception:
+        erros.append("Taxa inválida")
+
+    return erros
+
+
+def gerar_cpf(aleatorio):
+    """Gera um CPF com dígitos verificadores válidos"""
+    digitos = [aleatorio.randint(0, 9) for _ in range(9)]
+    for tamanho in (9, 10):
+        soma = sum(d * p for d, p in zip(digitos, range(tamanho + 1, 1, -1)))
+        digitos.append(0 if soma % 11 < 2 else 11 - soma % 11)
+    return ''.join(map(str, digitos))
+
+
+def gerar_clientes(quantidade, semente=42):
+    """Gera clientes sintéticos cobrindo os principais cenários"""
+    aleatorio = random.Random(semente)
+    clientes = []
+    for numero in range(quantidade):
+        saldo = aleatorio.uniform(300, 20000)
+        clientes.append({
+            'nome': f"Cliente {numero:07d}",
+            'cpf': gerar_cpf(aleatorio),
+            'idade': str(aleatorio.randint(18, 95)),
+            'parcelas_pagas': str(aleatorio.randint(0, 40)),
+            'codigo_beneficio': aleatorio.choice(['123456789', 'INV123456']),
+            'banco_atual': 'Banco do Brasil',
+            'valor_parcela': f"{saldo / 48:.2f}",
+            'saldo_devedor': f"{saldo:.2f}",
+            'valor_total': f"{saldo + aleatorio.uniform(0, 5000):.2f}",
+            'taxa': f"{aleatorio.uniform(0, 3):.2f}"
+        })
+    return clientes
+
+
+def gerar_clientes_borda(quantidade, semente=43):
+    """Gera clientes nos limites das regras
+
+    Idades em torno de 85, parcelas em torno dos mínimos (6, 12 e 15),
+    benefícios de invalidez e gerais, saldo em torno de R$ 500 e troco em
+    torno de R$ 100, além de uma parcela de entradas inválidas.
+    """
+    aleatorio = random.Random(semente)
+    idades = ['83', '84', '85', '86', '87']
+    parcelas = ['5', '6', '7', '11', '12', '13', '14', '15', '16', '20']
+    saldos = [499.99, 500.00, 500.01, 1500.00, 10000.00]
+    trocos = [0.00, 99.99, 100.00, 100.01, 2500.00]
+    clientes = []
+    for numero in range(quantidade):
+        saldo = aleatorio.choice(saldos)
+        dados = {
+            'nome': f"Cliente {numero:07d}",
+            'cpf': gerar_cpf(aleatorio),
+            'idade': aleatorio.choice(idades),
+            'parcelas_pagas': aleatorio.choice(parcelas),
+            'codigo_beneficio': aleatorio.choice(['123456789', 'INV123456', 'invalidez-32']),
+            'banco_atual': 'Banco do Brasil',
+            'valor_parcela': f"{saldo / 48:.2f}",
+            'saldo_devedor': f"{saldo:.2f}",
+            'valor_total': f"{saldo + aleatorio.choice(trocos):.2f}",
+            'taxa': aleatorio.choice(['0.00', '1.99', '2.49', '2.50', '2.99'])
+        }
+        # Cerca de 5% de entradas inválidas, para cobrir o caminho de erro
+        if aleatorio.random() < 0.05:
+            campo, valor = aleatorio.choice([('cpf', '11111111111'), ('idade', '17'),
+                                             ('taxa', '1.234'), ('saldo_devedor', 'abc')])
+            dados[campo] = valor
+        clientes.append(dados)
+    return clientes
+
+
+def gerar_suite(quantidade, semente=42):
+    """Metade de clientes comuns e metade nos limites das regras, intercalados"""
+    comuns = gerar_clientes(quantidade - quantidade // 2, semente)
+    borda = gerar_clientes_borda(quantidade // 2, semente + 1)
+    return [cliente for par in zip(comuns, borda) for cliente in par] + comuns[len(borda):]
+
+
+def medir(funcao, clientes, repeticoes=3):
+    """Retorna consultas por segundo (melhor de N repetições)"""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for dados in clientes:
+            funcao(dados)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return len(clientes) / melhor
+
+
+def benchmark_consulta(quantidade=20000):
+    """Mede consultas por segundo antes e depois da compilação das regras"""
+    regras = RegrasPortabilidadeINSS()
+    cache = regras.cache
+    regras.cache = None
+    clientes = gerar_clientes(quantidade)
+
+    # As duas versões precisam devolver exatamente as mesmas listas
+    for dados in clientes:
+        if regras.consultar_portabilidade(dados) != consultar_interpretado(regras, dados):
+            raise AssertionError(f"Resultado divergente para {dados}")
+
+    antes = medir(lambda dados: consultar_interpretado(regras, dados), clientes)
+    depois = medir(regras.consultar_portabilidade, clientes)
+
+    print(f"\n⏱️  consultar_portabilidade ({quantidade} clientes)")
+    print(f"   - Interpretado: {antes:,.0f} consultas/s")
+    print(f"   - Compilado:    {depois:,.0f} consultas/s")
+    print(f"   - Ganho:        {depois / antes:.1f}x")
+
+    if cache is not None:
+        # Consultas reenviadas: poucos clientes distintos, cabendo no cache
+        regras.cache = cache
+        repetidos = clientes[:cache.max_size // 2] * 20
+        com_cache = medir(regras.consultar_portabilidade, repetidos)
+        print(f"   - Com cache:    {com_cache:,.0f} consultas/s "
+              f"(taxa de acerto {cache.estatisticas()['taxa_acerto']:.0%})")
+
+
+def benchmark_validacao(quantidade=20000):
+    """Mede o custo por requisição de validar e consultar, etapa por etapa"""
+    regras = RegrasPortabilidadeINSS()
+    regras.cache = None
+    clientes = gerar_clientes(quantidade)
+    consultas = [validar_consulta(dados)[0] for dados in clientes]
+
+    def custo(funcao, itens):
+        return 1e6 / medir(funcao, itens, repeticoes=5)
+
+    validar_antes = custo(validar_interpretado, clientes)
+    validar_depois = custo(validar_consulta, clientes)
+    consultar_antes = custo(regras.consultar_portabilidade, clientes)
+    consultar_depois = custo(regras.consultar_portabilidade, consultas)
+
+    print(f"\n⏱️  Validação + consulta ({quantidade} clientes, µs/requisição)")
+    print(f"   - {'':32} {'validar':>8} {'consultar':>10} {'total':>8}")
+    print(f"   - {'Dict revalidado e reconvertido':32} {validar_antes:8.2f} "
+          f"{consultar_antes:10.2f} {validar_antes + consultar_antes:8.2f}")
+    print(f"   - {'ConsultaCliente (uma conversão)':32} {validar_depois:8.2f} "
+          f"{consultar_depois:10.2f} {validar_depois + consultar_depois:8.2f}")
+
+
+def benchmark_cpf(quantidade=1000000):
+    """Mede a verificação de dígitos do CPF, um a um e em coluna"""
+    aleatorio = random.Random(7)
+    cpfs = [gerar_cpf(aleatorio) for _ in range(quantidade)]
+
+    inicio = time.perf_counter()
+    unitario = [normalizar_cpf(cpf) for cpf in cpfs]
+    duracao_unitario = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    coluna = normalizar_cpfs(cpfs)
+    duracao_coluna = time.perf_counter() - inicio
+
+    if unitario != coluna:
+        raise AssertionError("Validação de CPF em coluna divergente")
+
+    print(f"\n⏱️  Dígitos verificadores do CPF ({quantidade:,} CPFs)")
+    print(f"   - Um a um:   {duracao_unitario:.2f}s")
+    print(f"   - Em coluna: {duracao_coluna:.2f}s")
+
+
+def benchmark_serializacao(quantidade=20000):
+    """Mede a serialização da resposta do /consultar por backend e formato"""
+    import json
+
+    import serializacao
+
+    regras = RegrasPortabilidadeINSS()
+    regras.cache = None
+    respostas = [regras.consultar_portabilidade(dados) for dados in gerar_clientes(quantidade)]
+    amostra = max(respostas, key=len)
+
+    def custo(funcao):
+        return 1e6 / medir(funcao, respostas, repeticoes=5)
+
+    def stdlib_flask(resultados):
+        # Equivalente ao jsonify anterior (sort_keys, ASCII)
+        return json.dumps({'erro': False, 'resultados': resultados, 'total_bancos': len(resultados)},
+                          sort_keys=True, separators=(',', ':'))
+
+    def backend(formato):
+        def serializar(resultados):
+            conteudo = serializacao.colunar(resultados) if formato == 'colunar' else resultados
+            return serializacao.dumps({'erro': False, 'resultados': conteudo,
+                                       'total_bancos': len(resultados)})
+        return serializar
+
+    medidas = [
+        ('json (jsonify anterior)', custo(stdlib_flask), len(stdlib_flask(amostra))),
+        (f'{serializacao.BACKEND}, linhas', custo(backend('linhas')), len(backend('linhas')(amostra))),
+        (f'{serializacao.BACKEND}, colunar', custo(backend('colunar')), len(backend('colunar')(amostra)))
+    ]
+
+    print(f"\n⏱️  Serialização da resposta ({quantidade} respostas, µs/resposta)")
+    for nome, micros, tamanho in medidas:
+        print(f"   - {nome:24} {micros:7.2f} µs  ({tamanho} bytes com {len(amostra)} bancos)")
+
+
+def _tamanho_registro(dados):
+    """Bytes de um registro: o dict e as strings dos campos"""
+    return sys.getsizeof(dados) + sum(sys.getsizeof(chave) + sys.getsizeof(valor)
+                                      for chave, valor in dados.items())
+
+
+def benchmark_colunar(quantidade=20000):
+    """Compara memória e avaliação do lote em dicts e em colunas tipadas"""
+    from colunar import LoteColunar
+
+    regras = RegrasPortabilidadeINSS()
+    clientes = gerar_suite(quantidade)
+    consultas = [(numero, consulta) for numero, (consulta, _) in
+                 enumerate((validar_consulta(dados) for dados in clientes), 1) if consulta is not None]
+    lote, _ = LoteColunar.de_registros(clientes)
+
+    # As duas versões precisam devolver exatamente as mesmas listas
+    esperado = {numero: regras.tabela.avaliar(*consulta[:6]) for numero, consulta in consultas}
+    if dict(regras.consultar_colunar(lote)) != esperado:
+        raise AssertionError("Avaliação colunar divergente")
+
+    inicio = time.perf_counter()
+    for _, consulta in consultas:
+        regras.tabela.avaliar(*consulta[:6])
+    por_cliente = (time.perf_counter() - inicio) / len(consultas) * 1e6
+
+    inicio = time.perf_counter()
+    for _ in regras.consultar_colunar(lote):
+        pass
+    colunar = (time.perf_counter() - inicio) / len(lote) * 1e6
+
+    inicio = time.perf_counter()
+    regras.tabela_colunar.elegibilidade(lote)
+    matriz = (time.perf_counter() - inicio) / len(lote) * 1e6
+
+    memoria = sum(_tamanho_registro(dados) for dados in clientes) / len(clientes)
+    print(f"\n⏱️  Lote colunar ({len(lote)} clientes válidos)")
+    print(f"   - Memória:    {memoria:,.0f} bytes/cliente em dicts, {lote.nbytes / len(lote):.0f} em colunas")
+    print(f"   - Avaliação:  {por_cliente:.2f} µs/cliente um a um, {colunar:.2f} em colunas "
+          f"(matriz de elegibilidade: {matriz:.2f})")
+
+
+def benchmark_suite(quantidade=20000, perfil=None):
+    """Suíte reprodutível: validação, consulta, rota /consultar e lote
+
+    Retorna {medida: valor}; as medidas em µs são por cliente e a do lote
+    em registros por segundo.
+    """
+    import lote
+    from app import create_app
+
+    regras = RegrasPortabilidadeINSS()
+    regras.cache = None
+    clientes = gerar_suite(quantidade)
+    validos = [dados for dados in clientes if not regras.validar_dados(dados)]
+    consultas = [validar_consulta(dados)[0] for dados in validos]
+
+    # Os casos de borda também precisam bater com a versão interpretada
+    for dados, consulta in zip(validos, consultas):
+        if regras.consultar_portabilidade(consulta) != consultar_interpretado(regras, dados):
+            raise AssertionError(f"Resultado divergente para {dados}")
+
+    # Aplicação própria, sem cache, log nem histórico (nada de arquivos no
+    # diretório atual nem threads de fundo na medida); cada requisição vem de
+    # um endereço diferente, para não esbarrar no limite por cliente
+    cliente_http = create_app(regras, servicos=False).test_client()
+    requisicoes = [
+        (dados, {'REMOTE_ADDR': f"10.{numero // 65536 % 256}.{numero // 256 % 256}.{numero % 256}"})
+        for numero, dados in enumerate(clientes[:quantidade // 10])
+    ]
+
+    def rota(requisicao):
+        dados, ambiente = requisicao
+        cliente_http.post('/consultar', data=dados, environ_base=ambiente)
+
+    def processar_lote():
+        for _ in lote.consultar_lote(regras, clientes):
+            pass
+
+    medidas = {
+        'validar_dados_us': 1e6 / medir(regras.validar_dados, clientes, repeticoes=5),
+        'consultar_portabilidade_us': 1e6 / medir(regras.consultar_portabilidade, consultas, repeticoes=5),
+        'rota_consultar_us': 1e6 / medir(rota, requisicoes, repeticoes=3)
+    }
+    inicio = time.perf_counter()
+    processar_lote()
+    medidas['lote_registros_s'] = len(clientes) / (time.perf_counter() - inicio)
+
+    if perfil:
+        import perfil as perfilador
+
+        def caminho_quente():
+            for requisicao in requisicoes[:500]:
+                rota(requisicao)
+            for dados in clientes[:5000]:
+                consulta, erros = validar_consulta(dados)
+                if not erros:
+                    regras.consultar_portabilidade(consulta)
+
+        resumo = perfilador.perfilar(caminho_quente, perfil)
+        print(f"\n🔬 Perfil gravado em {perfil}.prof e {perfil}.folded")
+        print(resumo)
+
+    print(f"\n⏱️  Suíte do motor de regras ({quantidade} clientes, {len(validos)} válidos)")
+    print(f"   - validar_dados:           {medidas['validar_dados_us']:8.2f} µs/cliente")
+    print(f"   - consultar_portabilidade: {medidas['consultar_portabilidade_us']:8.2f} µs/cliente")
+    print(f"   - POST /consultar:         {medidas['rota_consultar_us']:8.2f} µs/requisição")
+    print(f"   - Lote:                    {medidas['lote_registros_s']:8,.0f} registros/s")
+    return medidas
+
+
+def limites_referencia(referencia=None, margem=None):
+    """Limites da verificação: a referência do BENCHMARK_CONFIG com a margem
+
+    Medidas por segundo têm limite mínimo (referência / (1 + margem)); as
+    demais, máximo (referência * (1 + margem)).
+    """
+    referencia = referencia or BENCHMARK_CONFIG['referencia']
+    fator = 1 + (BENCHMARK_CONFIG['margem'] if margem is None else margem)
+    return {nome: valor / fator if nome.endswith('_s') else valor * fator
+            for nome, valor in referencia.items()}
+
+
+def verificar_limites(medidas, limites=None):
+    """Compara as medidas com os limites de referência; retorna a lista de regressões"""
+    limites = limites or limites_referencia()
+    regressoes = []
+    for nome, limite in limites.items():
+        valor = medidas.get(nome)
+        if valor is None:
+            continue
+        # Medidas por segundo têm limite mínimo; as demais, máximo
+        if (valor < limite) if nome.endswith('_s') else (valor > limite):
+            regressoes.append(f"{nome}: {valor:,.2f} (limite {limite:,.2f})")
+    return regressoes
+
+
+def benchmark_paralelo(quantidade=200000):
+    """Mede registros por segundo do lote com 1, 2, 4... processos"""
+    import paralelo
+
+    clientes = gerar_clientes(quantidade)
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False) as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=list(clientes[0]))
+        escritor.writeheader()
+        escritor.writerows(clientes)
+        caminho = arquivo.name
+
+    print(f"\n⏱️  Lote em paralelo ({quantidade} registros)")
+    try:
+        trabalhadores = 1
+        referencia = None
+        while trabalhadores <= (os.cpu_count() or 1):
+            with open(caminho, newline='') as entrada:
+                inicio = time.perf_counter()
+                for _ in paralelo.consultar_lote_paralelo(entrada, 'csv', trabalhadores):
+                    pass
+                duracao = time.perf_counter() - inicio
+            taxa = quantidade / duracao
+            referencia = referencia or taxa
+            print(f"   - {trabalhadores:3d} processo(s): {taxa:,.0f} registros/s "
+                  f"({taxa / referencia:.1f}x)")
+            trabalhadores *= 2
+    finally:
+        os.remove(caminho)
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description='Benchmark do motor de regras')
+    parser.add_argument('modo', nargs='?', default='comparativo',
+                        choices=('comparativo', 'suite', 'paralelo'),
+                        help='comparativo (antes/depois), suite (com limites) ou paralelo')
+    parser.add_argument('-n', '--quantidade', type=int, default=20000, help='clientes gerados')
+    parser.add_argument('--perfil', metavar='PREFIXO',
+                        help='grava PREFIXO.prof (cProfile) e PREFIXO.folded (flame graph)')
+    parser.add_argument('--verificar', action='store_true',
+                        help='falha se alguma medida piorar mais que a margem sobre a referência do BENCHMARK_CONFIG')
+    args = parser.parse_args(argv)
+
+    print("🚀 Benchmark do motor de regras de portabilidade INSS")
+    print("=" * 60)
+    if args.modo == 'paralelo':
+        benchmark_paralelo()
+        return 0
+    if args.modo == 'comparativo':
+        benchmark_consulta(args.quantidade)
+        benchmark_validacao(args.quantidade)
+        benchmark_cpf()
+        benchmark_serializacao(args.quantidade)
+        benchmark_colunar(args.quantidade)
+        return 0
+
+    medidas = benchmark_suite(args.quantidade, args.perfil)
+    if args.verificar:
+        regressoes = verificar_limites(medidas)
+        if regressoes:
+            print("\n❌ Desempenho abaixo dos limites:")
+            for regressao in regressoes:
+                print(f"   - {regressao}")
+            return 1
+        print("\n✅ Todas as medidas dentro dos limites")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
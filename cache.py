@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de resultados com expiração por tempo (TTL) e descarte LRU
+Usado para evitar reavaliar consultas repetidas em poucos minutos
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """Cache LRU com tempo de vida por item e contadores de uso"""
+
+    def __init__(self, max_size=1000, ttl=300, relogio=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._relogio = relogio
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+        self.expirados = 0
+
+    def obter(self, chave):
+        """Retorna o valor em cache ou None se ausente/expirado"""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return None
+            expira_em, valor = item
+            if expira_em <= self._relogio():
+                del self._itens[chave]
+                self.expirados += 1
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        """Guarda um valor, descartando o menos usado se o cache estiver cheio"""
+        with self._lock:
+            self._itens[chave] = (self._relogio() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_size:
+                self._itens.popitem(last=False)
+                self.descartes += 1
+
+    def limpar(self):
+        """Remove todos os itens (os contadores são mantidos)"""
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def estatisticas(self):
+        """Retorna os contadores do cache"""
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'descartes': self.descartes,
+                'expirados': self.expirados,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0
+            }
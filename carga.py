@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Teste de carga do endpoint /consultar
+Envia requisições em ritmo fixo (RPS alvo) e mede a latência a partir do
+instante em que cada requisição deveria ter saído, para que a fila do
+próprio cliente também apareça nos percentis
+"""
+
+import argparse
+import http.client
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+from benchmark import gerar_clientes
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de uma lista já ordenada"""
+    if not valores:
+        return 0.0
+    posicao = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[posicao]
+
+
+class Cliente:
+    """Conexões HTTP keep-alive, uma por thread"""
+
+    def __init__(self, url, comprimir):
+        partes = urlsplit(url)
+        self.host = partes.hostname
+        self.porta = partes.port or 80
+        self.caminho = partes.path or '/consultar'
+        self.cabecalhos = {'Content-Type': 'application/x-www-form-urlencoded'}
+        if comprimir:
+            self.cabecalhos['Accept-Encoding'] = 'gzip'
+        self._local = threading.local()
+
+    def enviar(self, corpo):
+        """Envia uma requisição e retorna o status HTTP (0 em erro de conexão)"""
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = self._local.conexao = http.client.HTTPConnection(self.host, self.porta, timeout=60)
+        try:
+            conexao.request('POST', self.caminho, corpo, self.cabecalhos)
+            resposta = conexao.getresponse()
+            resposta.read()
+            return resposta.status
+        except (OSError, http.client.HTTPException):
+            conexao.close()
+            self._local.conexao = None
+            return 0
+
+
+def executar_carga(url, rps, duracao, conexoes, comprimir=True):
+    """Dispara rps requisições por segundo durante `duracao` segundos"""
+    cliente = Cliente(url, comprimir)
+    corpos = [urlencode(dados) for dados in gerar_clientes(1000)]
+    aleatorio = random.Random(1)
+    latencias = []
+    status = Counter()
+    lock = threading.Lock()
+
+    def requisicao(agendado, corpo):
+        codigo = cliente.enviar(corpo)
+        latencia = time.perf_counter() - agendado
+        with lock:
+            latencias.append(latencia)
+            status[codigo] += 1
+
+    total = int(rps * duracao)
+    intervalo = 1 / rps
+    with ThreadPoolExecutor(conexoes) as executor:
+        inicio = time.perf_counter()
+        for numero in range(total):
+            agendado = inicio + numero * intervalo
+            espera = agendado - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            executor.submit(requisicao, agendado, aleatorio.choice(corpos))
+    decorrido = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'enviadas': total,
+        'rps_obtido': total / decorrido,
+        'status': dict(status),
+        'p50_ms': percentil(latencias, 50) * 1000,
+        'p90_ms': percentil(latencias, 90) * 1000,
+        'p99_ms': percentil(latencias, 99) * 1000,
+        'max_ms': latencias[-1] * 1000 if latencias else 0.0
+    }
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description='Teste de carga do /consultar')
+    parser.add_argument('--url', default='http://127.0.0.1:8000/consultar')
+    parser.add_argument('--rps', type=float, default=200, help='requisições por segundo alvo')
+    parser.add_argument('--duracao', type=float, default=10, help='segundos de carga')
+    parser.add_argument('--conexoes', type=int, default=50, help='conexões simultâneas do cliente')
+    parser.add_argument('--sem-compressao', action='store_true', help='não envia Accept-Encoding')
+    args = parser.parse_args(argv)
+
+    print(f"🚀 Carga em {args.url}: {args.rps:g} req/s por {args.duracao:g}s")
+    resultado = executar_carga(args.url, args.rps, args.duracao, args.conexoes,
+                               comprimir=not args.sem_compressao)
+
+    print(f"   - Enviadas:   {resultado['enviadas']} ({resultado['rps_obtido']:,.0f} req/s)")
+    print(f"   - Status:     {resultado['status']}")
+    print(f"   - p50:        {resultado['p50_ms']:.1f} ms")
+    print(f"   - p90:        {resultado['p90_ms']:.1f} ms")
+    print(f"   - p99:        {resultado['p99_ms']:.1f} ms")
+    print(f"   - Máximo:     {resultado['max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
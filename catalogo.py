@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Catálogo de bancos para portabilidade
+Cada banco aparece uma única vez, identificado pelo código COMPE, com a regra
+efetiva já resolvida e com os grupos usados pelo motor de regras calculados
+na criação do catálogo
+"""
+
+from typing import NamedTuple
+
+
+class Banco(NamedTuple):
+    """Banco do catálogo com a regra efetiva de portabilidade"""
+    codigo: str
+    nome: str
+    idade_maxima: int
+    parcelas_minimas: int
+    aceita_invalidez: bool
+    taxa_padrao: float
+    bloqueado: bool
+
+
+class CatalogoBancos:
+    """Bancos únicos com busca por nome ou código e grupos pré-calculados
+
+    As entradas podem ser dicts {'codigo': ..., 'nome': ...} ou apenas o
+    nome do banco (o nome passa a ser o código). Entradas repetidas, por
+    código ou por nome, são descartadas mantendo a primeira ocorrência.
+    """
+
+    def __init__(self, entradas, bloqueados=(), regras_bancos=None, regra_padrao=None):
+        regras_bancos = regras_bancos or {}
+        bloqueados = set(bloqueados)
+
+        bancos = []
+        self.por_codigo = {}
+        self.por_nome = {}
+        for entrada in entradas:
+            if isinstance(entrada, str):
+                codigo = nome = entrada
+            else:
+                codigo, nome = str(entrada['codigo']), entrada['nome']
+            if codigo in self.por_codigo or nome in self.por_nome:
+                continue
+
+            regra = regras_bancos.get(codigo) or regras_bancos.get(nome) or regra_padrao
+            banco = Banco(
+                codigo=codigo,
+                nome=nome,
+                idade_maxima=regra['idade_maxima'],
+                parcelas_minimas=regra['parcelas_minimas'],
+                aceita_invalidez=bool(regra['aceita_invalidez']),
+                taxa_padrao=float(regra['taxa_padrao']),
+                bloqueado=codigo in bloqueados or nome in bloqueados
+            )
+            bancos.append(banco)
+            self.por_codigo[codigo] = banco
+            self.por_nome[nome] = banco
+
+        self._agrupar(bancos)
+
+    def _agrupar(self, bancos):
+        self.bancos = tuple(bancos)
+        self.nomes = tuple(banco.nome for banco in bancos)
+
+        # Grupos pré-calculados
+        self.bloqueados = frozenset(banco.nome for banco in bancos if banco.bloqueado)
+        self.disponiveis = tuple(banco for banco in bancos if not banco.bloqueado)
+        self.aceitam_invalidez = tuple(banco for banco in self.disponiveis if banco.aceita_invalidez)
+
+    def subconjunto(self, nomes):
+        """Novo catálogo só com os bancos indicados (na ordem do catálogo)"""
+        nomes = set(nomes)
+        bancos = [banco for banco in self.bancos if banco.nome in nomes]
+        catalogo = CatalogoBancos.__new__(CatalogoBancos)
+        catalogo.por_codigo = {banco.codigo: banco for banco in bancos}
+        catalogo.por_nome = {banco.nome: banco for banco in bancos}
+        catalogo._agrupar(bancos)
+        return catalogo
+
+    def buscar(self, chave):
+        """Retorna o banco pelo código ou pelo nome (None se não existir)"""
+        return self.por_codigo.get(chave) or self.por_nome.get(chave)
+
+    def entradas(self):
+        """Retorna as entradas {'codigo', 'nome'} na ordem do catálogo"""
+        return [{'codigo': banco.codigo, 'nome': banco.nome} for banco in self.bancos]
+
+    def __contains__(self, chave):
+        return chave in self.por_codigo or chave in self.por_nome
+
+    def __iter__(self):
+        return iter(self.bancos)
+
+    def __len__(self):
+        return len(self.bancos)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Representação colunar de lotes de clientes
+Os campos que influenciam as regras ficam em arrays tipados (idade em int16,
+parcelas em int32, valores em centavos int64, taxa em pontos-base int32 e o
+benefício por invalidez como máscara), cerca de 35 bytes por cliente. A
+elegibilidade de todos os clientes em todos os bancos é calculada de uma vez,
+como uma matriz booleana; como os valores são inteiros, as comparações são
+exatamente as mesmas feitas com Decimal pela TabelaRegras
+"""
+
+import math
+from array import array
+from decimal import Decimal
+from itertools import count
+
+import ranking
+from validacao import normalizar_cpfs, validar_consulta
+
+# NumPy é opcional: sem ele, a matriz é calculada linha a linha em Python
+np = None
+_NUMPY_DISPONIVEL = None
+
+# Parcelas mínimas de um banco que não aceita o tipo de benefício
+_NUNCA = 2 ** 31 - 1
+
+# Colunas do lote: (nome, código do array, dtype do NumPy)
+COLUNAS = (
+    ('idade', 'h', 'int16'),
+    ('parcelas', 'i', 'int32'),
+    ('invalidez', 'b', 'int8'),
+    ('saldo_centavos', 'q', 'int64'),
+    ('total_centavos', 'q', 'int64'),
+    ('taxa_pontos_base', 'i', 'int32'),
+    ('linhas', 'q', 'int64')
+)
+
+
+def _numpy():
+    """Importa o NumPy na primeira chamada; False se não estiver instalado"""
+    global np, _NUMPY_DISPONIVEL
+    if _NUMPY_DISPONIVEL is None:
+        try:
+            import numpy
+        except ImportError:
+            _NUMPY_DISPONIVEL = False
+        else:
+            np = numpy
+            _NUMPY_DISPONIVEL = True
+    return _NUMPY_DISPONIVEL
+
+
+def _centesimos(valor):
+    """Decimal com até 2 casas em centésimos (int), sem arredondamento"""
+    centesimos = valor.scaleb(2)
+    if centesimos != centesimos.to_integral_value():
+        raise ValueError(f"valor com mais de 2 casas decimais: {valor}")
+    return int(centesimos)
+
+
+class LoteColunar:
+    """Campos de regras de um lote de clientes válidos, um array por campo"""
+
+    __slots__ = tuple(nome for nome, _, _ in COLUNAS)
+
+    def __init__(self):
+        for nome, codigo, _ in COLUNAS:
+            setattr(self, nome, array(codigo))
+
+    def __len__(self):
+        return len(self.idade)
+
+    @property
+    def nbytes(self):
+        """Memória ocupada pelos dados das colunas"""
+        return sum(getattr(self, nome).itemsize * len(self) for nome, _, _ in COLUNAS)
+
+    def adicionar(self, consulta, linha=0):
+        """Acrescenta uma ConsultaCliente (ou a tupla de campos das regras)"""
+        idade, parcelas, invalidez, saldo_devedor, valor_total, taxa = consulta[:6]
+        self.adicionar_inteiros(idade, parcelas, invalidez, _centesimos(saldo_devedor),
+                                _centesimos(valor_total), _centesimos(taxa), linha)
+
+    def adicionar_inteiros(self, idade, parcelas, invalidez, saldo_centavos, total_centavos,
+                           taxa_pontos_base, linha=0):
+        """Acrescenta um cliente com os valores já em centavos e pontos-base"""
+        self.idade.append(idade)
+        self.parcelas.append(parcelas)
+        self.invalidez.append(1 if invalidez else 0)
+        self.saldo_centavos.append(saldo_centavos)
+        self.total_centavos.append(total_centavos)
+        self.taxa_pontos_base.append(taxa_pontos_base)
+        self.linhas.append(linha)
+
+    @classmethod
+    def de_consultas(cls, consultas, inicio=1):
+        """Lote com as ConsultaCliente informadas, numeradas a partir de `inicio`"""
+        lote = cls()
+        for linha, consulta in zip(count(inicio), consultas):
+            lote.adicionar(consulta, linha)
+        return lote
+
+    @classmethod
+    def de_registros(cls, registros, inicio=1):
+        """Valida os registros (dicts de strings) e monta o lote dos válidos
+
+        Retorna (lote, invalidos), com invalidos = [(linha, dados, erros)].
+        """
+        lote = cls()
+        invalidos = []
+        cpfs = normalizar_cpfs([dados.get('cpf') for dados in registros])
+        for linha, dados, cpf in zip(count(inicio), registros, cpfs):
+            consulta, erros = validar_consulta(dados, cpf)
+            if erros:
+                invalidos.append((linha, dados, erros))
+            else:
+                lote.adicionar(consulta, linha)
+        return lote, invalidos
+
+    def coluna(self, nome):
+        """Coluna como array do NumPy, sem cópia (requer NumPy)"""
+        dtype = next(dtype for coluna, _, dtype in COLUNAS if coluna == nome)
+        return np.frombuffer(getattr(self, nome), dtype=dtype)
+
+
+class TabelaColunar:
+    """Regras de um catálogo em arrays por banco, para avaliar lotes colunares
+
+    As colunas da matriz de elegibilidade são os bancos disponíveis, na
+    ordem do catálogo (a mesma ordem dos resultados da TabelaRegras).
+    """
+
+    def __init__(self, catalogo, regras):
+        # Limites em centavos: v < limite (Decimal) equivale a centavos < ceil(limite * 100)
+        self.saldo_minimo = math.ceil(Decimal(regras['saldo_minimo']) * 100)
+        self.troco_minimo = math.ceil(Decimal(regras['troco_minimo']) * 100)
+        parcelas_invalidez = regras['parcelas_minimas']['invalidez']
+
+        bancos = catalogo.disponiveis
+        self.bancos = tuple(banco.nome for banco in bancos)
+        self.idade_maxima = tuple(banco.idade_maxima for banco in bancos)
+        self.parcelas_geral = tuple(banco.parcelas_minimas for banco in bancos)
+        self.parcelas_invalidez = tuple(
+            parcelas_invalidez if banco.aceita_invalidez else _NUNCA for banco in bancos
+        )
+        self.taxa_padrao = tuple(banco.taxa_padrao for banco in bancos)
+        self.taxa_limite = tuple(math.ceil(Decimal(banco.taxa_padrao) * 100) for banco in bancos)
+        self._arrays = None
+
+    def _arrays_numpy(self):
+        if self._arrays is None:
+            self._arrays = (
+                np.array(self.idade_maxima, dtype=np.int16),
+                np.array(self.parcelas_geral, dtype=np.int32),
+                np.array(self.parcelas_invalidez, dtype=np.int32)
+            )
+        return self._arrays
+
+    def elegibilidade(self, lote):
+        """Matriz (clientes x bancos) de elegibilidade, incluindo as regras globais
+
+        Com NumPy, um array bool calculado em uma só passada; sem NumPy, uma
+        lista de listas de bool.
+        """
+        if _numpy():
+            idade_maxima, parcelas_geral, parcelas_invalidez = self._arrays_numpy()
+            saldo = lote.coluna('saldo_centavos')
+            globais = (saldo >= self.saldo_minimo) & (lote.coluna('total_centavos') - saldo >= self.troco_minimo)
+            invalidez = lote.coluna('invalidez').astype(bool)
+            minimas = np.where(invalidez[:, None], parcelas_invalidez, parcelas_geral)
+            return (
+                (lote.coluna('idade')[:, None] <= idade_maxima)
+                & (lote.coluna('parcelas')[:, None] >= minimas)
+                & globais[:, None]
+            )
+
+        bancos = list(zip(self.idade_maxima, self.parcelas_geral, self.parcelas_invalidez))
+        matriz = []
+        for idade, parcelas, invalidez, saldo, total in zip(
+                lote.idade, lote.parcelas, lote.invalidez, lote.saldo_centavos, lote.total_centavos):
+            if saldo < self.saldo_minimo or total - saldo < self.troco_minimo:
+                matriz.append([False] * len(bancos))
+                continue
+            matriz.append([
+                idade <= idade_maxima and parcelas >= (invalida if invalidez else geral)
+                for idade_maxima, geral, invalida in bancos
+            ])
+        return matriz
+
+    def _linhas_matriz(self, lote):
+        """Chave (hashable) de cada linha da matriz e a função que a decodifica"""
+        matriz = self.elegibilidade(lote)
+        if not _numpy():
+            return map(tuple, matriz), lambda chave: chave
+        # Uma linha de bits por cliente: B bancos cabem em ceil(B / 8) bytes
+        largura = (len(self.bancos) + 7) // 8
+        dados = np.packbits(matriz, axis=1).tobytes()
+        chaves = (dados[i:i + largura] for i in range(0, len(dados), largura))
+        total = len(self.bancos)
+        return chaves, lambda chave: np.unpackbits(
+            np.frombuffer(chave, dtype=np.uint8), count=total).astype(bool).tolist()
+
+    def avaliar(self, lote, top=None, ordem='catalogo'):
+        """Gera (linha, resultados) por cliente, iguais aos da TabelaRegras.avaliar"""
+        ranqueado = top is not None or ordem != 'catalogo'
+        chaves, decodificar = self._linhas_matriz(lote)
+        # Por modo (geral, invalidez): (banco, limiar de histórico positivo, taxa, limite da taxa)
+        colunas = (
+            list(zip(self.bancos, [p + 5 for p in self.parcelas_geral], self.taxa_padrao, self.taxa_limite)),
+            list(zip(self.bancos, [p + 5 for p in self.parcelas_invalidez], self.taxa_padrao, self.taxa_limite))
+        )
+        # Bancos elegíveis de cada linha distinta da matriz (poucas por lote)
+        grupos = {}
+
+        for linha, chave, parcelas, invalidez, saldo, total, taxa in zip(
+                lote.linhas, chaves, lote.parcelas, lote.invalidez,
+                lote.saldo_centavos, lote.total_centavos, lote.taxa_pontos_base):
+            grupo = grupos.get((chave, invalidez))
+            if grupo is None:
+                elegiveis = [
+                    coluna for elegivel, coluna in zip(decodificar(chave), colunas[invalidez]) if elegivel
+                ]
+                # Taxas padrão e posições em ordem de taxa, para o ranking
+                taxas = tuple(taxa_padrao for _, _, taxa_padrao, _ in elegiveis) if ranqueado else None
+                grupo = grupos[chave, invalidez] = (
+                    elegiveis, taxas, ranking.posicoes_por_taxa(taxas) if ranqueado else None
+                )
+            elegiveis, taxas, posicoes = grupo
+            if not elegiveis:
+                yield linha, []
+                continue
+
+            troco = total - saldo
+            taxa_cliente = taxa + 50
+            taxa_cliente_float = taxa_cliente / 100
+            if ranqueado:
+                elegiveis = ranking.selecionar(elegiveis, posicoes, taxas, taxa_cliente_float, top, ordem)
+            observacoes = []
+            if invalidez:
+                observacoes.append("Benefício por invalidez")
+            if troco > 0:
+                observacoes.append(f"Refinanciamento de R$ {troco // 100}.{troco % 100:02d}")
+            observacoes_padrao = '; '.join(observacoes) if observacoes else "Regras atendidas"
+            observacoes_historico = '; '.join(observacoes + ["Cliente com histórico positivo"])
+            tipo_operacao = "Port+Refin" if troco > 0 else "Portabilidade"
+
+            yield linha, [
+                {
+                    'banco': banco,
+                    'tipo_operacao': tipo_operacao,
+                    'taxa_aplicavel': taxa_cliente_float if taxa_cliente < taxa_limite else taxa_padrao,
+                    'observacoes': observacoes_historico if parcelas >= limiar_historico else observacoes_padrao
+                }
+                for banco, limiar_historico, taxa_padrao, taxa_limite in elegiveis
+            ]
@@ -5,6 +5,8 @@ Arquivo de configuração do sistema de portabilidade INSS
 Centraliza todos os parâmetros e configurações do sistema
 """
 
+import os
+
 # Configurações da aplicação Flask
 FLASK_CONFIG = {
     'DEBUG': True,
@@ -35,6 +37,31 @@ REGRAS_NEGOCIO = {
 
 # Configurações de bancos
 BANCOS_CONFIG = {
+    # Bancos disponíveis para portabilidade, identificados pelo código COMPE.
+    # Cooperativas singulares que compensam pelo código do seu sistema
+    # (Sicredi 748, Sicoob 756) usam o código do sistema com um sufixo.
+    'LISTA': [
+        {'codigo': '001', 'nome': 'Banco do Brasil'},
+        {'codigo': '104', 'nome': 'Caixa Econômica Federal'},
+        {'codigo': '237', 'nome': 'Bradesco'},
+        {'codigo': '341', 'nome': 'Itaú'},
+        {'codigo': '033', 'nome': 'Santander'},
+        {'codigo': '041', 'nome': 'Banrisul'},
+        {'codigo': '748', 'nome': 'Sicredi'},
+        {'codigo': '756', 'nome': 'Sicoob'},
+        {'codigo': '070', 'nome': 'BRB'},
+        {'codigo': '756-BANCOOB', 'nome': 'Bancoob'},
+        {'codigo': '133', 'nome': 'Cresol'},
+        {'codigo': '136', 'nome': 'Unicred'},
+        {'codigo': '085', 'nome': 'Ailos'},
+        {'codigo': '748-PIONEIRA', 'nome': 'Sicredi Pioneira'},
+        {'codigo': '756-CREDISUL', 'nome': 'Sicoob Credisul'},
+        {'codigo': '748-NORTE', 'nome': 'Sicredi Norte'},
+        {'codigo': '748-CENTRO', 'nome': 'Sicredi Centro'},
+        {'codigo': '748-SUL', 'nome': 'Sicredi Sul'},
+        {'codigo': '756-CENTRO', 'nome': 'Sicoob Centro'}
+    ],
+
     # Bancos que não aceitam portabilidade
     'BLOQUEADOS': ['BRB'],
     
@@ -99,6 +126,14 @@ BANCOS_CONFIG = {
     }
 }
 
+# Origem das regras de negócio e de bancos
+REGRAS_CONFIG = {
+    # Arquivo JSON/YAML com REGRAS_NEGOCIO e BANCOS_CONFIG; sem arquivo,
+    # as regras deste config.py são usadas
+    'arquivo': os.environ.get('PORTABILIDADE_REGRAS'),
+    'intervalo_verificacao': 2.0  # segundos entre verificações do arquivo
+}
+
 # Configurações de validação
 VALIDACAO_CONFIG = {
     'CPF': {
@@ -172,9 +207,12 @@ EXPORT_CONFIG = {
 LOG_CONFIG = {
     'level': 'INFO',
     'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    'file': 'portabilidade_inss.log',
+    # '-' grava em stderr; {pid} no nome dá um arquivo por processo
+    'file': os.environ.get('PORTABILIDADE_LOG', 'portabilidade_inss.log'),
     'max_size': 10 * 1024 * 1024,  # 10MB
-    'backup_count': 5
+    'backup_count': 5,
+    'json': True,  # uma linha JSON por registro (False: usa 'format')
+    'tamanho_fila': 10000  # registros aguardando gravação; excedentes são descartados
 }
 
 # Configurações de cache
@@ -189,7 +227,13 @@ SECURITY_CONFIG = {
     'rate_limit': {
         'enabled': True,
         'max_requests': 100,
-        'window': 3600  # 1 hora
+        'window': 3600,  # 1 hora
+        # 'memoria' (por processo), 'sqlite' (compartilhado entre workers) ou 'redis'
+        'backend': os.environ.get('PORTABILIDADE_LIMITE_BACKEND', 'memoria'),
+        'sqlite_path': os.environ.get('PORTABILIDADE_LIMITE_SQLITE', 'limite_taxa.db'),
+        'redis_url': os.environ.get('PORTABILIDADE_REDIS_URL', 'redis://localhost:6379/0'),
+        # Endpoints fora do limite; todos os demais (inclusive rotas novas) são limitados
+        'endpoints_livres': ('index', 'static', 'ativo', 'metrics')
     },
     'input_sanitization': True,
     'xss_protection': True,
@@ -201,7 +245,99 @@ PERFORMANCE_CONFIG = {
     'max_concurrent_requests': 10,
     'request_timeout': 30,  # segundos
     'enable_compression': True,
-    'enable_caching': True
+    'enable_caching': True,
+    'compression_min_size': 500,  # bytes; respostas menores seguem sem compressão
+    'compression_level': 6,
+    'retry_after': 1,  # segundos sugeridos ao cliente na resposta 503
+    'serializador': 'auto',  # 'auto' (orjson se instalado), 'orjson' ou 'json'
+    # Monta regras e aplicação no master do gunicorn, antes do fork: os workers
+    # compartilham essas páginas (ligado pelo gunicorn.conf.py)
+    'preload': os.environ.get('PORTABILIDADE_PRELOAD') == '1'
+}
+
+# Configurações de consulta em lote
+LOTE_CONFIG = {
+    'tamanho_lote': 1000,  # registros avaliados por bloco
+    'trabalhadores': 1,  # processos na linha de comando (0 = todos os núcleos)
+    'blocos_por_trabalhador': 2,  # blocos em processamento por processo
+    'encoding': 'utf-8-sig',
+    'csv_delimiter': ',',
+    # Leitura por mmap (leitor_mmap.py): bytes de arquivo por tarefa
+    'bytes_por_faixa': 4 * 1024 * 1024,
+    # Extrato de largura fixa: campo -> (posição inicial, largura). Números
+    # alinhados à direita com zeros; valores e taxa com 2 casas implícitas
+    # (000150000 = 1500.00); textos completados com espaços
+    'layout_largura_fixa': {
+        'cpf': (0, 11),
+        'nome': (11, 60),
+        'idade': (71, 3),
+        'parcelas_pagas': (74, 3),
+        'codigo_beneficio': (77, 20),
+        'banco_atual': (97, 30),
+        'valor_parcela': (127, 9),
+        'saldo_devedor': (136, 9),
+        'valor_total': (145, 9),
+        'taxa': (154, 5)
+    }
+}
+
+# Histórico das consultas (SQLite em WAL, gravado em segundo plano)
+HISTORICO_CONFIG = {
+    'enabled': os.environ.get('PORTABILIDADE_HISTORICO', '1') != '0',
+    'arquivo': os.environ.get('PORTABILIDADE_HISTORICO_ARQUIVO', 'historico_consultas.db'),
+    # Chave do HMAC do CPF, obrigatória com o histórico ligado (sem padrão)
+    'chave_cpf': os.environ.get('PORTABILIDADE_HISTORICO_CHAVE'),
+    'tamanho_lote': 500,  # consultas por transação
+    'intervalo_gravacao': 1.0,  # segundos de espera por novas consultas
+    'tamanho_fila': 50000,  # consultas aguardando gravação; excedentes são descartadas
+    'dias_padrao': 90
+}
+
+# Mapa de elegibilidade pré-compilado (python mapa_elegibilidade.py), um
+# arquivo por versão das regras, mapeado em memória pelos workers
+MAPA_ELEGIBILIDADE_CONFIG = {
+    'enabled': os.environ.get('PORTABILIDADE_MAPA', '1') != '0',
+    'diretorio': os.environ.get('PORTABILIDADE_MAPAS', 'mapas')
+}
+
+# Simulação de cenários (POST /simular)
+SIMULACAO_CONFIG = {
+    'pontos_maximos': 1000  # pontos por eixo (parcelas_pagas, valor_total, taxa)
+}
+
+# Projeções das ofertas (tabela Price) no POST /consultar?projecao=1
+PROJECAO_CONFIG = {
+    'prazos': (24, 36, 48, 60, 72, 84, 96),  # meses
+    # IOF: alíquota adicional sobre o valor financiado e alíquota diária
+    # sobre cada amortização, limitada a 365 dias
+    'iof_adicional': 0.0038,
+    'iof_diario': 0.000082,
+    'iof_dias_maximo': 365,
+    'tarifas': 0.0  # fração do valor financiado cobrada na contratação
+}
+
+# Arquivos estáticos gerados por `python estaticos.py` (minificados, com hash)
+ESTATICOS_CONFIG = {
+    'arquivos': ('script.js', 'style.css'),  # em static/
+    'diretorio': 'static/dist',  # arquivos gerados e manifest.json
+    'url': '/assets',
+    'max_age': 31536000  # segundos (um ano; o nome muda com o conteúdo)
+}
+
+# Limites de regressão do benchmark (python benchmark.py suite --verificar)
+BENCHMARK_CONFIG = {
+    # Medidas de referência (mediana de 4 execuções de `python benchmark.py
+    # suite` na máquina de integração); regrave quando o desempenho mudar
+    # de propósito
+    'referencia': {
+        'validar_dados_us': 6.8,  # µs por cliente
+        'consultar_portabilidade_us': 4.3,  # µs por cliente (sem cache)
+        'rota_consultar_us': 540.0,  # µs por POST /consultar (test client)
+        'lote_registros_s': 22000.0  # registros por segundo
+    },
+    # Piora tolerada sobre a referência: cobre a variação entre execuções na
+    # mesma máquina (até ~40%), e não uma regressão de 2x
+    'margem': 0.5
 }
 
 # Função para obter configuração completa
@@ -211,13 +347,21 @@ def get_config():
         'flask': FLASK_CONFIG,
         'regras': REGRAS_NEGOCIO,
         'bancos': BANCOS_CONFIG,
+        'fonte_regras': REGRAS_CONFIG,
         'validacao': VALIDACAO_CONFIG,
         'ui': UI_CONFIG,
         'export': EXPORT_CONFIG,
         'log': LOG_CONFIG,
         'cache': CACHE_CONFIG,
         'security': SECURITY_CONFIG,
-        'performance': PERFORMANCE_CONFIG
+        'performance': PERFORMANCE_CONFIG,
+        'lote': LOTE_CONFIG,
+        'historico': HISTORICO_CONFIG,
+        'mapa_elegibilidade': MAPA_ELEGIBILIDADE_CONFIG,
+        'simulacao': SIMULACAO_CONFIG,
+        'projecao': PROJECAO_CONFIG,
+        'estaticos': ESTATICOS_CONFIG,
+        'benchmark': BENCHMARK_CONFIG
     }
 
 # Função para obter configuração específica
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arquivos estáticos da interface e página inicial
+A construção (python estaticos.py) minifica o script.js e o style.css, grava
+cada um com o hash do conteúdo no nome (script.<hash>.js), já comprimido em
+gzip (e brotli, se instalado), e um manifest.json com os nomes gerados. Como
+o nome muda junto com o conteúdo, a aplicação serve esses arquivos com cache
+imutável de um ano. A página inicial é renderizada uma vez por catálogo de
+bancos e servida com ETag, já comprimida.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+
+from flask import Response, abort, render_template, request, send_from_directory, url_for
+
+from config import ESTATICOS_CONFIG
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele, apenas gzip
+    brotli = None
+
+_RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+# Codificações pré-comprimidas, na ordem de preferência, e a extensão do arquivo
+_CODIFICACOES = (('br', '.br'), ('gzip', '.gz'))
+
+# Depois destes caracteres, uma barra começa uma expressão regular (e não uma divisão)
+_ANTES_DE_REGEX = set('(,=:[!&|?{};+-*%<>~^') | {''}
+
+
+def _fim_texto(texto, i):
+    """Posição depois do fim da string JS/CSS que começa em texto[i]"""
+    aspas = texto[i]
+    i += 1
+    while i < len(texto) and texto[i] != aspas:
+        i += 2 if texto[i] == '\\' else 1
+    return i + 1
+
+
+def _fim_template(texto, i):
+    """(posição, True se abriu ${) a partir de i, dentro de um template literal"""
+    while i < len(texto):
+        if texto[i] == '\\':
+            i += 2
+        elif texto[i] == '`':
+            return i + 1, False
+        elif texto.startswith('${', i):
+            return i + 2, True
+        else:
+            i += 1
+    return i, False
+
+
+def _fim_regex(texto, i):
+    """Posição depois da expressão regular (com flags) que começa em texto[i]"""
+    i += 1
+    classe = False
+    while i < len(texto) and (classe or texto[i] != '/'):
+        if texto[i] == '\\':
+            i += 1
+        elif texto[i] == '[':
+            classe = True
+        elif texto[i] == ']':
+            classe = False
+        i += 1
+    i += 1
+    while i < len(texto) and texto[i].isalpha():
+        i += 1
+    return i
+
+
+def _compactar_codigo(trecho):
+    """Espaços de um trecho de código: uma quebra por linha, sem indentação"""
+    trecho = re.sub(r'[ \t]*\n\s*', '\n', trecho)
+    return re.sub(r'[ \t]+', ' ', trecho)
+
+
+def minificar_js(texto):
+    """Remove comentários, indentação e linhas vazias do JavaScript
+
+    Strings, templates e expressões regulares ficam intactos, e as quebras de
+    linha são mantidas (a inserção automática de ponto e vírgula não muda).
+    """
+    partes = []  # (é código, trecho)
+    codigo = []
+    ultimo = ''  # último caractere significativo emitido
+    chaves = []  # chaves abertas em cada ${ ainda não fechado
+    i = 0
+
+    def literal(inicio, fim):
+        partes.append((True, ''.join(codigo)))
+        codigo.clear()
+        partes.append((False, texto[inicio:fim]))
+
+    while i < len(texto):
+        c = texto[i]
+        if c in '"\'':
+            fim = _fim_texto(texto, i)
+        elif c == '`' or (c == '}' and chaves and chaves[-1] == 0):
+            if c == '}':
+                chaves.pop()
+            fim, aberto = _fim_template(texto, i + 1)
+            if aberto:
+                chaves.append(0)
+        elif texto.startswith('//', i):
+            fim = texto.find('\n', i)
+            i = len(texto) if fim < 0 else fim
+            continue
+        elif texto.startswith('/*', i):
+            fim = texto.find('*/', i + 2)
+            i = len(texto) if fim < 0 else fim + 2
+            codigo.append(' ')
+            continue
+        elif c == '/' and (ultimo in _ANTES_DE_REGEX or re.search(r'\b(return|typeof)\s*$', ''.join(codigo))):
+            fim = _fim_regex(texto, i)
+        else:
+            if chaves and c in '{}':
+                chaves[-1] += 1 if c == '{' else -1
+            codigo.append(c)
+            if not c.isspace():
+                ultimo = c
+            i += 1
+            continue
+        literal(i, fim)
+        ultimo = texto[fim - 1]
+        i = fim
+
+    partes.append((True, ''.join(codigo)))
+    saida = ''.join(_compactar_codigo(trecho) if e_codigo else trecho for e_codigo, trecho in partes)
+    return saida.strip() + '\n'
+
+
+def _compactar_css(trecho):
+    trecho = re.sub(r'\s+', ' ', trecho)
+    # Antes de ':' o espaço pode ser um seletor descendente (a :hover)
+    trecho = re.sub(r' ?([{};,>]) ?', r'\1', trecho)
+    return re.sub(r':\s', ':', trecho).replace(';}', '}')
+
+
+def minificar_css(texto):
+    """Remove comentários e espaços desnecessários do CSS (strings intactas)"""
+    partes = re.split(r'(/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', texto, flags=re.S)
+    saida, codigo = [], ''
+    for n, parte in enumerate(partes):
+        if n % 2 == 0:
+            codigo += parte
+        elif not parte.startswith('/*'):
+            saida += [_compactar_css(codigo), parte]
+            codigo = ''
+        # Comentários são descartados: o código dos dois lados vira um trecho só
+    saida.append(_compactar_css(codigo))
+    return ''.join(saida).strip() + '\n'
+
+
+_MINIFICADORES = {'.js': minificar_js, '.css': minificar_css}
+
+
+def construir(origem=None, destino=None):
+    """Gera os arquivos com hash, as versões comprimidas e o manifest
+
+    Retorna o manifest ({arquivo original: arquivo gerado}).
+    """
+    origem = origem or os.path.join(_RAIZ, 'static')
+    destino = destino or os.path.join(_RAIZ, ESTATICOS_CONFIG['diretorio'])
+    os.makedirs(destino, exist_ok=True)
+
+    manifest = {}
+    for nome in ESTATICOS_CONFIG['arquivos']:
+        base, extensao = os.path.splitext(nome)
+        with open(os.path.join(origem, nome), encoding='utf-8') as arquivo:
+            conteudo = _MINIFICADORES[extensao](arquivo.read()).encode('utf-8')
+        gerado = f"{base}.{hashlib.sha256(conteudo).hexdigest()[:12]}{extensao}"
+        variantes = {'': conteudo, '.gz': gzip.compress(conteudo, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes['.br'] = brotli.compress(conteudo, quality=11)
+        for sufixo, dados in variantes.items():
+            with open(os.path.join(destino, gerado + sufixo), 'wb') as arquivo:
+                arquivo.write(dados)
+        manifest[nome] = gerado
+
+    # O manifest é gravado por último: uma aplicação que o encontra já tem os arquivos
+    temporario = os.path.join(destino, f"manifest.json.{os.getpid()}.tmp")
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(manifest, arquivo, indent=2)
+    os.replace(temporario, os.path.join(destino, 'manifest.json'))
+    return manifest
+
+
+def _comprimir(dados):
+    """{codificação: bytes} da página inicial, comprimida uma única vez"""
+    versoes = {'gzip': gzip.compress(dados, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versoes['br'] = brotli.compress(dados, quality=11)
+    return versoes
+
+
+class Estaticos:
+    """Arquivos do manifest e cache da página inicial de uma aplicação"""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        try:
+            with open(os.path.join(diretorio, 'manifest.json'), encoding='utf-8') as arquivo:
+                self.manifest = json.load(arquivo)
+        except (OSError, ValueError):
+            # Sem construção: os arquivos originais, pela rota /static do Flask
+            self.manifest = {}
+        self.gerados = set(self.manifest.values())
+        self._pagina = (None, None)
+
+    def url(self, nome):
+        """URL do arquivo estático: o gerado (com hash) se houver construção"""
+        gerado = self.manifest.get(nome)
+        if gerado is None:
+            return url_for('static', filename=nome)
+        return url_for('ativo', nome=gerado)
+
+    def servir(self, nome):
+        """Arquivo gerado, na melhor versão pré-comprimida aceita pelo cliente"""
+        if nome not in self.gerados:
+            abort(404)
+        tipo = mimetypes.guess_type(nome)[0]
+        aceitas = request.accept_encodings
+        for codificacao, extensao in _CODIFICACOES:
+            if aceitas[codificacao] and os.path.exists(os.path.join(self.diretorio, nome + extensao)):
+                resposta = send_from_directory(self.diretorio, nome + extensao, mimetype=tipo,
+                                               max_age=ESTATICOS_CONFIG['max_age'])
+                resposta.headers['Content-Encoding'] = codificacao
+                break
+        else:
+            resposta = send_from_directory(self.diretorio, nome, mimetype=tipo,
+                                           max_age=ESTATICOS_CONFIG['max_age'])
+        resposta.cache_control.public = True
+        resposta.cache_control.immutable = True
+        resposta.vary.add('Accept-Encoding')
+        return resposta
+
+    def pagina_inicial(self, catalogo):
+        """index.html do catálogo, renderizado só quando o catálogo muda"""
+        renderizado, pagina = self._pagina
+        if renderizado is not catalogo:
+            dados = render_template('index.html', bancos=catalogo.nomes).encode('utf-8')
+            pagina = (dados, hashlib.sha256(dados).hexdigest()[:16], _comprimir(dados))
+            self._pagina = (catalogo, pagina)
+        dados, etag, comprimidas = pagina
+
+        if request.if_none_match.contains(etag):
+            resposta = Response(status=304)
+        else:
+            codificacao = next((codificacao for codificacao, _ in _CODIFICACOES
+                                if codificacao in comprimidas and request.accept_encodings[codificacao]), None)
+            resposta = Response(comprimidas[codificacao] if codificacao else dados, mimetype='text/html')
+            if codificacao:
+                resposta.headers['Content-Encoding'] = codificacao
+        resposta.set_etag(etag)
+        # O navegador revalida a cada carga; sem mudança, a resposta é um 304 vazio
+        resposta.cache_control.no_cache = True
+        resposta.vary.add('Accept-Encoding')
+        return resposta
+
+
+def configurar_estaticos(app):
+    """Registra a rota dos arquivos gerados e a função asset() dos templates"""
+    estaticos = Estaticos(os.path.join(app.root_path, ESTATICOS_CONFIG['diretorio']))
+    app.add_url_rule(f"{ESTATICOS_CONFIG['url']}/<nome>", endpoint='ativo', view_func=estaticos.servir)
+    app.add_template_global(estaticos.url, 'asset')
+    return estaticos
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print("Uso: python estaticos.py")
+        sys.exit(1)
+    for original, gerado in construir().items():
+        caminho = os.path.join(_RAIZ, ESTATICOS_CONFIG['diretorio'], gerado)
+        print(f"✅ {original} -> {gerado} ({os.path.getsize(os.path.join(_RAIZ, 'static', original))} -> "
+              f"{os.path.getsize(caminho)} bytes, gzip {os.path.getsize(caminho + '.gz')} bytes)")
@@ -5,7 +5,7 @@ Exemplo de uso do sistema de portabilidade INSS
 Este arquivo demonstra como usar as regras de portabilidade programaticamente
 """
 
-from app import RegrasPortabilidadeINSS
+from regras_portabilidade import RegrasPortabilidadeINSS
 
 def exemplo_consulta_portabilidade():
     """Exemplo de como usar o sistema de portabilidade"""
@@ -16,7 +16,7 @@ def exemplo_consulta_portabilidade():
     # Dados de exemplo de um cliente
     dados_cliente = {
         'nome': 'João Silva',
-        'cpf': '12345678900',
+        'cpf': '12345678909',
         'idade': '65',
         'codigo_beneficio': '123456789',
         'parcelas_pagas': '18',
@@ -100,7 +100,7 @@ def exemplo_diferentes_cenarios():
         # Dados base
         dados = {
             'nome': cenario['nome'],
-            'cpf': '11122233344',
+            'cpf': '11122233396',
             'idade': cenario['idade'],
             'codigo_beneficio': cenario.get('codigo_beneficio', '123456789'),
             'parcelas_pagas': cenario['parcelas_pagas'],
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportação dos resultados de portabilidade em CSV e Excel (XLSX)
+Os arquivos são gerados em streaming, bloco a bloco: o uso de memória é o
+mesmo para 100 linhas ou para milhões, e o nome do arquivo segue o
+EXPORT_CONFIG
+"""
+
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+import lote
+from config import EXPORT_CONFIG, LOTE_CONFIG
+
+TIPOS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+COLUNAS = ('Linha', 'Nome', 'CPF', 'Situação', 'Banco', 'Tipo de Operação',
+           'Taxa Aplicável (%)', 'Observações')
+
+# Limite de linhas de uma planilha do Excel (a 1ª é o cabeçalho)
+LINHAS_POR_PLANILHA = 1048576
+
+# Caracteres de controle não permitidos em XML 1.0
+_CONTROLE_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def nome_arquivo(tipo, agora=None):
+    """Nome do arquivo de exportação: prefixo + data no formato do EXPORT_CONFIG"""
+    configuracao = EXPORT_CONFIG['CSV' if tipo == 'csv' else 'EXCEL']
+    agora = agora or datetime.now()
+    return f"{configuracao['filename_prefix']}{agora.strftime(configuracao['date_format'])}.{tipo}"
+
+
+def linhas_resultado(regras, registros, tamanho_lote=None, interromper=None, top=None, ordem='catalogo'):
+    """Gera blocos de linhas da exportação (uma linha por banco elegível)
+
+    Clientes com dados inválidos ou sem bancos elegíveis aparecem em uma
+    única linha, com a situação preenchida e as colunas do banco vazias.
+    """
+    tamanho_lote = tamanho_lote or LOTE_CONFIG['tamanho_lote']
+    inicio = 1
+    for bloco in lote._em_blocos(registros, tamanho_lote):
+        if interromper is not None and interromper():
+            yield [(inicio, '', '', "Tempo limite da requisição excedido", '', '', None, '')]
+            return
+
+        linhas = []
+        for numero, dados, erros, resultados in lote.avaliar_bloco(regras, bloco, inicio, top, ordem):
+            nome, cpf = dados.get('nome') or '', dados.get('cpf') or ''
+            if erros:
+                linhas.append((numero, nome, cpf, "Dados inválidos: " + '; '.join(erros), '', '', None, ''))
+            elif not resultados:
+                linhas.append((numero, nome, cpf, "Sem bancos elegíveis", '', '', None, ''))
+            else:
+                linhas.extend(
+                    (numero, nome, cpf, "Elegível", resultado['banco'], resultado['tipo_operacao'],
+                     resultado['taxa_aplicavel'], resultado['observacoes'])
+                    for resultado in resultados
+                )
+        inicio += len(bloco)
+        yield linhas
+
+
+def gerar_csv(blocos):
+    """Gera o CSV em bytes, um pedaço por bloco de linhas"""
+    configuracao = EXPORT_CONFIG['CSV']
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=configuracao['delimiter'])
+    escritor.writerow(COLUNAS)
+
+    for linhas in blocos:
+        escritor.writerows(linhas)
+        yield buffer.getvalue().encode(configuracao['encoding'])
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode(configuracao['encoding'])
+
+
+class _SaidaFluxo(io.RawIOBase):
+    """Destino sem seek para o ZipFile: acumula os bytes até serem drenados"""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def drenar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _celula(referencia, valor):
+    """XML de uma célula: número ou texto inline (sem tabela de strings)"""
+    if valor is None or valor == '':
+        return ''
+    if isinstance(valor, (int, float)):
+        return f'<c r="{referencia}"><v>{valor!r}</v></c>'
+    texto = escape(_CONTROLE_XML.sub('', str(valor)))
+    return f'<c r="{referencia}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+_LETRAS = tuple(chr(ord('A') + i) for i in range(len(COLUNAS)))
+
+
+def _linha_xml(numero, valores):
+    celulas = ''.join(_celula(f"{letra}{numero}", valor) for letra, valor in zip(_LETRAS, valores))
+    return f'<row r="{numero}">{celulas}</row>'
+
+
+_INICIO_PLANILHA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+_FIM_PLANILHA = '</sheetData></worksheet>'
+
+
+def _partes_pacote(planilhas):
+    """Arquivos do pacote XLSX além das planilhas, para `planilhas` nomes"""
+    tipos = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(planilhas) + 1)
+    )
+    folhas = ''.join(
+        f'<sheet name="{escape(nome)}" sheetId="{i}" r:id="rId{i}"/>'
+        for i, nome in enumerate(planilhas, 1)
+    )
+    relacoes = ''.join(
+        f'<Relationship Id="rId{i}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, len(planilhas) + 1)
+    )
+    cabecalho = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    return {
+        '[Content_Types].xml': (
+            f'{cabecalho}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            f'{tipos}</Types>'
+        ),
+        '_rels/.rels': (
+            f'{cabecalho}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>'
+        ),
+        'xl/workbook.xml': (
+            f'{cabecalho}<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{folhas}</sheets></workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            f'{cabecalho}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{relacoes}</Relationships>'
+        )
+    }
+
+
+def gerar_xlsx(blocos, nome_planilha=None, linhas_por_planilha=LINHAS_POR_PLANILHA):
+    """Gera o XLSX em bytes, em streaming e com memória constante
+
+    As planilhas são escritas direto no ZIP (texto inline, sem tabela de
+    strings compartilhadas), e os bytes comprimidos são entregues a cada
+    bloco. Acima do limite de linhas do Excel, os dados continuam em novas
+    planilhas ("Nome (2)", "Nome (3)", ...).
+    """
+    nome_planilha = (nome_planilha or EXPORT_CONFIG['EXCEL']['sheet_name'])[:31]
+    saida = _SaidaFluxo()
+    pacote = zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED)
+    planilhas = []
+    planilha = None
+    numero = 0
+
+    def abrir_planilha():
+        planilhas.append(nome_planilha if not planilhas else f"{nome_planilha[:26]} ({len(planilhas) + 1})")
+        destino = pacote.open(f"xl/worksheets/sheet{len(planilhas)}.xml", 'w', force_zip64=True)
+        destino.write((_INICIO_PLANILHA + _linha_xml(1, COLUNAS)).encode('utf-8'))
+        return destino
+
+    for linhas in blocos:
+        partes = []
+        for valores in linhas:
+            if planilha is None or numero >= linhas_por_planilha:
+                if planilha is not None:
+                    planilha.write((''.join(partes) + _FIM_PLANILHA).encode('utf-8'))
+                    planilha.close()
+                    partes = []
+                planilha = abrir_planilha()
+                numero = 1
+            numero += 1
+            partes.append(_linha_xml(numero, valores))
+        if partes:
+            planilha.write(''.join(partes).encode('utf-8'))
+        dados = saida.drenar()
+        if dados:
+            yield dados
+
+    if planilha is None:
+        planilha = abrir_planilha()
+    planilha.write(_FIM_PLANILHA.encode('utf-8'))
+    planilha.close()
+
+    for caminho, conteudo in _partes_pacote(planilhas).items():
+        pacote.writestr(caminho, conteudo)
+    pacote.close()
+    yield saida.drenar()
+
+
+def exportar(regras, registros, tipo, interromper=None, top=None, ordem='catalogo'):
+    """Gera os bytes da exportação de uma carteira no tipo pedido (csv ou xlsx)"""
+    blocos = linhas_resultado(regras, registros, interromper=interromper, top=top, ordem=ordem)
+    return gerar_csv(blocos) if tipo == 'csv' else gerar_xlsx(blocos)
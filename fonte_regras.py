@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fonte única das regras de portabilidade
+Carrega as regras do config.py ou de um arquivo JSON/YAML externo e, com o
+ObservadorRegras, recarrega o arquivo em execução sempre que ele muda
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+
+import config
+
+# Filho do logger 'portabilidade': vai para o mesmo log da aplicação
+logger = logging.getLogger('portabilidade.fonte_regras')
+
+
+def converter_regras(regras_negocio, bancos_config):
+    """Converte as seções do config para o formato usado pelo motor de regras"""
+    return {
+        'bancos': list(bancos_config['LISTA']),
+        'regras': {
+            'idade_limite': regras_negocio['IDADE_LIMITE'],
+            'parcelas_minimas': {
+                'geral': regras_negocio['PARCELAS_MINIMAS']['GERAL'],
+                'invalidez': regras_negocio['PARCELAS_MINIMAS']['INVALIDEZ']
+            },
+            'bancos_bloqueados': list(bancos_config['BLOQUEADOS']),
+            'saldo_minimo': regras_negocio['SALDO_MINIMO'],
+            'troco_minimo': regras_negocio['TROCO_MINIMO'],
+            'taxa_maxima': regras_negocio['TAXA_MAXIMA'],
+            # Regra aplicada a bancos sem regra específica
+            'regra_banco_padrao': {
+                'idade_maxima': regras_negocio['IDADE_LIMITE'],
+                'parcelas_minimas': regras_negocio['PARCELAS_MINIMAS']['GERAL'],
+                'aceita_invalidez': True,
+                'taxa_padrao': regras_negocio['TAXA_PADRAO']
+            }
+        },
+        'regras_bancos': copy.deepcopy(bancos_config['REGRAS_ESPECIFICAS'])
+    }
+
+
+def regras_do_config():
+    """Retorna as regras declaradas no config.py"""
+    return converter_regras(config.REGRAS_NEGOCIO, config.BANCOS_CONFIG)
+
+
+def ler_arquivo(caminho):
+    """Lê um arquivo de regras JSON ou YAML"""
+    with open(caminho, encoding='utf-8') as arquivo:
+        if caminho.lower().endswith(('.yaml', '.yml')):
+            # PyYAML é opcional e só é importado para arquivos YAML
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("PyYAML não instalado: use um arquivo JSON de regras") from None
+            return yaml.safe_load(arquivo)
+        return json.load(arquivo)
+
+
+def carregar_regras(caminho=None):
+    """Carrega as regras do arquivo (ou do config.py se não houver arquivo)
+
+    O arquivo usa as mesmas seções do config.py (REGRAS_NEGOCIO e
+    BANCOS_CONFIG); uma seção ausente no arquivo é lida do config.py.
+    """
+    caminho = caminho or config.REGRAS_CONFIG['arquivo']
+    if not caminho:
+        return regras_do_config()
+
+    conteudo = ler_arquivo(caminho)
+    return converter_regras(
+        conteudo.get('REGRAS_NEGOCIO', config.REGRAS_NEGOCIO),
+        conteudo.get('BANCOS_CONFIG', config.BANCOS_CONFIG)
+    )
+
+
+def versao_regras(conjunto):
+    """Identificador curto e estável do conteúdo de um conjunto de regras"""
+    serializado = json.dumps(conjunto, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()[:12]
+
+
+class ObservadorRegras(threading.Thread):
+    """Verifica periodicamente o arquivo de regras e recarrega quando muda
+
+    O novo conjunto é lido e compilado fora do caminho das consultas e só
+    então trocado na instância de regras; se o arquivo estiver inválido, as
+    regras atuais continuam em uso.
+    """
+
+    def __init__(self, regras, caminho=None, intervalo=None):
+        super().__init__(name='observador-regras', daemon=True)
+        self.regras = regras
+        self.caminho = caminho or config.REGRAS_CONFIG['arquivo']
+        self.intervalo = intervalo or config.REGRAS_CONFIG['intervalo_verificacao']
+        self._parar = threading.Event()
+        self._assinatura = self._assinatura_arquivo()
+
+    def _assinatura_arquivo(self):
+        try:
+            estado = os.stat(self.caminho)
+        except OSError:
+            return None
+        return estado.st_ino, estado.st_mtime_ns, estado.st_size
+
+    def verificar(self):
+        """Recarrega as regras se o arquivo mudou; retorna True se recarregou"""
+        assinatura = self._assinatura_arquivo()
+        if assinatura is None or assinatura == self._assinatura:
+            return False
+        self._assinatura = assinatura
+
+        try:
+            conjunto = carregar_regras(self.caminho)
+            self.regras.aplicar_regras(conjunto)
+        except Exception as erro:
+            logger.error("Regras de %s não recarregadas: %s", self.caminho, erro)
+            return False
+
+        logger.info("Regras recarregadas de %s (versão %s)", self.caminho, self.regras.versao)
+        return True
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            self.verificar()
+
+    def parar(self):
+        self._parar.set()
+
+
+if __name__ == "__main__":
+    # Exporta as regras do config.py como ponto de partida para o arquivo externo
+    if len(sys.argv) != 2:
+        print("Uso: python fonte_regras.py <arquivo_de_regras.json>")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'w', encoding='utf-8') as destino:
+        json.dump({
+            'REGRAS_NEGOCIO': config.REGRAS_NEGOCIO,
+            'BANCOS_CONFIG': config.BANCOS_CONFIG
+        }, destino, ensure_ascii=False, indent=2)
+    print(f"✅ Regras exportadas para {sys.argv[1]}")
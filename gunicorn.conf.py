@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração do Gunicorn para produção
+Uso: gunicorn app:app   (o arquivo é lido automaticamente do diretório atual)
+
+Variáveis de ambiente:
+    PORTABILIDADE_BIND      endereço (padrão 0.0.0.0:8000)
+    PORTABILIDADE_WORKERS   processos (padrão: núcleos da máquina)
+    PORTABILIDADE_WORKER    modelo de worker: gthread (padrão) ou gevent
+    PORTABILIDADE_LIMITE_BACKEND  limite por cliente: sqlite (padrão aqui), redis ou memoria
+    PORTABILIDADE_PRELOAD   1 (padrão aqui) monta a aplicação no master; 0 em cada worker
+    PORTABILIDADE_LOG       log da aplicação: - (stderr, padrão aqui) ou arquivo, com {pid} por worker
+"""
+
+import gc
+import multiprocessing
+import os
+
+# O limite por cliente precisa ser compartilhado entre os workers; definido
+# antes de importar o config (os workers herdam o ambiente do master)
+os.environ.setdefault('PORTABILIDADE_LIMITE_BACKEND', 'sqlite')
+os.environ.setdefault('PORTABILIDADE_PRELOAD', '1')
+# Vários workers não podem rotacionar o mesmo arquivo de log: a aplicação
+# grava em stderr, coletado pelo Gunicorn (errorlog) ou pelo supervisor
+os.environ.setdefault('PORTABILIDADE_LOG', '-')
+
+from config import PERFORMANCE_CONFIG  # noqa: E402
+
+bind = os.environ.get('PORTABILIDADE_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('PORTABILIDADE_WORKERS', multiprocessing.cpu_count()))
+worker_class = os.environ.get('PORTABILIDADE_WORKER', 'gthread')
+
+# Mais threads que vagas: o excedente é recusado pela aplicação com 503
+# imediato em vez de esperar na fila de conexões do Gunicorn
+threads = PERFORMANCE_CONFIG['max_concurrent_requests'] * 2
+worker_connections = PERFORMANCE_CONFIG['max_concurrent_requests'] * 10
+
+# Worker que não responde dentro do prazo é reiniciado
+timeout = PERFORMANCE_CONFIG['request_timeout']
+graceful_timeout = PERFORMANCE_CONFIG['request_timeout']
+keepalive = 5
+
+# Regras, catálogo, mapa de elegibilidade e módulos importados uma vez no
+# master: os workers herdam as páginas por fork (copy-on-write)
+preload_app = PERFORMANCE_CONFIG['preload']
+
+
+def when_ready(server):
+    # O coletor de ciclos escreve nos cabeçalhos dos objetos que percorre, o
+    # que copiaria as páginas herdadas; gc.freeze tira do coletor tudo o que
+    # já existe no master antes do fork
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Threads (log, histórico, observador de regras) e conexões não passam
+    # pelo fork: cada worker inicia as suas
+    if preload_app:
+        import app
+        app.iniciar_servicos(app.app)
+
+
+def post_worker_init(worker):
+    import memoria
+    worker.log.info("Worker %s: %s", worker.pid, memoria.relatorio(memoria.uso_memoria()))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Histórico persistente das consultas de portabilidade
+SQLite em modo WAL, gravado em lotes por uma thread de fundo: a requisição
+apenas coloca a consulta em uma fila. O CPF é guardado como HMAC, com a
+versão das regras e os resultados oferecidos
+"""
+
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from config import HISTORICO_CONFIG
+
+logger = logging.getLogger('portabilidade.historico')
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS consultas (
+    id INTEGER PRIMARY KEY,
+    momento REAL NOT NULL,
+    cpf_hash BLOB NOT NULL,
+    versao_regras TEXT NOT NULL,
+    entrada TEXT NOT NULL,
+    total_bancos INTEGER NOT NULL,
+    resultados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_consultas_cpf ON consultas (cpf_hash, momento);
+CREATE INDEX IF NOT EXISTS idx_consultas_momento ON consultas (momento);
+CREATE TABLE IF NOT EXISTS consultas_bancos (
+    banco TEXT NOT NULL,
+    momento REAL NOT NULL,
+    consulta_id INTEGER NOT NULL,
+    PRIMARY KEY (banco, momento, consulta_id)
+) WITHOUT ROWID;
+"""
+
+_CAMPOS_ENTRADA = ('nome', 'idade', 'parcelas_pagas', 'invalidez', 'codigo_beneficio',
+                   'banco_atual', 'valor_parcela', 'saldo_devedor', 'valor_total', 'taxa')
+
+
+# Campos que identificam o cliente: fora das buscas por banco, que devolvem
+# consultas de vários clientes
+_CAMPOS_IDENTIFICACAO = ('nome', 'codigo_beneficio')
+
+
+def chave_cpf(chave=None):
+    """Chave do HMAC do CPF (PORTABILIDADE_HISTORICO_CHAVE); não há chave padrão"""
+    chave = chave or HISTORICO_CONFIG['chave_cpf']
+    if not chave:
+        raise RuntimeError("Histórico ligado sem chave do HMAC do CPF: defina "
+                           "PORTABILIDADE_HISTORICO_CHAVE (ou desligue com PORTABILIDADE_HISTORICO=0)")
+    return chave
+
+
+def hash_cpf(cpf, chave=None):
+    """HMAC-SHA256 (16 bytes) dos 11 dígitos do CPF"""
+    chave = chave_cpf(chave).encode('utf-8')
+    digitos = ''.join(c for c in str(cpf) if c.isdigit())
+    return hmac.new(chave, digitos.encode('ascii'), hashlib.sha256).digest()[:16]
+
+
+def conectar(caminho):
+    """Abre o banco do histórico em WAL, criando as tabelas se necessário"""
+    conexao = sqlite3.connect(caminho, timeout=30, check_same_thread=False)
+    conexao.execute("PRAGMA journal_mode=WAL")
+    conexao.execute("PRAGMA synchronous=NORMAL")
+    conexao.executescript(ESQUEMA)
+    return conexao
+
+
+class GravadorHistorico(threading.Thread):
+    """Grava as consultas em lotes a partir de uma fila
+
+    `registrar` nunca bloqueia: com a fila cheia (banco indisponível ou
+    lento demais), a consulta não é gravada e o descarte é contado.
+    """
+
+    def __init__(self, caminho=None, chave=None, tamanho_lote=None, intervalo=None, tamanho_fila=None):
+        super().__init__(name='gravador-historico', daemon=True)
+        self.caminho = caminho or HISTORICO_CONFIG['arquivo']
+        self.chave_cpf = chave_cpf(chave)
+        self.tamanho_lote = tamanho_lote or HISTORICO_CONFIG['tamanho_lote']
+        self.intervalo = intervalo or HISTORICO_CONFIG['intervalo_gravacao']
+        self._fila = queue.Queue(tamanho_fila or HISTORICO_CONFIG['tamanho_fila'])
+        self._parar = threading.Event()
+        self.gravados = 0
+        self.descartados = 0
+        conectar(self.caminho).close()
+
+    def registrar(self, consulta, resultados, versao_regras):
+        """Coloca uma consulta (ConsultaCliente e resultados) na fila de gravação"""
+        try:
+            self._fila.put_nowait((time.time(), consulta, resultados, versao_regras))
+        except queue.Full:
+            self.descartados += 1
+
+    def _linhas(self, itens):
+        for momento, consulta, resultados, versao in itens:
+            entrada = {campo: getattr(consulta, campo) for campo in _CAMPOS_ENTRADA}
+            yield (momento, hash_cpf(consulta.cpf, self.chave_cpf), versao,
+                   json.dumps(entrada, ensure_ascii=False, default=str),
+                   len(resultados), json.dumps(resultados, ensure_ascii=False))
+
+    def _gravar(self, conexao, itens):
+        with conexao:
+            cursor = conexao.cursor()
+            for linha, (momento, _, resultados, _) in zip(self._linhas(itens), itens):
+                cursor.execute(
+                    "INSERT INTO consultas (momento, cpf_hash, versao_regras, entrada, total_bancos, resultados) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", linha
+                )
+                consulta_id = cursor.lastrowid
+                cursor.executemany(
+                    "INSERT INTO consultas_bancos (banco, momento, consulta_id) VALUES (?, ?, ?)",
+                    [(resultado['banco'], momento, consulta_id) for resultado in resultados]
+                )
+        self.gravados += len(itens)
+
+    def _retirar_lote(self):
+        """Espera até `intervalo` pelo primeiro item e junta até tamanho_lote"""
+        try:
+            itens = [self._fila.get(timeout=self.intervalo)]
+        except queue.Empty:
+            return []
+        while len(itens) < self.tamanho_lote:
+            try:
+                itens.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return itens
+
+    def run(self):
+        conexao = conectar(self.caminho)
+        try:
+            while not (self._parar.is_set() and self._fila.empty()):
+                itens = self._retirar_lote()
+                if not itens:
+                    continue
+                try:
+                    self._gravar(conexao, itens)
+                except sqlite3.Error as erro:
+                    self.descartados += len(itens)
+                    logger.error("Histórico: %d consultas não gravadas: %s", len(itens), erro)
+        finally:
+            conexao.close()
+
+    def parar(self, espera=5.0):
+        """Grava o que estiver na fila e encerra a thread"""
+        self._parar.set()
+        if self.is_alive():
+            self.join(espera)
+
+
+class LeitorHistorico:
+    """Consultas ao histórico por CPF ou por banco (uma conexão por thread)"""
+
+    def __init__(self, caminho=None, chave=None):
+        self.caminho = caminho or HISTORICO_CONFIG['arquivo']
+        self.chave_cpf = chave_cpf(chave)
+        self._local = threading.local()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = self._local.conexao = conectar(self.caminho)
+            conexao.row_factory = sqlite3.Row
+        return conexao
+
+    @staticmethod
+    def _registro(linha, identificar=True):
+        entrada = json.loads(linha['entrada'])
+        if not identificar:
+            for campo in _CAMPOS_IDENTIFICACAO:
+                entrada.pop(campo, None)
+        return {
+            'id': linha['id'],
+            'momento': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(linha['momento'])),
+            'versao_regras': linha['versao_regras'],
+            'entrada': entrada,
+            'total_bancos': linha['total_bancos'],
+            'resultados': json.loads(linha['resultados'])
+        }
+
+    def por_cpf(self, cpf, dias=None, limite=100):
+        """Consultas do CPF nos últimos `dias`, das mais recentes para as mais antigas"""
+        dias = dias or HISTORICO_CONFIG['dias_padrao']
+        linhas = self._conexao().execute(
+            "SELECT * FROM consultas WHERE cpf_hash = ? AND momento >= ? "
+            "ORDER BY momento DESC LIMIT ?",
+            (hash_cpf(cpf, self.chave_cpf), time.time() - dias * 86400, limite)
+        )
+        return [self._registro(linha) for linha in linhas]
+
+    def por_banco(self, banco, dias=None, limite=100):
+        """Consultas em que o banco foi oferecido nos últimos `dias`
+
+        São consultas de clientes diversos: saem sem nome e código do benefício.
+        """
+        dias = dias or HISTORICO_CONFIG['dias_padrao']
+        linhas = self._conexao().execute(
+            "SELECT c.* FROM consultas_bancos b JOIN consultas c ON c.id = b.consulta_id "
+            "WHERE b.banco = ? AND b.momento >= ? ORDER BY b.momento DESC LIMIT ?",
+            (banco, time.time() - dias * 86400, limite)
+        )
+        return [self._registro(linha, identificar=False) for linha in linhas]
+
+
+def iniciar_gravador():
+    """Cria e inicia o gravador do HISTORICO_CONFIG (None se desligado)"""
+    if not HISTORICO_CONFIG['enabled']:
+        return None
+    gravador = GravadorHistorico()
+    gravador.start()
+    atexit.register(gravador.parar)
+    return gravador
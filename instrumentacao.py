@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Log estruturado e métricas de latência
+O log é gravado por uma thread de fundo (QueueHandler + QueueListener), de
+modo que as requisições nunca esperam pelo disco; as métricas ficam em
+histogramas em memória, expostos no formato texto do Prometheus
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+
+from config import LOG_CONFIG
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+BUCKETS_LATENCIA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger('portabilidade')
+_handler_fila = None
+_ouvinte = None
+
+
+def mascarar_cpf(cpf):
+    """Mantém só os 3 primeiros e os 2 últimos dígitos do CPF"""
+    digitos = ''.join(c for c in str(cpf or '') if c.isdigit())
+    if len(digitos) != 11:
+        return '***'
+    return f"{digitos[:3]}.***.***-{digitos[9:]}"
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro, com os campos passados em extra={'dados': ...}"""
+
+    def format(self, registro):
+        linha = {
+            'momento': self.formatTime(registro, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': registro.levelname,
+            'logger': registro.name,
+            'mensagem': registro.getMessage()
+        }
+        dados = getattr(registro, 'dados', None)
+        if dados:
+            linha.update(dados)
+        if registro.exc_info:
+            linha['excecao'] = self.formatException(registro.exc_info)
+        return json.dumps(linha, ensure_ascii=False, default=str)
+
+
+class HandlerFila(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (e conta) registros quando a fila está cheia"""
+
+    def __init__(self, fila):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def enqueue(self, registro):
+        try:
+            self.queue.put_nowait(registro)
+        except queue.Full:
+            self.descartados += 1
+
+
+def configurar_log(configuracao=None):
+    """Liga o logger 'portabilidade' a um arquivo rotativo gravado em segundo plano
+
+    Retorna o QueueListener (já iniciado), ou None se não há arquivo de log.
+    """
+    global _handler_fila, _ouvinte
+    configuracao = configuracao or LOG_CONFIG
+    if not configuracao.get('file'):
+        return None
+    # Várias aplicações no mesmo processo compartilham o mesmo arquivo
+    if _ouvinte is not None:
+        return _ouvinte
+
+    if configuracao['file'] == '-':
+        # stderr: coletado pelo Gunicorn ou pelo supervisor (padrão no gunicorn.conf.py)
+        destino = logging.StreamHandler(sys.stderr)
+    else:
+        # A rotação não é segura entre processos: com vários workers, use
+        # {pid} no nome para um arquivo por processo
+        destino = logging.handlers.RotatingFileHandler(
+            configuracao['file'].format(pid=os.getpid()),
+            maxBytes=configuracao['max_size'],
+            backupCount=configuracao['backup_count'],
+            encoding='utf-8'
+        )
+    if configuracao.get('json', True):
+        destino.setFormatter(FormatadorJSON())
+    else:
+        destino.setFormatter(logging.Formatter(configuracao['format']))
+
+    fila = queue.Queue(configuracao.get('tamanho_fila', 10000))
+    _handler_fila = HandlerFila(fila)
+    logger.addHandler(_handler_fila)
+    logger.setLevel(configuracao['level'])
+    logger.propagate = False
+
+    _ouvinte = logging.handlers.QueueListener(fila, destino, respect_handler_level=True)
+    _ouvinte.start()
+    atexit.register(_ouvinte.stop)
+    return _ouvinte
+
+
+def registros_descartados():
+    """Registros de log perdidos porque a fila estava cheia"""
+    return _handler_fila.descartados if _handler_fila is not None else 0
+
+
+class Histograma:
+    """Histograma cumulativo de latências (buckets fixos, soma e contagem)"""
+
+    def __init__(self, buckets=BUCKETS_LATENCIA):
+        self.buckets = tuple(buckets)
+        self.contagens = [0] * (len(self.buckets) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.buckets, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+class Metricas:
+    """Histogramas de latência e contadores rotulados, seguros entre threads"""
+
+    def __init__(self, prefixo='portabilidade'):
+        self.prefixo = prefixo
+        self._histogramas = {}
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def observar(self, nome, rotulos, segundos):
+        """Registra uma latência no histograma nome{rotulos}"""
+        chave = (nome, rotulos)
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma()
+            histograma.observar(segundos)
+
+    def incrementar(self, nome, rotulos=(), valor=1):
+        """Soma valor ao contador nome{rotulos}"""
+        chave = (nome, rotulos)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def exportar(self, medidas=None):
+        """Texto no formato de exposição do Prometheus
+
+        `medidas` acrescenta valores instantâneos ({nome: valor}), como os
+        contadores do cache de consultas. Os valores são deste processo: toda
+        linha leva o rótulo pid, para que as séries de workers diferentes não
+        se misturem.
+        """
+        processo = (('pid', str(os.getpid())),)
+        linhas = []
+        with self._lock:
+            for (nome, rotulos), valor in sorted(self._contadores.items()):
+                linhas.append(f"{self.prefixo}_{nome}{_rotulos(processo + rotulos)} {valor}")
+
+            for (nome, rotulos), histograma in sorted(self._histogramas.items()):
+                metrica = f"{self.prefixo}_{nome}"
+                rotulos = processo + rotulos
+                acumulado = 0
+                for limite, contagem in zip(histograma.buckets, histograma.contagens):
+                    acumulado += contagem
+                    linhas.append(f"{metrica}_bucket{_rotulos(rotulos + (('le', repr(limite)),))} {acumulado}")
+                linhas.append(f"{metrica}_bucket{_rotulos(rotulos + (('le', '+Inf'),))} {histograma.total}")
+                linhas.append(f"{metrica}_sum{_rotulos(rotulos)} {histograma.soma:.6f}")
+                linhas.append(f"{metrica}_count{_rotulos(rotulos)} {histograma.total}")
+
+        for nome, valor in (medidas or {}).items():
+            linhas.append(f"{self.prefixo}_{nome}{_rotulos(processo)} {valor}")
+        return '\n'.join(linhas) + '\n'
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ''
+    return '{' + ','.join(f'{chave}="{valor}"' for chave, valor in rotulos) + '}'
+
+
+metricas = Metricas()
+
+
+def registrar_consulta(cpf, etapas, total_bancos=None, erros=None):
+    """Registra as latências por etapa de uma consulta e grava o log
+
+    `etapas` é uma sequência de (nome da etapa, segundos).
+    """
+    for etapa, segundos in etapas:
+        metricas.observar('etapa_segundos', (('etapa', etapa),), segundos)
+
+    if erros:
+        metricas.incrementar('consultas_total', (('resultado', 'invalida'),))
+    else:
+        metricas.incrementar('consultas_total', (('resultado', 'elegivel' if total_bancos else 'sem_bancos'),))
+
+    if logger.isEnabledFor(logging.INFO):
+        dados = {
+            'evento': 'consulta',
+            'cpf': mascarar_cpf(cpf),
+            'etapas_ms': {etapa: round(segundos * 1000, 3) for etapa, segundos in etapas}
+        }
+        if erros:
+            dados['erros'] = erros
+        else:
+            dados['total_bancos'] = total_bancos
+        logger.info('consulta', extra={'dados': dados})
+
+
+def configurar_metricas(app):
+    """Registra na app a latência total e a contagem de respostas por status"""
+
+    @app.before_request
+    def iniciar_cronometro():
+        g.inicio_requisicao = time.perf_counter()
+
+    @app.after_request
+    def medir_requisicao(resposta):
+        inicio = g.get('inicio_requisicao')
+        rotulos = (('endpoint', request.endpoint or '-'),)
+        if inicio is not None:
+            metricas.observar('requisicao_segundos', rotulos, time.perf_counter() - inicio)
+        metricas.incrementar('respostas_total', rotulos + (('status', str(resposta.status_code)),))
+        return resposta
+
+    return metricas
@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Leitura de carteiras grandes por mapeamento de memória (mmap)
+O arquivo (CSV ou largura fixa) é mapeado e dividido em faixas de bytes
+alinhadas ao fim dos registros; cada processo mapeia o mesmo arquivo e só
+recebe (início, fim) da faixa. Os campos são convertidos direto dos bytes
+para inteiros (centavos e pontos-base) do LoteColunar: o nome e os demais
+campos que as regras não usam não viram strings. Registros que o caminho
+rápido não reconhece passam pela validação completa (validar_consulta), de
+modo que a saída é a mesma do lote.py. As faixas são cortadas em quebras de
+linha: um CSV com quebra de linha dentro de um campo entre aspas é lido pelo
+módulo csv, como no lote.py, sem mmap
+"""
+
+import argparse
+import csv
+import json
+import mmap
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from itertools import count
+
+import lote
+import validacao
+from colunar import LoteColunar
+from config import LOTE_CONFIG, VALIDACAO_CONFIG
+from ranking import ORDENS
+from validacao import CAMPOS_REGRAS, normalizar_cpfs, validar_consulta
+
+FORMATOS = ('csv', 'largura_fixa')
+
+# Campos de entrada, na ordem em que os leitores os extraem
+CAMPOS = ('nome', 'cpf', 'idade', 'parcelas_pagas', 'codigo_beneficio', 'banco_atual',
+          'valor_parcela', 'saldo_devedor', 'valor_total', 'taxa')
+_CAMPOS_VALORES = frozenset(('valor_parcela', 'saldo_devedor', 'valor_total', 'taxa'))
+
+_BOM = b'\xef\xbb\xbf'
+# Caracteres ASCII visíveis: nunca removidos por strip()
+_VISIVEIS = bytes(range(0x21, 0x7f))
+
+
+def _centesimos(valor):
+    return int(Decimal(str(valor)).scaleb(2))
+
+
+# Limites do VALIDACAO_CONFIG em inteiros (valores em centavos, taxa em pontos-base)
+_NOME_MIN = VALIDACAO_CONFIG['NOME']['min_length']
+_NOME_MAX = VALIDACAO_CONFIG['NOME']['max_length']
+_IDADE_MIN = VALIDACAO_CONFIG['IDADE']['min']
+_IDADE_MAX = VALIDACAO_CONFIG['IDADE']['max']
+_PARCELAS_MIN = VALIDACAO_CONFIG['PARCELAS_PAGAS']['min']
+_PARCELAS_MAX = VALIDACAO_CONFIG['PARCELAS_PAGAS']['max']
+_CODIGO_MIN = VALIDACAO_CONFIG['CODIGO_BENEFICIO']['min_length']
+_CODIGO_MAX = VALIDACAO_CONFIG['CODIGO_BENEFICIO']['max_length']
+_VALOR_MIN = _centesimos(VALIDACAO_CONFIG['VALORES']['min'])
+_VALOR_MAX = _centesimos(VALIDACAO_CONFIG['VALORES']['max'])
+_TAXA_MIN = _centesimos(VALIDACAO_CONFIG['TAXA']['min'])
+_TAXA_MAX = _centesimos(VALIDACAO_CONFIG['TAXA']['max'])
+# CPF só com os 11 dígitos é aceito pelo caminho rápido se couber nos limites
+_CPF_SIMPLES = VALIDACAO_CONFIG['CPF']['min_length'] <= 11 <= VALIDACAO_CONFIG['CPF']['max_length']
+
+
+def detectar_formato(nome_arquivo):
+    """CSV pela extensão; qualquer outro arquivo é lido como largura fixa"""
+    return 'csv' if nome_arquivo.lower().endswith('.csv') else 'largura_fixa'
+
+
+def _valor_texto(campo):
+    """Centavos de um valor com até 2 casas ('1500.00'); None se fora do padrão"""
+    inteiro, ponto, casas = campo.partition(b'.')
+    if not inteiro.isdigit():
+        return None
+    if not ponto:
+        return int(inteiro) * 100
+    if not casas.isdigit() or len(casas) > 2:
+        return None
+    return int(inteiro) * 100 + int(casas) * (10 if len(casas) == 1 else 1)
+
+
+def _valor_implicito(campo):
+    """Centavos de um valor com 2 casas implícitas ('000150000'); None se inválido"""
+    return int(campo) if campo.isdigit() else None
+
+
+def _converter(campos, valor):
+    """Converte os campos (bytes) para os inteiros das regras
+
+    Retorna (cpf, (idade, parcelas, invalidez, saldo, total, taxa)), ou
+    None quando o registro precisa da validação completa: dado inválido ou
+    fora do formato simples (nome só com acentos, código não ASCII etc.).
+    """
+    nome, cpf, idade, parcelas, codigo, banco, parcela, saldo, total, taxa = campos
+    if len(nome) > _NOME_MAX or len(nome) - len(nome.translate(None, _VISIVEIS)) < _NOME_MIN:
+        return None
+    if not (cpf.isascii() and idade.isdigit() and parcelas.isdigit() and codigo.isascii() and banco):
+        return None
+    idade, parcelas = int(idade), int(parcelas)
+    if not (_IDADE_MIN <= idade <= _IDADE_MAX and _PARCELAS_MIN <= parcelas <= _PARCELAS_MAX
+            and _CODIGO_MIN <= len(codigo) <= _CODIGO_MAX):
+        return None
+
+    parcela, saldo, total, taxa = valor(parcela), valor(saldo), valor(total), valor(taxa)
+    for centavos in (parcela, saldo, total):
+        if centavos is None or not _VALOR_MIN <= centavos <= _VALOR_MAX:
+            return None
+    if taxa is None or not _TAXA_MIN <= taxa <= _TAXA_MAX:
+        return None
+    return cpf.decode('ascii'), (idade, parcelas, b'invalidez' in codigo.lower(), saldo, total, taxa)
+
+
+def _numpy():
+    """NumPy, importado sob demanda pelo validacao (None se não instalado)"""
+    return validacao.np if validacao._numpy() else None
+
+
+def _digitos(np, matriz):
+    """(valores, válidos) de campos só com dígitos ASCII alinhados à direita (até 18)"""
+    digitos = matriz - np.uint8(48)  # bytes fora de '0'-'9' passam de 9
+    potencias = 10 ** np.arange(matriz.shape[1] - 1, -1, -1, dtype=np.int64)
+    return digitos.astype(np.int64) @ potencias, (digitos <= 9).all(1)
+
+
+def _alinhar(np, matriz, comprimentos, largura_maxima=18):
+    """Alinha à direita campos do CSV (à esquerda, completados com \\x00),
+    completando com '0' e mantendo no máximo `largura_maxima` bytes"""
+    largura = matriz.shape[1]
+    posicoes = np.arange(largura) - (largura - comprimentos)[:, None]
+    alinhada = np.take_along_axis(matriz, np.maximum(posicoes, 0), axis=1)
+    alinhada[posicoes < 0] = 48
+    return alinhada[:, -largura_maxima:]
+
+
+def _inteiros_csv(np, matriz, comprimentos):
+    valores, validos = _digitos(np, _alinhar(np, matriz, comprimentos))
+    return valores, validos & (comprimentos > 0) & (comprimentos <= 18)
+
+
+def _centavos_csv(np, matriz, comprimentos):
+    """Centavos de valores '1500' ou '1500.00' (outras formas ficam para a validação completa)"""
+    alinhada = _alinhar(np, matriz, comprimentos, 16)
+    inteiros, validos = _digitos(np, alinhada)
+    valores = inteiros * 100
+    if alinhada.shape[1] >= 4:
+        com_ponto = alinhada[:, -3] == 46
+        decimais, decimais_ok = _digitos(np, np.concatenate((alinhada[:, :-3], alinhada[:, -2:]), axis=1))
+        valores = np.where(com_ponto, decimais, valores)
+        validos = np.where(com_ponto, decimais_ok & (comprimentos >= 4), validos)
+    return valores, validos & (comprimentos > 0) & (comprimentos <= 16)
+
+
+def _cheios(np, matriz):
+    """Bytes que bytes.strip() não remove"""
+    return (matriz != 32) & ((matriz < 9) | (matriz > 13))
+
+
+def _extensao(np, cheios):
+    """Comprimento de cada campo sem o preenchimento das pontas"""
+    largura = cheios.shape[1]
+    primeira = cheios.argmax(1)
+    ultima = largura - 1 - cheios[:, ::-1].argmax(1)
+    return np.where(cheios.any(1), ultima - primeira + 1, 0)
+
+
+def _nomes_validos(np, matriz):
+    """Nomes com ao menos _NOME_MIN caracteres ASCII visíveis (nunca removidos por strip)"""
+    return np.count_nonzero(matriz - np.uint8(33) < 94, axis=1) >= _NOME_MIN
+
+
+def _cpfs_validos(np, matriz):
+    """CPFs de 11 dígitos (matriz N x 11) com os dígitos verificadores corretos"""
+    digitos = matriz.astype(np.int64) - 48
+    dv1 = digitos[:, :9] @ np.arange(10, 1, -1) * 10 % 11 % 10
+    dv2 = (digitos[:, :9] @ np.arange(11, 2, -1) + 2 * dv1) * 10 % 11 % 10
+    return (((matriz - np.uint8(48)) <= 9).all(1) & (digitos[:, 9] == dv1)
+            & (digitos[:, 10] == dv2) & (digitos != digitos[:, :1]).any(1))
+
+
+def _chaves(validos, idade, parcelas, invalidez, valores):
+    """Aplica os limites do VALIDACAO_CONFIG e monta as chaves de inteiros das regras"""
+    parcela, saldo, total, taxa = valores
+    validos &= (idade >= _IDADE_MIN) & (idade <= _IDADE_MAX)
+    validos &= (parcelas >= _PARCELAS_MIN) & (parcelas <= _PARCELAS_MAX)
+    for valor in (parcela, saldo, total):
+        validos &= (valor >= _VALOR_MIN) & (valor <= _VALOR_MAX)
+    validos &= (taxa >= _TAXA_MIN) & (taxa <= _TAXA_MAX)
+    chaves = list(zip(idade.tolist(), parcelas.tolist(), invalidez,
+                      saldo.tolist(), total.tolist(), taxa.tolist()))
+    return validos.tolist(), chaves
+
+
+def _matriz(np, coluna):
+    """Coluna de bytes como matriz uint8 (N x maior campo), completada com \\x00"""
+    texto = np.array(coluna, dtype=bytes)
+    return texto.view(np.uint8).reshape(len(texto), texto.itemsize)
+
+
+def _textos(coluna):
+    """Coluna de campos ASCII (bytes) decodificada de uma só vez"""
+    return b'\n'.join(coluna).decode('latin-1').split('\n')
+
+
+class LeitorCSV:
+    """Extrai os campos de uma linha CSV pelas posições do cabeçalho"""
+
+    def __init__(self, cabecalho, delimitador=None):
+        self.cabecalho = cabecalho
+        self.delimitador = delimitador or LOTE_CONFIG['csv_delimiter']
+        self._separador = self.delimitador.encode('ascii')
+        posicoes = {nome: i for i, nome in enumerate(cabecalho)}
+        self._indices = [posicoes.get(campo) for campo in CAMPOS]
+        if None in self._indices:
+            self._indices = None  # coluna ausente: só a validação completa dá as mensagens
+
+    valor = staticmethod(_valor_texto)
+
+    def converter(self, np, dados, primeira_linha):
+        """Converte a faixa inteira de uma vez, coluna a coluna
+
+        Retorna (números das linhas, linhas, CPFs, válidos, chaves); linhas
+        com aspas ou com outro número de campos entram vazias e, recusadas,
+        vão para a validação completa. None se faltam colunas no cabeçalho.
+        """
+        if self._indices is None or not _CPF_SIMPLES:
+            return None
+        numeros, linhas = [], []
+        for numero, linha in zip(count(primeira_linha), dados.split(b'\n')):
+            if linha.strip():
+                numeros.append(numero)
+                linhas.append(linha)
+        if b'\r' in dados:
+            linhas = [linha.rstrip(b'\r') for linha in linhas]
+        separador = self._separador
+        registros = [linha.split(separador) for linha in linhas]
+        vazio = [b''] * len(self.cabecalho)
+        aspas = b'"' in dados
+        for i, partes in enumerate(registros):
+            if len(partes) != len(vazio) or aspas and b'"' in linhas[i]:
+                registros[i] = vazio
+        if not registros:
+            return [], [], [], [], []
+
+        transposta = list(zip(*registros))
+        nome, cpf, idade, parcelas, codigo, banco, *valores = (transposta[i] for i in self._indices)
+
+        def comprimentos(coluna):
+            return np.fromiter(map(len, coluna), dtype=np.int64, count=len(coluna))
+
+        validos = _nomes_validos(np, _matriz(np, nome)) & (comprimentos(nome) <= _NOME_MAX)
+        validos &= comprimentos(banco) > 0
+        matriz_cpf = _matriz(np, cpf)
+        validos &= comprimentos(cpf) == 11
+        validos &= _cpfs_validos(np, matriz_cpf[:, :11]) if matriz_cpf.shape[1] >= 11 else False
+
+        tamanho_codigo = comprimentos(codigo)
+        validos &= (tamanho_codigo >= _CODIGO_MIN) & (tamanho_codigo <= _CODIGO_MAX)
+        validos &= np.fromiter(map(bytes.isascii, codigo), dtype=bool, count=len(codigo))
+        invalidez = [b'invalidez' in texto.lower() for texto in codigo]
+
+        idade, idade_ok = _inteiros_csv(np, _matriz(np, idade), comprimentos(idade))
+        parcelas, parcelas_ok = _inteiros_csv(np, _matriz(np, parcelas), comprimentos(parcelas))
+        validos &= idade_ok & parcelas_ok
+        centavos = []
+        for coluna in valores:
+            valor, valor_ok = _centavos_csv(np, _matriz(np, coluna), comprimentos(coluna))
+            validos &= valor_ok
+            centavos.append(valor)
+        return (numeros, linhas, _textos(cpf)) + _chaves(validos, idade, parcelas, invalidez, centavos)
+
+    def campos(self, linha):
+        """Campos em bytes, na ordem de CAMPOS; None se a linha tem aspas"""
+        if self._indices is None or b'"' in linha:
+            return None
+        partes = linha.split(self._separador)
+        if len(partes) != len(self.cabecalho):
+            return None
+        return [partes[i] for i in self._indices]
+
+    def registro(self, linha):
+        """Dict de strings igual ao do csv.DictReader, para a validação completa"""
+        valores = next(csv.reader([linha.decode('utf-8', 'replace')], delimiter=self.delimitador), [])
+        registro = dict(zip(self.cabecalho, valores))
+        if len(valores) > len(self.cabecalho):
+            registro[None] = valores[len(self.cabecalho):]
+        return registro
+
+
+class LeitorLarguraFixa:
+    """Extrai os campos de um registro de largura fixa pelo layout do LOTE_CONFIG"""
+
+    def __init__(self, layout=None):
+        layout = layout or LOTE_CONFIG['layout_largura_fixa']
+        self._fatias = [slice(inicio, inicio + largura) for inicio, largura in
+                        (layout[campo] for campo in CAMPOS)]
+        self._fim = max(fatia.stop for fatia in self._fatias)
+        # Conversão vetorizada: CPF com exatamente 11 posições e números de até 18
+        larguras = dict(zip(CAMPOS, (fatia.stop - fatia.start for fatia in self._fatias)))
+        self._vetorizavel = _CPF_SIMPLES and larguras['cpf'] == 11 and all(
+            larguras[campo] <= 18 for campo in ('idade', 'parcelas_pagas', *_CAMPOS_VALORES))
+
+    valor = staticmethod(_valor_implicito)
+
+    def converter(self, np, dados, primeira_linha):
+        """Como LeitorCSV.converter, mas sem cópia: a faixa vira uma matriz
+        (registros x largura) sobre os próprios bytes. None se os registros
+        não têm todos a mesma largura (linhas em branco, por exemplo).
+        """
+        quebra = dados.find(b'\n')
+        largura = quebra + 1
+        if not self._vetorizavel or quebra == -1 or len(dados) % largura or self._fim >= largura:
+            return None
+        matriz = np.frombuffer(dados, dtype=np.uint8).reshape(-1, largura)
+        if not (matriz[:, -1] == 10).all():
+            return None
+        nome, cpf, idade, parcelas, codigo, banco, *valores = (matriz[:, fatia] for fatia in self._fatias)
+
+        validos = _nomes_validos(np, nome) & (_extensao(np, _cheios(np, nome)) <= _NOME_MAX)
+        validos &= _cheios(np, banco).any(1)
+        validos &= _cpfs_validos(np, cpf)
+
+        tamanho_codigo = _extensao(np, _cheios(np, codigo))
+        validos &= (tamanho_codigo >= _CODIGO_MIN) & (tamanho_codigo <= _CODIGO_MAX) & (codigo < 128).all(1)
+        codigos = np.ascontiguousarray(codigo).view(f'S{codigo.shape[1]}').ravel().tolist()
+        invalidez = [b'invalidez' in texto.lower() for texto in codigos]
+
+        idade, idade_ok = _digitos(np, idade)
+        parcelas, parcelas_ok = _digitos(np, parcelas)
+        validos &= idade_ok & parcelas_ok
+        centavos = []
+        for coluna in valores:
+            valor, valor_ok = _digitos(np, coluna)
+            validos &= valor_ok
+            centavos.append(valor)
+
+        cpfs = _textos(np.ascontiguousarray(cpf).view('S11').ravel().tolist())
+        numeros = range(primeira_linha, primeira_linha + len(matriz))
+        return (numeros, _Linhas(dados, largura), cpfs) + _chaves(validos, idade, parcelas, invalidez, centavos)
+
+    def campos(self, linha):
+        return [linha[fatia].strip() for fatia in self._fatias]
+
+    def registro(self, linha):
+        registro = {}
+        for campo, valor in zip(CAMPOS, self.campos(linha)):
+            if campo in _CAMPOS_VALORES and valor.isdigit():
+                centavos = int(valor)
+                registro[campo] = f"{centavos // 100}.{centavos % 100:02d}"
+            else:
+                registro[campo] = valor.decode('utf-8', 'replace')
+        return registro
+
+
+class _Linhas:
+    """Registros de largura fixa de uma faixa, acessados pela posição"""
+
+    def __init__(self, dados, largura):
+        self.dados = dados
+        self.largura = largura
+
+    def __getitem__(self, i):
+        return self.dados[i * self.largura:(i + 1) * self.largura].rstrip(b'\r\n')
+
+
+def abrir(caminho):
+    """Mapeia o arquivo somente para leitura (None se estiver vazio)"""
+    with open(caminho, 'rb') as arquivo:
+        try:
+            return mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # arquivo vazio não pode ser mapeado
+            return None
+
+
+def preparar(buffer, formato):
+    """Retorna (leitor, posição do primeiro registro) do arquivo mapeado"""
+    inicio = len(_BOM) if buffer[:len(_BOM)] == _BOM else 0
+    if formato != 'csv':
+        return LeitorLarguraFixa(), inicio
+    quebra = buffer.find(b'\n', inicio)
+    fim = len(buffer) if quebra == -1 else quebra + 1
+    linha = buffer[inicio:fim].decode('utf-8').rstrip('\r\n')
+    cabecalho = next(csv.reader([linha], delimiter=LOTE_CONFIG['csv_delimiter']), [])
+    return LeitorCSV(cabecalho), fim
+
+
+def quebra_entre_aspas(buffer, inicio=0):
+    """True se algum campo entre aspas do CSV atravessa uma quebra de linha
+
+    Só as linhas com aspas são examinadas: com um número ímpar de aspas, um
+    campo continua na linha seguinte (aspas escapadas, "", não mudam a paridade).
+    """
+    aspas = buffer.find(b'"', inicio)
+    while aspas != -1:
+        comeco = max(buffer.rfind(b'\n', inicio, aspas) + 1, inicio)
+        fim = buffer.find(b'\n', aspas)
+        fim = len(buffer) if fim == -1 else fim
+        if buffer[comeco:fim].count(b'"') % 2:
+            return True
+        aspas = buffer.find(b'"', fim)
+    return False
+
+
+def faixas(buffer, inicio=0, tamanho=None):
+    """Gera (início, fim, número da primeira linha) de faixas alinhadas aos registros
+
+    Cada faixa tem cerca de `tamanho` bytes e termina logo após uma quebra
+    de linha. Os registros são numerados pela linha no arquivo (sem contar
+    o cabeçalho), como no lote.py quando não há linhas em branco.
+    """
+    tamanho = tamanho or LOTE_CONFIG['bytes_por_faixa']
+    total = len(buffer)
+    linha = 1
+    while inicio < total:
+        fim = min(inicio + tamanho, total)
+        if fim < total:
+            quebra = buffer.find(b'\n', fim - 1)
+            fim = total if quebra == -1 else quebra + 1
+        yield inicio, fim, linha
+        linha += buffer[inicio:fim].count(b'\n')
+        inicio = fim
+
+
+def _validar_registro(leitor, numero, linha):
+    """Validação completa (validar_consulta) de um registro recusado pelo caminho rápido"""
+    dados = leitor.registro(linha)
+    consulta, erros = validar_consulta(dados)
+    if erros:
+        return numero, dados.get('cpf'), None, erros
+    chave = consulta[:CAMPOS_REGRAS]
+    return numero, dados.get('cpf'), chave[:3] + tuple(int(valor.scaleb(2)) for valor in chave[3:]), None
+
+
+def ler_faixa(buffer, inicio, fim, primeira_linha, leitor):
+    """Lê os registros de uma faixa
+
+    Retorna uma lista de (linha, cpf, chave, erros) na ordem do arquivo:
+    `chave` são os inteiros das regras (idade, parcelas, invalidez, saldo e
+    total em centavos, taxa em pontos-base), ou None com os `erros`. Com
+    NumPy, cada campo é convertido para a faixa inteira de uma vez.
+    """
+    dados = buffer[inicio:fim]
+    np = _numpy()
+    convertido = leitor.converter(np, dados, primeira_linha) if np is not None else None
+    if convertido is not None:
+        numeros, linhas, cpfs, validos, chaves = convertido
+        registros = list(zip(numeros, cpfs, chaves, [None] * len(chaves)))
+        for i, valido in enumerate(validos):
+            if not valido:
+                registros[i] = _validar_registro(leitor, numeros[i], linhas[i])
+        return registros
+
+    registros = []
+    brutos = []
+    for numero, linha in zip(count(primeira_linha), dados.split(b'\n')):
+        if not linha.strip():
+            continue
+        linha = linha.rstrip(b'\r')
+        campos = leitor.campos(linha)
+        registros.append((numero, _converter(campos, leitor.valor) if campos is not None else None))
+        brutos.append(linha)
+
+    # Dígitos verificadores de todos os CPFs do caminho rápido de uma vez
+    cpfs = iter(normalizar_cpfs([convertido[0] for _, convertido in registros if convertido is not None]))
+    return [
+        (numero, convertido[0], convertido[1], None)
+        if convertido is not None and next(cpfs) is not None
+        else _validar_registro(leitor, numero, linha)
+        for (numero, convertido), linha in zip(registros, brutos)
+    ]
+
+
+def processar_faixa(regras, registros, top=None, ordem='catalogo'):
+    """Avalia os registros de ler_faixa e retorna as linhas JSON do lote.py
+
+    Cada combinação distinta de campos das regras entra uma única vez no
+    LoteColunar avaliado, e seu resultado é serializado uma única vez.
+    """
+    distintos = LoteColunar()
+    posicoes = {}
+    for _, _, chave, _ in registros:
+        if chave is not None and chave not in posicoes:
+            posicoes[chave] = len(distintos)
+            distintos.adicionar_inteiros(*chave, linha=len(distintos))
+
+    serializados = [None] * len(distintos)
+    for posicao, resultados in regras.consultar_colunar(distintos, top, ordem):
+        serializados[posicao] = (json.dumps(resultados), len(resultados))
+
+    return [
+        lote.linha_erro(numero, json.dumps(cpf), erros) if chave is None
+        else lote.linha_resultado(numero, json.dumps(cpf), *serializados[posicoes[chave]])
+        for numero, cpf, chave, erros in registros
+    ]
+
+
+# Estado de cada processo trabalhador: (regras, arquivo mapeado, leitor, top, ordem)
+_estado = None
+
+
+def _inicializar_trabalhador(caminho, formato, top, ordem):
+    global _estado
+    from regras_portabilidade import RegrasPortabilidadeINSS
+    buffer = abrir(caminho)
+    _estado = (RegrasPortabilidadeINSS(), buffer, preparar(buffer, formato)[0], top, ordem)
+
+
+def _texto(linhas):
+    return '\n'.join(linhas) + '\n' if linhas else ''
+
+
+def _processar(inicio, fim, primeira_linha):
+    regras, buffer, leitor, top, ordem = _estado
+    registros = ler_faixa(buffer, inicio, fim, primeira_linha, leitor)
+    return _texto(processar_faixa(regras, registros, top, ordem))
+
+
+def consultar_arquivo(caminho, formato=None, trabalhadores=None, tamanho_faixa=None,
+                      top=None, ordem='catalogo'):
+    """Gera os trechos de saída (JSON lines) de um arquivo, na ordem da entrada
+
+    Com mais de um trabalhador, cada processo mapeia o arquivo e recebe só
+    os limites das faixas; no máximo `blocos_por_trabalhador` faixas ficam
+    em processamento por trabalhador.
+    """
+    import paralelo
+
+    formato = formato or detectar_formato(caminho)
+    buffer = abrir(caminho)
+    if buffer is None:
+        return
+    try:
+        leitor, inicio = preparar(buffer, formato)
+        trabalhadores = paralelo.numero_trabalhadores(trabalhadores)
+        if formato == 'csv' and quebra_entre_aspas(buffer, inicio):
+            # Registros de mais de uma linha: as faixas não podem ser cortadas
+            # em qualquer quebra, então o arquivo segue pelo caminho do lote.py
+            with open(caminho, encoding=LOTE_CONFIG['encoding'], newline='') as arquivo:
+                if trabalhadores == 1:
+                    from regras_portabilidade import RegrasPortabilidadeINSS
+                    yield from lote.consultar_lote(RegrasPortabilidadeINSS(), lote.ler_registros(arquivo),
+                                                   top=top, ordem=ordem)
+                else:
+                    yield from paralelo.consultar_lote_paralelo(arquivo, 'csv', trabalhadores,
+                                                                top=top, ordem=ordem)
+            return
+        if trabalhadores == 1:
+            from regras_portabilidade import RegrasPortabilidadeINSS
+            regras = RegrasPortabilidadeINSS()
+            for faixa in faixas(buffer, inicio, tamanho_faixa):
+                yield _texto(processar_faixa(regras, ler_faixa(buffer, *faixa, leitor), top, ordem))
+            return
+
+        limite = trabalhadores * LOTE_CONFIG['blocos_por_trabalhador']
+        pendentes = deque()
+        with ProcessPoolExecutor(max_workers=trabalhadores, initializer=_inicializar_trabalhador,
+                                 initargs=(caminho, formato, top, ordem)) as executor:
+            for faixa in faixas(buffer, inicio, tamanho_faixa):
+                pendentes.append(executor.submit(_processar, *faixa))
+                if len(pendentes) >= limite:
+                    yield pendentes.popleft().result()
+            while pendentes:
+                yield pendentes.popleft().result()
+    finally:
+        buffer.close()
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(
+        description='Consulta em lote de arquivos grandes (CSV ou largura fixa) via mmap',
+        epilog='CSV com quebra de linha dentro de um campo entre aspas é lido sem mmap, '
+               'pelo módulo csv (mesmo caminho do lote.py)'
+    )
+    parser.add_argument('entrada', help='arquivo de clientes')
+    parser.add_argument('-o', '--saida', help='arquivo JSON lines de saída (padrão: stdout)')
+    parser.add_argument('-f', '--formato', choices=FORMATOS,
+                        help='formato da entrada (padrão: .csv é CSV, demais largura fixa)')
+    parser.add_argument('-w', '--trabalhadores', type=int, default=LOTE_CONFIG['trabalhadores'],
+                        help='processos em paralelo (0 = todos os núcleos)')
+    parser.add_argument('--bytes-por-faixa', type=int, default=LOTE_CONFIG['bytes_por_faixa'],
+                        help='tamanho aproximado de cada faixa do arquivo')
+    parser.add_argument('--top', type=int, help='só os N melhores bancos de cada cliente')
+    parser.add_argument('--ordem', choices=ORDENS, default='catalogo',
+                        help='ordem dos bancos (taxa = menor taxa aplicável primeiro)')
+    args = parser.parse_args(argv)
+    if args.top is not None and args.top < 1:
+        parser.error('--top deve ser um número inteiro positivo')
+
+    saida = open(args.saida, 'w', encoding='utf-8') if args.saida else sys.stdout
+    inicio = time.perf_counter()
+    try:
+        for trecho in consultar_arquivo(args.entrada, args.formato, args.trabalhadores,
+                                        args.bytes_por_faixa, args.top, args.ordem):
+            saida.write(trecho)
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    print(f"✅ {args.entrada} processado em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Limite de requisições por cliente (SECURITY_CONFIG['rate_limit'])
+Algoritmo GCRA (equivalente a um token bucket): cada cliente ocupa um único
+número, o instante teórico da próxima requisição. Backends em memória (um
+processo), SQLite (compartilhado entre os workers da máquina) ou Redis
+"""
+
+import sqlite3
+import threading
+import time
+
+from flask import jsonify, request
+
+from config import SECURITY_CONFIG
+
+try:
+    import redis
+except ImportError:  # redis é opcional: só o backend 'redis' depende dele
+    redis = None
+
+
+class BackendMemoria:
+    """Instantes teóricos em um dict do próprio processo"""
+
+    def __init__(self, limpar_a_cada=10000, relogio=time.monotonic):
+        self.relogio = relogio
+        self._tats = {}
+        self._lock = threading.Lock()
+        self._limpar_a_cada = limpar_a_cada
+        self._chamadas = 0
+
+    def consumir(self, chave, intervalo, tolerancia):
+        """Registra uma requisição; retorna 0 se permitida ou os segundos de espera"""
+        with self._lock:
+            agora = self.relogio()
+            tat = max(self._tats.get(chave, agora), agora)
+            if tat - agora > tolerancia:
+                return tat - tolerancia - agora
+            self._tats[chave] = tat + intervalo
+
+            # Clientes com o balde cheio de novo equivalem a clientes ausentes
+            self._chamadas += 1
+            if self._chamadas >= self._limpar_a_cada:
+                self._chamadas = 0
+                self._tats = {c: t for c, t in self._tats.items() if t > agora}
+            return 0.0
+
+    def __len__(self):
+        return len(self._tats)
+
+
+class BackendSQLite:
+    """Instantes teóricos em um arquivo SQLite compartilhado pelos workers
+
+    Uma única instrução (upsert condicional) decide e registra a requisição:
+    se nenhuma linha muda, o cliente passou do limite.
+    """
+
+    _CONSUMIR = (
+        "INSERT INTO limites (chave, tat) VALUES (?1, ?2 + ?3) "
+        "ON CONFLICT (chave) DO UPDATE SET tat = max(tat, ?2) + ?3 "
+        "WHERE max(tat, ?2) - ?2 <= ?4"
+    )
+
+    def __init__(self, caminho, limpar_a_cada=10000, relogio=time.time):
+        self.caminho = caminho
+        # Relógio de parede: precisa ser o mesmo em todos os processos
+        self.relogio = relogio
+        self._local = threading.local()
+        self._limpar_a_cada = limpar_a_cada
+        self._chamadas = 0
+        # Conexão própria, fechada em seguida: com preload o backend é criado
+        # no master, e uma conexão aberta não pode passar para os workers
+        conexao = sqlite3.connect(self.caminho, timeout=5)
+        try:
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS limites (chave TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID"
+            )
+        finally:
+            conexao.close()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None,
+                                      check_same_thread=False)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            # Perder contadores em uma queda de energia é aceitável
+            conexao.execute("PRAGMA synchronous=OFF")
+            self._local.conexao = conexao
+        return conexao
+
+    def consumir(self, chave, intervalo, tolerancia):
+        """Registra uma requisição; retorna 0 se permitida ou os segundos de espera"""
+        conexao = self._conexao()
+        agora = self.relogio()
+        if conexao.execute(self._CONSUMIR, (chave, agora, intervalo, tolerancia)).rowcount:
+            self._chamadas += 1
+            if self._chamadas >= self._limpar_a_cada:
+                self._chamadas = 0
+                conexao.execute("DELETE FROM limites WHERE tat <= ?", (agora,))
+            return 0.0
+
+        linha = conexao.execute("SELECT tat FROM limites WHERE chave = ?", (chave,)).fetchone()
+        return max(linha[0] - tolerancia - agora, 0.0) if linha else 0.0
+
+
+class BackendRedis:
+    """Instantes teóricos em um Redis (ou serviço compatível) compartilhado
+
+    `cliente` é qualquer objeto com o método eval do redis-py; sem ele, a
+    conexão é aberta em `url` (requer o pacote redis).
+    """
+
+    _SCRIPT = """
+local agora = tonumber(ARGV[1])
+local intervalo = tonumber(ARGV[2])
+local tolerancia = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or agora)
+if tat < agora then tat = agora end
+if tat - agora > tolerancia then
+    return tostring(tat - tolerancia - agora)
+end
+redis.call('SET', KEYS[1], tat + intervalo, 'PX', math.ceil((tat + intervalo - agora) * 1000))
+return '0'
+"""
+
+    def __init__(self, url=None, cliente=None, prefixo='limite:', relogio=time.time):
+        if cliente is None:
+            if redis is None:
+                raise RuntimeError("Pacote redis não instalado: use o backend 'sqlite' ou 'memoria'")
+            cliente = redis.Redis.from_url(url)
+        self.cliente = cliente
+        self.prefixo = prefixo
+        self.relogio = relogio
+
+    def consumir(self, chave, intervalo, tolerancia):
+        """Registra uma requisição; retorna 0 se permitida ou os segundos de espera"""
+        espera = self.cliente.eval(self._SCRIPT, 1, self.prefixo + chave,
+                                   self.relogio(), intervalo, tolerancia)
+        return float(espera)
+
+
+class LimitadorTaxa:
+    """Permite até max_requests por janela, com rajadas de até max_requests"""
+
+    def __init__(self, max_requests, window, backend=None):
+        self.max_requests = max_requests
+        self.window = window
+        # Uma requisição "custa" window / max_requests segundos do balde
+        self.intervalo = window / max_requests
+        self.tolerancia = window - self.intervalo
+        self.backend = backend or BackendMemoria()
+
+    def consumir(self, chave):
+        """Retorna 0 se a requisição é permitida ou os segundos até a próxima"""
+        return self.backend.consumir(chave, self.intervalo, self.tolerancia)
+
+
+def criar_backend(configuracao):
+    """Cria o backend indicado em rate_limit['backend']"""
+    nome = configuracao.get('backend', 'memoria')
+    if nome == 'memoria':
+        return BackendMemoria()
+    if nome == 'sqlite':
+        return BackendSQLite(configuracao['sqlite_path'])
+    if nome == 'redis':
+        return BackendRedis(configuracao['redis_url'])
+    raise ValueError(f"Backend de limite desconhecido: {nome}")
+
+
+def configurar_limite(app, configuracao=None):
+    """Registra na app o limite por cliente em todos os endpoints, exceto os livres
+
+    A lista é de exceções (página, arquivos estáticos, métricas) para que uma
+    rota nova já nasça limitada.
+    """
+    configuracao = configuracao or SECURITY_CONFIG['rate_limit']
+    if not configuracao['enabled']:
+        return None
+
+    limitador = LimitadorTaxa(configuracao['max_requests'], configuracao['window'],
+                              criar_backend(configuracao))
+    livres = frozenset(configuracao.get('endpoints_livres', ('index', 'static', 'ativo', 'metrics')))
+
+    @app.before_request
+    def limitar_cliente():
+        if request.endpoint in livres:
+            return None
+        espera = limitador.consumir(request.remote_addr or '-')
+        if not espera:
+            return None
+        resposta = jsonify({'erro': True, 'mensagens': ["Limite de consultas excedido, tente novamente mais tarde"]})
+        resposta.status_code = 429
+        resposta.headers['Retry-After'] = str(int(espera) + 1)
+        return resposta
+
+    return limitador
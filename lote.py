@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Consulta de portabilidade em lote
+Processa carteiras inteiras de clientes (CSV ou JSON lines) e devolve um
+resultado JSON por cliente, uma linha por registro, na ordem de entrada
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from itertools import count, islice
+
+from config import LOTE_CONFIG
+from ranking import ORDENS
+from validacao import CAMPOS_REGRAS, normalizar_cpfs, validar_consulta
+
+FORMATOS = ('csv', 'jsonl')
+
+
+def detectar_formato(nome_arquivo=None, tipo_conteudo=None):
+    """Descobre o formato da entrada pela extensão ou pelo Content-Type"""
+    nome = (nome_arquivo or '').lower()
+    tipo = (tipo_conteudo or '').lower()
+    if nome.endswith(('.jsonl', '.ndjson', '.json')) or 'json' in tipo:
+        return 'jsonl'
+    return 'csv'
+
+
+class RegistroInvalido(dict):
+    """Registro que não pôde ser lido (ex.: linha JSON malformada)
+
+    Vazio como dict; segue no lote na mesma posição, com os `erros` no lugar
+    da validação, para que a linha de saída aponte o registro com problema.
+    """
+
+    def __init__(self, erros):
+        super().__init__()
+        self.erros = erros
+
+
+def ler_registros(arquivo, formato='csv'):
+    """Gera os registros (dicts de strings) de um arquivo texto"""
+    if formato == 'csv':
+        for registro in csv.DictReader(arquivo, delimiter=LOTE_CONFIG['csv_delimiter']):
+            yield registro
+        return
+
+    for linha in arquivo:
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError as erro:
+            yield RegistroInvalido([f"Linha não é um JSON válido: {erro}"])
+            continue
+        if not isinstance(registro, dict):
+            yield RegistroInvalido(["Linha deve ser um objeto JSON"])
+            continue
+        yield _campos_texto(registro)
+
+
+def _campos_texto(registro):
+    """Campos de um objeto JSON no formato do formulário (todos como texto)
+
+    null vira campo vazio, como no CSV, para que os campos obrigatórios sejam
+    cobrados; booleanos, listas e objetos não têm forma de texto e tornam o
+    registro inválido.
+    """
+    campos = {}
+    erros = []
+    for chave, valor in registro.items():
+        if valor is None:
+            campos[chave] = ''
+        elif isinstance(valor, str):
+            campos[chave] = valor
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            campos[chave] = str(valor)
+        else:
+            erros.append(f"Campo {chave} deve ser texto ou número")
+    return RegistroInvalido(erros) if erros else campos
+
+
+def _validar(dados, cpf_normalizado):
+    """validar_consulta, com os erros de leitura de um RegistroInvalido"""
+    if isinstance(dados, RegistroInvalido):
+        return None, dados.erros
+    return validar_consulta(dados, cpf_normalizado)
+
+
+def _em_blocos(iteravel, tamanho):
+    """Agrupa um iterável em listas de até `tamanho` itens"""
+    iterador = iter(iteravel)
+    while True:
+        bloco = list(islice(iterador, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+def avaliar_bloco(regras, registros, inicio=1, top=None, ordem='catalogo'):
+    """Gera (linha, dados, erros, resultados) para cada registro do bloco
+
+    Mesmo caminho de processar_bloco (CPFs verificados juntos, uma avaliação
+    por combinação distinta de campos relevantes), para quem precisa dos
+    resultados em vez das linhas JSON. Os resultados de clientes com a mesma
+    combinação são a mesma lista: não devem ser alterados.
+    """
+    avaliados = {}
+    cpfs = normalizar_cpfs([dados.get('cpf') for dados in registros])
+
+    for numero, dados, cpf_normalizado in zip(count(inicio), registros, cpfs):
+        consulta, erros = _validar(dados, cpf_normalizado)
+        if erros:
+            yield numero, dados, erros, None
+            continue
+
+        chave = consulta[:CAMPOS_REGRAS]
+        resultados = avaliados.get(chave)
+        if resultados is None:
+            resultados = avaliados[chave] = regras.tabela.avaliar(*chave, top, ordem)
+        yield numero, dados, None, resultados
+
+
+def linha_erro(numero, cpf, erros):
+    """Linha JSON de um registro inválido (`cpf` já serializado)"""
+    return f'{{"linha": {numero}, "cpf": {cpf}, "erro": true, "mensagens": {json.dumps(erros)}}}'
+
+
+def linha_resultado(numero, cpf, resultados, total_bancos):
+    """Linha JSON de um registro avaliado (`cpf` e `resultados` já serializados)"""
+    return (f'{{"linha": {numero}, "cpf": {cpf}, "erro": false, '
+            f'"resultados": {resultados}, "total_bancos": {total_bancos}}}')
+
+
+def processar_bloco(regras, registros, inicio=1, top=None, ordem='catalogo'):
+    """Valida e avalia um bloco de registros, retornando as linhas JSON
+
+    Os CPFs do bloco são verificados juntos (normalizar_cpfs) e cada
+    registro é validado e convertido uma única vez; dentro do bloco, a
+    avaliação das regras e a serialização dos resultados são feitas uma
+    única vez por combinação distinta de campos relevantes, e reaproveitadas
+    pelos clientes que compartilham a mesma combinação. Com `top` e/ou
+    ordem='taxa', cada cliente recebe só os melhores bancos (ranking.py).
+    """
+    avaliados = {}
+    linhas = []
+
+    # CPFs do bloco inteiro verificados de uma vez (dígitos verificadores)
+    cpfs = normalizar_cpfs([dados.get('cpf') for dados in registros])
+
+    for numero, dados, cpf_normalizado in zip(count(inicio), registros, cpfs):
+        cpf = json.dumps(dados.get('cpf'))
+
+        consulta, erros = _validar(dados, cpf_normalizado)
+        if erros:
+            linhas.append(linha_erro(numero, cpf, erros))
+            continue
+
+        chave = consulta[:CAMPOS_REGRAS]
+        avaliado = avaliados.get(chave)
+        if avaliado is None:
+            resultados = regras.tabela.avaliar(*chave, top, ordem)
+            avaliado = avaliados[chave] = (json.dumps(resultados), len(resultados))
+
+        linhas.append(linha_resultado(numero, cpf, *avaliado))
+
+    return linhas
+
+
+def consultar_lote(regras, registros, tamanho_lote=None, interromper=None, top=None, ordem='catalogo'):
+    """Gera uma linha JSON por registro, processando em blocos
+
+    Se `interromper()` retornar True antes de um bloco (ex.: prazo da
+    requisição esgotado), gera uma linha de erro e encerra.
+    """
+    tamanho_lote = tamanho_lote or LOTE_CONFIG['tamanho_lote']
+    inicio = 1
+    for bloco in _em_blocos(registros, tamanho_lote):
+        if interromper is not None and interromper():
+            mensagens = json.dumps(["Tempo limite da requisição excedido"])
+            yield f'{{"linha": {inicio}, "erro": true, "mensagens": {mensagens}}}\n'
+            return
+        linhas = processar_bloco(regras, bloco, inicio, top, ordem)
+        inicio += len(bloco)
+        yield '\n'.join(linhas) + '\n'
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(
+        description='Consulta de portabilidade INSS em lote (CSV ou JSON lines)'
+    )
+    parser.add_argument('entrada', help="arquivo de clientes ('-' para stdin)")
+    parser.add_argument('-o', '--saida', help='arquivo JSON lines de saída (padrão: stdout)')
+    parser.add_argument('-f', '--formato', choices=FORMATOS,
+                        help='formato da entrada (padrão: pela extensão)')
+    parser.add_argument('-b', '--tamanho-lote', type=int, default=LOTE_CONFIG['tamanho_lote'],
+                        help='registros processados por bloco')
+    parser.add_argument('-w', '--trabalhadores', type=int, default=LOTE_CONFIG['trabalhadores'],
+                        help='processos em paralelo (0 = todos os núcleos)')
+    parser.add_argument('--top', type=int, help='só os N melhores bancos de cada cliente')
+    parser.add_argument('--ordem', choices=ORDENS, default='catalogo',
+                        help='ordem dos bancos (taxa = menor taxa aplicável primeiro)')
+    args = parser.parse_args(argv)
+    if args.top is not None and args.top < 1:
+        parser.error('--top deve ser um número inteiro positivo')
+
+    formato = args.formato or detectar_formato(args.entrada)
+    if args.entrada == '-':
+        entrada = io.TextIOWrapper(sys.stdin.buffer, encoding=LOTE_CONFIG['encoding'], newline='')
+    else:
+        entrada = open(args.entrada, encoding=LOTE_CONFIG['encoding'], newline='')
+    saida = open(args.saida, 'w', encoding='utf-8') if args.saida else sys.stdout
+
+    import paralelo
+    if paralelo.numero_trabalhadores(args.trabalhadores) > 1:
+        trechos = paralelo.consultar_lote_paralelo(
+            entrada, formato, args.trabalhadores, args.tamanho_lote, args.top, args.ordem
+        )
+    else:
+        from regras_portabilidade import RegrasPortabilidadeINSS
+        trechos = consultar_lote(
+            RegrasPortabilidadeINSS(), ler_registros(entrada, formato), args.tamanho_lote,
+            top=args.top, ordem=args.ordem
+        )
+
+    try:
+        for trecho in trechos:
+            saida.write(trecho)
+    finally:
+        entrada.close()
+        if saida is not sys.stdout:
+            saida.close()
+
+
+if __name__ == "__main__":
+    main()
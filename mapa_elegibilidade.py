@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mapa de elegibilidade pré-compilado
+As regras dos bancos dependem só de idade, parcelas pagas e do benefício
+por invalidez, todos de domínio pequeno (limites do VALIDACAO_CONFIG). A
+compilação (python mapa_elegibilidade.py) grava um bitset de bancos
+elegíveis por célula (invalidez, idade, parcelas) em um arquivo com a versão
+das regras no nome; em execução, o arquivo da versão em uso é mapeado em
+memória (mmap), e todos os workers do gunicorn compartilham as mesmas
+páginas. A consulta passa a ser um acesso ao mapa mais as regras de saldo e
+troco.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+
+from config import MAPA_ELEGIBILIDADE_CONFIG, VALIDACAO_CONFIG
+
+logger = logging.getLogger('portabilidade.mapa_elegibilidade')
+
+_MAGICO = b'PORTMAPA'
+_FORMATO = 1
+# mágico, formato, versão das regras, idade mín/máx, parcelas mín/máx,
+# bancos, bytes por bitset, tamanho da lista de bancos (JSON)
+_CABECALHO = struct.Struct('<8sH12sHHHHHHI')
+
+
+def caminho_mapa(versao, diretorio=None):
+    """Arquivo do mapa compilado para uma versão das regras"""
+    diretorio = diretorio or MAPA_ELEGIBILIDADE_CONFIG['diretorio']
+    return os.path.join(diretorio, f"elegibilidade-{versao}.bin")
+
+
+def _dominio():
+    idade, parcelas = VALIDACAO_CONFIG['IDADE'], VALIDACAO_CONFIG['PARCELAS_PAGAS']
+    return idade['min'], idade['max'], parcelas['min'], parcelas['max']
+
+
+def compilar(tabela, catalogo, versao):
+    """Bytes do mapa de uma TabelaRegras: cabeçalho, bancos e os bitsets
+
+    O bit b de cada bitset (little-endian) é o banco catalogo.disponiveis[b].
+    """
+    idade_min, idade_max, parcelas_min, parcelas_max = _dominio()
+    nomes = [banco.nome for banco in catalogo.disponiveis]
+    posicoes = {nome: posicao for posicao, nome in enumerate(nomes)}
+    largura = max((len(nomes) + 7) // 8, 1)
+    bancos = json.dumps(nomes, ensure_ascii=False).encode('utf-8')
+
+    partes = [
+        _CABECALHO.pack(_MAGICO, _FORMATO, versao.encode('ascii'), idade_min, idade_max,
+                        parcelas_min, parcelas_max, len(nomes), largura, len(bancos)),
+        bancos
+    ]
+    # Os bitsets começam alinhados a 8 bytes
+    partes.append(b'\0' * (-(_CABECALHO.size + len(bancos)) % 8))
+
+    bitsets = {}
+    for invalidez in (False, True):
+        for idade in range(idade_min, idade_max + 1):
+            for parcelas in range(parcelas_min, parcelas_max + 1):
+                elegiveis = tabela.elegiveis(idade, parcelas, invalidez)
+                bitset = bitsets.get(elegiveis)
+                if bitset is None:
+                    bits = sum(1 << posicoes[banco] for banco, _, _, _ in elegiveis)
+                    bitset = bitsets[elegiveis] = bits.to_bytes(largura, 'little')
+                partes.append(bitset)
+    return b''.join(partes)
+
+
+class MapaElegibilidade:
+    """Bitsets de bancos elegíveis por (invalidez, idade, parcelas), sobre um buffer"""
+
+    def __init__(self, buffer):
+        (magico, formato, versao, self.idade_min, self.idade_max, self.parcelas_min,
+         self.parcelas_max, self.total_bancos, self.largura, tamanho_bancos) = _CABECALHO.unpack_from(buffer)
+        if magico != _MAGICO or formato != _FORMATO:
+            raise ValueError("arquivo não é um mapa de elegibilidade compatível")
+        self.versao = versao.decode('ascii')
+        inicio_bancos = _CABECALHO.size
+        self.bancos = json.loads(bytes(buffer[inicio_bancos:inicio_bancos + tamanho_bancos]).decode('utf-8'))
+        self.inicio = inicio_bancos + tamanho_bancos
+        self.inicio += -self.inicio % 8
+
+        self.idades = self.idade_max - self.idade_min + 1
+        self.parcelas = self.parcelas_max - self.parcelas_min + 1
+        self._passo_idade = self.parcelas * self.largura
+        self._modos = (self.inicio, self.inicio + self.idades * self._passo_idade)
+        if len(buffer) != self._modos[1] + self.idades * self._passo_idade:
+            raise ValueError("mapa de elegibilidade truncado")
+        self.buffer = buffer
+
+    @classmethod
+    def abrir(cls, caminho):
+        """Mapa de um arquivo, mapeado em memória somente leitura"""
+        with open(caminho, 'rb') as arquivo:
+            buffer = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(buffer)
+        except Exception:
+            buffer.close()
+            raise
+
+    def bitset(self, idade, parcelas_pagas, is_invalidez):
+        """Bitset (bytes) dos bancos elegíveis; None fora do domínio do mapa"""
+        linha = idade - self.idade_min
+        coluna = parcelas_pagas - self.parcelas_min
+        if 0 <= linha < self.idades and 0 <= coluna < self.parcelas:
+            largura = self.largura
+            inicio = self._modos[is_invalidez] + linha * self._passo_idade + coluna * largura
+            return self.buffer[inicio:inicio + largura]
+        return None
+
+
+def carregar(versao, catalogo, diretorio=None):
+    """Mapa compilado para a versão das regras, ou None (usa as faixas com bisect)"""
+    if not MAPA_ELEGIBILIDADE_CONFIG['enabled']:
+        return None
+    caminho = caminho_mapa(versao, diretorio)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        mapa = MapaElegibilidade.abrir(caminho)
+    except (OSError, ValueError) as erro:
+        logger.warning("Mapa de elegibilidade %s ignorado: %s", caminho, erro)
+        return None
+    if mapa.versao != versao or mapa.bancos != [banco.nome for banco in catalogo.disponiveis]:
+        logger.warning("Mapa de elegibilidade %s não corresponde às regras em uso", caminho)
+        return None
+    return mapa
+
+
+def gravar(conteudo, caminho):
+    """Grava o mapa de forma atômica (workers nunca veem um arquivo parcial)"""
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+if __name__ == "__main__":
+    # Compila as regras em uso (ou as do arquivo informado) no diretório de mapas
+    from fonte_regras import carregar_regras, versao_regras
+    from regras_portabilidade import TabelaRegras, catalogo_do_conjunto
+
+    if len(sys.argv) > 2:
+        print("Uso: python mapa_elegibilidade.py [arquivo_de_regras.json]")
+        sys.exit(1)
+
+    conjunto = carregar_regras(sys.argv[1] if len(sys.argv) == 2 else None)
+    catalogo = catalogo_do_conjunto(conjunto)
+    versao = versao_regras(conjunto)
+    conteudo = compilar(TabelaRegras(catalogo, conjunto['regras']), catalogo, versao)
+    caminho = caminho_mapa(versao)
+    gravar(conteudo, caminho)
+    print(f"✅ Mapa de elegibilidade da versão {versao} gravado em {caminho} ({len(conteudo) / 1024:.0f} KB)")
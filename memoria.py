@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Uso de memória dos processos (workers do gunicorn)
+Lê /proc/<pid>/smaps_rollup (Linux): além do RSS, separa as páginas
+compartilhadas com outros processos (herdadas do master no fork e ainda não
+copiadas) das privadas. `python memoria.py` compara workers que montam a
+aplicação sozinhos com workers criados por fork de um master que já montou
+tudo (preload + gc.freeze), como no gunicorn.conf.py.
+"""
+
+import argparse
+import gc
+import multiprocessing
+import os
+import sys
+
+_CAMPOS = {
+    'Rss': 'rss',
+    'Pss': 'pss',
+    'Shared_Clean': 'compartilhada',
+    'Shared_Dirty': 'compartilhada',
+    'Private_Clean': 'privada',
+    'Private_Dirty': 'privada'
+}
+
+
+def uso_memoria(pid='self'):
+    """{'rss', 'pss', 'compartilhada', 'privada'} em bytes; {} se indisponível"""
+    uso = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as arquivo:
+            for linha in arquivo:
+                campo, _, valor = linha.partition(':')
+                nome = _CAMPOS.get(campo)
+                if nome is not None:
+                    uso[nome] = uso.get(nome, 0) + int(valor.split()[0]) * 1024
+    except OSError:
+        return {}
+    return uso
+
+
+def relatorio(uso):
+    """Texto curto do uso de memória (MB)"""
+    if not uso:
+        return "uso de memória indisponível (requer /proc/<pid>/smaps_rollup)"
+    return ' '.join(f"{nome}={uso[nome] / 2**20:.1f}MB" for nome in ('rss', 'pss', 'compartilhada', 'privada'))
+
+
+def _montar_aplicacao():
+    from app import create_app
+    # Sem log nem histórico: a medição não grava arquivos no diretório atual
+    return create_app(servicos=False)
+
+
+def _trabalhador(aplicacao, consultas, resultados, encerrar):
+    """Simula um worker: monta a aplicação se não a herdou, consulta e mede"""
+    if aplicacao is None:
+        aplicacao = _montar_aplicacao()
+    regras = aplicacao.extensions['portabilidade']['regras']
+    for dados in consultas:
+        regras.consultar_portabilidade(dados)
+    aplicacao.test_client().get('/')
+    resultados.put((os.getpid(), uso_memoria()))
+    # Fica vivo até todos medirem: as páginas só contam como compartilhadas
+    # enquanto os outros processos existem
+    encerrar.wait()
+
+
+def comparar(trabalhadores, quantidade):
+    """[(modo, [(pid, uso)])] para workers sem e com preload"""
+    import benchmark
+    consultas = benchmark.gerar_clientes(quantidade)
+    medicoes = []
+    for modo, contexto in (('sem preload', 'spawn'), ('preload + gc.freeze', 'fork')):
+        contexto = multiprocessing.get_context(contexto)
+        aplicacao = None
+        if contexto.get_start_method() == 'fork':
+            aplicacao = _montar_aplicacao()
+            gc.collect()
+            gc.freeze()
+        resultados, encerrar = contexto.Queue(), contexto.Event()
+        processos = [
+            contexto.Process(target=_trabalhador, args=(aplicacao, consultas, resultados, encerrar))
+            for _ in range(trabalhadores)
+        ]
+        for processo in processos:
+            processo.start()
+        medicoes.append((modo, sorted(resultados.get() for _ in processos)))
+        encerrar.set()
+        for processo in processos:
+            processo.join()
+        if aplicacao is not None:
+            gc.unfreeze()
+    return medicoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Memória por worker, sem e com preload')
+    parser.add_argument('-w', '--trabalhadores', type=int, default=4, help='workers simulados')
+    parser.add_argument('-n', '--consultas', type=int, default=2000, help='consultas por worker')
+    args = parser.parse_args(argv)
+
+    if not uso_memoria():
+        print(f"❌ {relatorio({})}")
+        return 1
+
+    privada_media = {}
+    for modo, medidas in comparar(args.trabalhadores, args.consultas):
+        print(f"\n🧠 {modo}")
+        for pid, uso in medidas:
+            print(f"   worker {pid}: {relatorio(uso)}")
+        privada_media[modo] = sum(uso['privada'] for _, uso in medidas) / len(medidas)
+
+    sem, com = privada_media.values()
+    print(f"\n📊 Memória privada média por worker: {sem / 2**20:.1f}MB sem preload, "
+          f"{com / 2**20:.1f}MB com preload ({(sem - com) * args.trabalhadores / 2**20:.1f}MB "
+          f"a menos em {args.trabalhadores} workers)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
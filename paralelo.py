@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Consulta de portabilidade em lote usando vários processos
+Divide o arquivo de entrada em blocos, distribui os blocos entre processos
+que mantêm uma instância de RegrasPortabilidadeINSS já carregada e junta
+os resultados na ordem original da entrada
+"""
+
+import csv
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import lote
+from config import LOTE_CONFIG
+
+# Instância das regras carregada uma vez em cada processo trabalhador
+_regras = None
+
+
+def _inicializar_trabalhador():
+    """Carrega as regras no processo trabalhador"""
+    global _regras
+    from regras_portabilidade import RegrasPortabilidadeINSS
+    _regras = RegrasPortabilidadeINSS()
+
+
+def _registro_csv(cabecalho, linha):
+    """O mesmo dict que o csv.DictReader (restkey e restval None) monta da linha"""
+    registro = dict(zip(cabecalho, linha))
+    if len(linha) > len(cabecalho):
+        registro[None] = linha[len(cabecalho):]
+    else:
+        for chave in cabecalho[len(linha):]:
+            registro[chave] = None
+    return registro
+
+
+def _processar_bloco(formato, cabecalho, inicio, linhas, top=None, ordem='catalogo'):
+    """Converte as linhas brutas de um bloco em registros e os avalia"""
+    if formato == 'csv':
+        registros = [_registro_csv(cabecalho, linha) for linha in linhas]
+    else:
+        registros = list(lote.ler_registros(linhas, 'jsonl'))
+    return '\n'.join(lote.processar_bloco(_regras, registros, inicio, top, ordem)) + '\n'
+
+
+def ler_blocos(arquivo, formato='csv', tamanho_bloco=None):
+    """Gera (cabecalho, linhas) com blocos de linhas ainda não convertidas
+
+    Para CSV, as linhas já vêm separadas em campos (o leitor csv trata aspas
+    e quebras de linha dentro de campos); para JSON lines, as linhas seguem
+    como texto e são decodificadas no processo trabalhador.
+    """
+    tamanho_bloco = tamanho_bloco or LOTE_CONFIG['tamanho_lote']
+    if formato == 'csv':
+        leitor = csv.reader(arquivo, delimiter=LOTE_CONFIG['csv_delimiter'])
+        cabecalho = next(leitor, None)
+        # Como no csv.DictReader de lote.ler_registros, linhas vazias não são registros
+        fonte = (linha for linha in leitor if linha)
+    else:
+        cabecalho = None
+        fonte = (linha for linha in arquivo if linha.strip())
+
+    for bloco in lote._em_blocos(fonte, tamanho_bloco):
+        yield cabecalho, bloco
+
+
+def numero_trabalhadores(trabalhadores=None):
+    """Resolve a quantidade de processos (0 = todos os núcleos)"""
+    if trabalhadores is None:
+        trabalhadores = LOTE_CONFIG['trabalhadores']
+    return trabalhadores or os.cpu_count() or 1
+
+
+def consultar_lote_paralelo(arquivo, formato='csv', trabalhadores=None, tamanho_bloco=None,
+                            top=None, ordem='catalogo'):
+    """Gera os trechos de saída (JSON lines) na ordem da entrada
+
+    Mantém no máximo `blocos_por_trabalhador` blocos em processamento por
+    trabalhador, de modo que arquivos grandes não são lidos inteiros para a
+    memória enquanto os processos estão ocupados.
+    """
+    trabalhadores = numero_trabalhadores(trabalhadores)
+    limite = trabalhadores * LOTE_CONFIG['blocos_por_trabalhador']
+    pendentes = deque()
+    inicio = 1
+
+    with ProcessPoolExecutor(max_workers=trabalhadores,
+                             initializer=_inicializar_trabalhador) as executor:
+        for cabecalho, linhas in ler_blocos(arquivo, formato, tamanho_bloco):
+            pendentes.append(executor.submit(_processar_bloco, formato, cabecalho, inicio, linhas, top, ordem))
+            inicio += len(linhas)
+            if len(pendentes) >= limite:
+                yield pendentes.popleft().result()
+
+        while pendentes:
+            yield pendentes.popleft().result()
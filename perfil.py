@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfis de execução do motor de regras
+cProfile (arquivo .prof, para pstats/snakeviz) e amostragem de pilhas em
+formato "collapsed" (.folded), pronto para flamegraph.pl ou speedscope
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class AmostradorPilhas(threading.Thread):
+    """Amostra periodicamente a pilha de uma thread e conta as pilhas vistas"""
+
+    def __init__(self, thread_id=None, intervalo=0.001):
+        super().__init__(name='amostrador-pilhas', daemon=True)
+        self.thread_id = thread_id or threading.get_ident()
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            quadro = sys._current_frames().get(self.thread_id)
+            pilha = []
+            while quadro is not None:
+                codigo = quadro.f_code
+                pilha.append(f"{codigo.co_name} ({codigo.co_filename.rsplit('/', 1)[-1]}:{codigo.co_firstlineno})")
+                quadro = quadro.f_back
+            if pilha:
+                self.pilhas[';'.join(reversed(pilha))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+    def salvar(self, caminho):
+        """Grava as pilhas no formato collapsed: 'a;b;c contagem' por linha"""
+        with open(caminho, 'w', encoding='utf-8') as destino:
+            for pilha, contagem in self.pilhas.most_common():
+                destino.write(f"{pilha} {contagem}\n")
+
+
+def perfilar(funcao, prefixo, duracao_minima=2.0):
+    """Executa `funcao` repetidamente com cProfile e com o amostrador
+
+    Grava <prefixo>.prof e <prefixo>.folded e retorna o resumo do cProfile
+    (funções com maior tempo acumulado).
+    """
+    perfil = cProfile.Profile()
+    perfil.enable()
+    funcao()
+    perfil.disable()
+    perfil.dump_stats(f"{prefixo}.prof")
+
+    amostrador = AmostradorPilhas()
+    amostrador.start()
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < duracao_minima:
+        funcao()
+    amostrador.parar()
+    amostrador.salvar(f"{prefixo}.folded")
+
+    resumo = io.StringIO()
+    pstats.Stats(perfil, stream=resumo).sort_stats('cumulative').print_stats(15)
+    return resumo.getvalue()
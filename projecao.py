@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Projeções financeiras das ofertas (tabela Price)
+Para cada banco elegível, na taxa aplicável, calcula em cada prazo do
+PROJECAO_CONFIG a parcela, os juros totais e o CET: a taxa mensal que iguala
+o valor líquido recebido (valor financiado menos IOF e tarifas) às parcelas.
+Com NumPy, todos os pares (taxa x prazo) são calculados juntos, em matrizes;
+sem ele, um a um em Python, com as mesmas fórmulas.
+"""
+
+import validacao
+from config import PROJECAO_CONFIG
+
+# Iterações de Newton no cálculo do CET (converge bem antes)
+_ITERACOES_CET = 30
+
+
+def _numpy():
+    """NumPy, importado sob demanda pelo validacao (None se não instalado)"""
+    return validacao.np if validacao._numpy() else None
+
+
+def _iof_fixo(valor):
+    return valor * (PROJECAO_CONFIG['iof_adicional'] + PROJECAO_CONFIG['tarifas'])
+
+
+def _projetar_numpy(np, taxas, valor, prazos):
+    """Matrizes (taxas x prazos) de parcela, juros totais e CET mensal"""
+    i = np.asarray(taxas, dtype=float)[:, None] / 100
+    n = np.asarray(prazos, dtype=float)[None, :]
+    descontado = (1 + i) ** -n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        parcela = np.where(i > 0, valor * i / (1 - descontado), valor / n)
+    juros = parcela * n - valor
+
+    # IOF diário sobre cada amortização: a do mês k é parcela * (1 + i)^-(n - k + 1)
+    meses = np.arange(1, max(prazos) + 1)
+    restantes = n[..., None] - meses + 1
+    amortizacao = np.where(restantes > 0, parcela[..., None] * (1 + i[..., None]) ** -restantes, 0.0)
+    dias = np.minimum(30 * meses, PROJECAO_CONFIG['iof_dias_maximo'])
+    iof = (amortizacao * dias).sum(-1) * PROJECAO_CONFIG['iof_diario']
+    liquido = valor - _iof_fixo(valor) - iof
+
+    # CET: valor presente das parcelas = líquido. A função é convexa e
+    # decrescente na taxa, e a taxa do contrato fica à esquerda da raiz
+    # (líquido <= valor), então Newton converge sem oscilar
+    cet = np.broadcast_to(np.maximum(i, 1e-9), parcela.shape)
+    for _ in range(_ITERACOES_CET):
+        descontado = (1 + cet) ** -n
+        presente = parcela * (1 - descontado) / cet
+        derivada = parcela * (n * descontado / (1 + cet) - (1 - descontado) / cet) / cet
+        passo = (presente - liquido) / derivada
+        cet = cet - passo
+        if np.abs(passo).max() < 1e-12:
+            break
+    return parcela.tolist(), juros.tolist(), cet.tolist()
+
+
+def _projetar_python(taxas, valor, prazos):
+    """Mesmo cálculo de _projetar_numpy, par a par"""
+    parcelas, juros, cets = [], [], []
+    for taxa in taxas:
+        i = taxa / 100
+        linha_parcela, linha_juros, linha_cet = [], [], []
+        for n in prazos:
+            parcela = valor * i / (1 - (1 + i) ** -n) if i > 0 else valor / n
+            iof = sum(
+                parcela * (1 + i) ** -(n - k + 1) * min(30 * k, PROJECAO_CONFIG['iof_dias_maximo'])
+                for k in range(1, n + 1)
+            ) * PROJECAO_CONFIG['iof_diario']
+            liquido = valor - _iof_fixo(valor) - iof
+
+            cet = max(i, 1e-9)
+            for _ in range(_ITERACOES_CET):
+                descontado = (1 + cet) ** -n
+                presente = parcela * (1 - descontado) / cet
+                derivada = parcela * (n * descontado / (1 + cet) - (1 - descontado) / cet) / cet
+                passo = (presente - liquido) / derivada
+                cet -= passo
+                if abs(passo) < 1e-12:
+                    break
+            linha_parcela.append(parcela)
+            linha_juros.append(parcela * n - valor)
+            linha_cet.append(cet)
+        parcelas.append(linha_parcela)
+        juros.append(linha_juros)
+        cets.append(linha_cet)
+    return parcelas, juros, cets
+
+
+def projetar(taxas, valor, prazos=None):
+    """Projeções de cada taxa (% a.m.) nos prazos (meses), para o valor financiado
+
+    Retorna uma lista por taxa com um dict por prazo: parcela, juros_total,
+    cet_mensal e cet_anual (em %).
+    """
+    prazos = tuple(prazos or PROJECAO_CONFIG['prazos'])
+    valor = float(valor)
+    if not taxas or not prazos:
+        return [[] for _ in taxas]
+    np = _numpy()
+    if np is not None:
+        parcelas, juros, cets = _projetar_numpy(np, taxas, valor, prazos)
+    else:
+        parcelas, juros, cets = _projetar_python(taxas, valor, prazos)
+    return [
+        [
+            {
+                'prazo': prazo,
+                'parcela': round(parcela, 2),
+                'juros_total': round(juro, 2),
+                'cet_mensal': round(cet * 100, 4),
+                'cet_anual': round(((1 + cet) ** 12 - 1) * 100, 2)
+            }
+            for prazo, parcela, juro, cet in zip(prazos, linha_parcela, linha_juros, linha_cet)
+        ]
+        for linha_parcela, linha_juros, linha_cet in zip(parcelas, juros, cets)
+    ]
+
+
+def adicionar_projecoes(resultados, valor_financiado, prazos=None):
+    """Acrescenta 'projecoes' a cada resultado da consulta (na taxa aplicável)
+
+    Bancos com a mesma taxa aplicável compartilham a mesma projeção.
+    """
+    taxas = sorted({resultado['taxa_aplicavel'] for resultado in resultados})
+    projecoes = dict(zip(taxas, projetar(taxas, valor_financiado, prazos)))
+    for resultado in resultados:
+        resultado['projecoes'] = projecoes[resultado['taxa_aplicavel']]
+    return resultados
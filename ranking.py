@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ranking das ofertas de um cliente (melhores bancos primeiro)
+A taxa aplicável de um banco é a menor entre a taxa padrão dele e a taxa do
+cliente + 0,5. Percorrendo os bancos em ordem de taxa padrão, as taxas
+aplicáveis nunca diminuem: a seleção dos k melhores para assim que tem k
+bancos ou chega aos bancos que aplicam a taxa do cliente, empatados entre si
+e desempatados pela ordem do catálogo com um heap parcial (heapq.nsmallest).
+O troco é o mesmo em todos os bancos de um cliente, então não desempata.
+"""
+
+import heapq
+
+# catalogo: todos os bancos elegíveis na ordem do catálogo (padrão)
+# taxa: menor taxa aplicável primeiro
+ORDENS = ('catalogo', 'taxa')
+
+
+def validar_ranking(top, ordem):
+    """Lista de erros dos parâmetros de ranking (vazia se válidos)"""
+    erros = []
+    if ordem not in ORDENS:
+        erros.append("Ordem deve ser catalogo ou taxa")
+    if top is not None and top < 1:
+        erros.append("Top deve ser um número inteiro positivo")
+    return erros
+
+
+def posicoes_por_taxa(taxas_padrao):
+    """Posições dos bancos em ordem de taxa padrão (empates na ordem do catálogo)"""
+    return tuple(sorted(range(len(taxas_padrao)), key=taxas_padrao.__getitem__))
+
+
+def melhores(posicoes, taxas_padrao, taxa_cliente, k):
+    """Posições (no catálogo) dos k bancos de menor taxa aplicável, em ordem
+
+    `posicoes` vem de posicoes_por_taxa(taxas_padrao); `taxa_cliente` é a
+    taxa do cliente + 0,5 como float, a mesma usada em taxa_aplicavel.
+    """
+    escolhidos = []
+    for n, posicao in enumerate(posicoes):
+        if len(escolhidos) == k:
+            break
+        if taxas_padrao[posicao] >= taxa_cliente:
+            # Daqui em diante todos aplicam a taxa do cliente: vale a ordem do catálogo
+            escolhidos.extend(heapq.nsmallest(k - len(escolhidos), posicoes[n:]))
+            break
+        escolhidos.append(posicao)
+    return escolhidos
+
+
+def selecionar(ofertas, posicoes, taxas_padrao, taxa_cliente, top=None, ordem='catalogo'):
+    """As `top` primeiras ofertas (todas se None) na ordem pedida"""
+    if ordem == 'taxa':
+        k = len(ofertas) if top is None else top
+        return [ofertas[posicao] for posicao in melhores(posicoes, taxas_padrao, taxa_cliente, k)]
+    return ofertas if top is None else ofertas[:top]
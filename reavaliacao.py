@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reavaliação incremental de carteiras após mudança de regras
+Compara o conjunto de regras antigo com o novo, descobre quais bancos
+mudaram e, para cada cliente, só reavalia esses bancos, e só quando a idade,
+as parcelas pagas e o tipo de benefício colocam o cliente na faixa afetada.
+O resultado é a lista de pares (cliente, banco) que entraram, saíram ou
+mudaram de condição
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import NamedTuple
+
+import lote
+from regras_portabilidade import TabelaRegras, catalogo_do_conjunto
+from config import LOTE_CONFIG
+from fonte_regras import carregar_regras, regras_do_config
+from validacao import CAMPOS_REGRAS, _inteiro, validar_consulta
+
+# Acima deste número de bancos afetados, o cliente é avaliado com a tabela
+# completa (uma busca) em vez de uma tabela por banco
+BANCOS_POR_TABELA = 3
+
+
+def _regra_efetiva(banco):
+    """Campos do banco que influenciam a avaliação (None se fora da avaliação)"""
+    if banco is None or banco.bloqueado:
+        return None
+    return banco.idade_maxima, banco.parcelas_minimas, banco.aceita_invalidez, banco.taxa_padrao
+
+
+def _faixa(regra, invalidez, parcelas_invalidez):
+    """(idade máxima, parcelas mínimas) de um banco para o tipo de benefício"""
+    if regra is None:
+        return None
+    idade_maxima, parcelas_minimas, aceita_invalidez, _ = regra
+    if invalidez:
+        return (idade_maxima, parcelas_invalidez) if aceita_invalidez else None
+    return idade_maxima, parcelas_minimas
+
+
+class MudancaBanco(NamedTuple):
+    """Banco cuja regra mudou, com as tabelas de um só banco antes e depois"""
+    nome: str
+    faixas: dict  # invalidez -> (faixa antes, faixa depois, condição mudou)
+    tabela_antes: TabelaRegras
+    tabela_depois: TabelaRegras
+
+    def pode_mudar(self, idade, parcelas, invalidez):
+        """True se o resultado deste banco pode mudar para o cliente"""
+        antes, depois, condicao_mudou = self.faixas[invalidez]
+        dentro_antes = antes is not None and idade <= antes[0] and parcelas >= antes[1]
+        dentro_depois = depois is not None and idade <= depois[0] and parcelas >= depois[1]
+        if dentro_antes != dentro_depois:
+            return True
+        if not dentro_antes:
+            return False
+        if condicao_mudou:
+            return True
+        # Elegível nas duas versões: só a observação de histórico positivo
+        # (parcelas mínimas + 5) pode mudar
+        return (parcelas >= antes[1] + 5) != (parcelas >= depois[1] + 5)
+
+
+def diferenca_regras(antigo, novo):
+    """Bancos afetados pela troca do conjunto de regras antigo pelo novo
+
+    Se as regras globais (saldo mínimo, troco mínimo ou parcelas mínimas de
+    invalidez) mudaram, todos os bancos são considerados afetados.
+    """
+    catalogo_antes = catalogo_do_conjunto(antigo)
+    catalogo_depois = catalogo_do_conjunto(novo)
+    regras_antes, regras_depois = antigo['regras'], novo['regras']
+    invalidez_antes = regras_antes['parcelas_minimas']['invalidez']
+    invalidez_depois = regras_depois['parcelas_minimas']['invalidez']
+    globais_mudaram = (
+        regras_antes['saldo_minimo'] != regras_depois['saldo_minimo']
+        or regras_antes['troco_minimo'] != regras_depois['troco_minimo']
+        or invalidez_antes != invalidez_depois
+    )
+
+    nomes = list(catalogo_antes.nomes)
+    nomes += [nome for nome in catalogo_depois.nomes if nome not in catalogo_antes.por_nome]
+
+    mudancas = []
+    for nome in nomes:
+        antes = _regra_efetiva(catalogo_antes.por_nome.get(nome))
+        depois = _regra_efetiva(catalogo_depois.por_nome.get(nome))
+        if antes == depois and not (globais_mudaram and antes is not None):
+            continue
+
+        taxa_mudou = antes is None or depois is None or antes[3] != depois[3]
+        mudancas.append(MudancaBanco(
+            nome=nome,
+            faixas={
+                invalidez: (
+                    _faixa(antes, invalidez, invalidez_antes),
+                    _faixa(depois, invalidez, invalidez_depois),
+                    taxa_mudou or globais_mudaram
+                )
+                for invalidez in (False, True)
+            },
+            tabela_antes=TabelaRegras(catalogo_antes.subconjunto([nome]), regras_antes),
+            tabela_depois=TabelaRegras(catalogo_depois.subconjunto([nome]), regras_depois)
+        ))
+    return mudancas
+
+
+def reavaliar(antigo, novo, registros, estatisticas=None):
+    """Gera as mudanças (cliente, banco) da troca de regras em uma carteira
+
+    Cada mudança é um dict com linha, cpf, banco, mudanca ('entrou', 'saiu'
+    ou 'alterado') e os resultados do banco antes e depois (None quando não
+    elegível). `estatisticas`, se informado, recebe os totais da execução.
+    """
+    estatisticas = {} if estatisticas is None else estatisticas
+    estatisticas.update(registros=0, candidatos=0, mudancas=0)
+    mudancas = diferenca_regras(antigo, novo)
+    estatisticas['bancos_alterados'] = [mudanca.nome for mudanca in mudancas]
+    if not mudancas:
+        for _ in registros:
+            estatisticas['registros'] += 1
+        return
+    completa_antes = TabelaRegras(catalogo_do_conjunto(antigo), antigo['regras'])
+    completa_depois = TabelaRegras(catalogo_do_conjunto(novo), novo['regras'])
+
+    for numero, dados in enumerate(registros, 1):
+        estatisticas['registros'] += 1
+
+        # Filtro barato, só com os campos que definem as faixas; registros
+        # inválidos não são elegíveis em nenhuma das versões
+        idade = _inteiro(dados.get('idade'))
+        parcelas = _inteiro(dados.get('parcelas_pagas'))
+        if idade is None or parcelas is None:
+            continue
+        invalidez = "invalidez" in (dados.get('codigo_beneficio') or '').lower()
+        afetados = [mudanca for mudanca in mudancas if mudanca.pode_mudar(idade, parcelas, invalidez)]
+        if not afetados:
+            continue
+
+        estatisticas['candidatos'] += 1
+        consulta, erros = validar_consulta(dados)
+        if erros:
+            continue
+
+        chave = consulta[:CAMPOS_REGRAS]
+        if len(afetados) > BANCOS_POR_TABELA:
+            todos_antes = {resultado['banco']: resultado for resultado in completa_antes.avaliar(*chave)}
+            todos_depois = {resultado['banco']: resultado for resultado in completa_depois.avaliar(*chave)}
+            pares = [(mudanca.nome, todos_antes.get(mudanca.nome), todos_depois.get(mudanca.nome))
+                     for mudanca in afetados]
+        else:
+            pares = []
+            for mudanca in afetados:
+                antes = mudanca.tabela_antes.avaliar(*chave)
+                depois = mudanca.tabela_depois.avaliar(*chave)
+                pares.append((mudanca.nome, antes[0] if antes else None, depois[0] if depois else None))
+
+        for banco, antes, depois in pares:
+            if antes == depois:
+                continue
+            estatisticas['mudancas'] += 1
+            yield {
+                'linha': numero,
+                'cpf': dados.get('cpf'),
+                'banco': banco,
+                'mudanca': 'entrou' if antes is None else 'saiu' if depois is None else 'alterado',
+                'antes': antes,
+                'depois': depois
+            }
+
+
+def _carregar(origem):
+    """Regras de um arquivo JSON/YAML, ou do config.py com 'config'"""
+    return regras_do_config() if origem == 'config' else carregar_regras(origem)
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(
+        description='Reavalia uma carteira só nos bancos afetados por uma mudança de regras'
+    )
+    parser.add_argument('regras_antigas', help="arquivo de regras anterior ('config' = config.py)")
+    parser.add_argument('regras_novas', help="arquivo de regras novo ('config' = config.py)")
+    parser.add_argument('entrada', help='carteira de clientes (CSV ou JSON lines)')
+    parser.add_argument('-o', '--saida', help='arquivo JSON lines das mudanças (padrão: stdout)')
+    parser.add_argument('-f', '--formato', choices=lote.FORMATOS,
+                        help='formato da carteira (padrão: pela extensão)')
+    args = parser.parse_args(argv)
+
+    antigo, novo = _carregar(args.regras_antigas), _carregar(args.regras_novas)
+    formato = args.formato or lote.detectar_formato(args.entrada)
+    estatisticas = {}
+    inicio = time.perf_counter()
+    with open(args.entrada, encoding=LOTE_CONFIG['encoding'], newline='') as entrada:
+        saida = open(args.saida, 'w', encoding='utf-8') if args.saida else sys.stdout
+        try:
+            for mudanca in reavaliar(antigo, novo, lote.ler_registros(entrada, formato), estatisticas):
+                saida.write(json.dumps(mudanca, ensure_ascii=False) + '\n')
+        finally:
+            if saida is not sys.stdout:
+                saida.close()
+
+    print(f"✅ {estatisticas['registros']} registros, {estatisticas['candidatos']} reavaliados, "
+          f"{estatisticas['mudancas']} mudanças em {time.perf_counter() - inicio:.1f}s "
+          f"(bancos alterados: {', '.join(estatisticas['bancos_alterados']) or 'nenhum'})",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de regras de portabilidade INSS
+Núcleo sem dependência de framework web: usado pela aplicação Flask, pelo
+lote, pela reavaliação e pelos scripts de linha de comando
+"""
+
+from bisect import bisect_left, bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+
+from cache import CacheTTL
+from catalogo import CatalogoBancos
+import mapa_elegibilidade
+import ranking
+from colunar import TabelaColunar
+from config import CACHE_CONFIG, PERFORMANCE_CONFIG
+from fonte_regras import carregar_regras, regras_do_config, versao_regras
+from validacao import CAMPOS_REGRAS, ConsultaCliente, validar_consulta, validar_cpf
+
+# Regras aplicadas a bancos sem regra específica
+REGRA_BANCO_PADRAO = regras_do_config()['regras']['regra_banco_padrao']
+
+
+class TabelaRegras:
+    """Regras dos bancos compiladas em faixas de idade e parcelas
+
+    Cada modo (geral e invalidez) guarda os cortes distintos de idade_maxima
+    e parcelas_minimas; a posição da idade e das parcelas do cliente nesses
+    cortes (bisect) aponta para a tupla pré-calculada de bancos elegíveis, já
+    na ordem do catálogo. Uma consulta faz duas buscas binárias em vez de
+    percorrer todos os bancos. Com um MapaElegibilidade compilado para as
+    mesmas regras, a busca vira um acesso ao bitset do cliente no mapa.
+    Tudo é montado uma vez, em tuplas que não mudam depois: com o preload do
+    gunicorn, os workers herdam essas páginas do master e as compartilham.
+    """
+
+    def __init__(self, catalogo, regras, mapa=None):
+        # Decimal(float) é exato: as comparações ficam idênticas às
+        # comparações Decimal x float feitas pelas regras originais
+        self.saldo_minimo = Decimal(regras['saldo_minimo'])
+        self.troco_minimo = Decimal(regras['troco_minimo'])
+
+        # Bancos bloqueados já ficam fora dos grupos do catálogo
+        geral = [
+            (banco.nome, banco.idade_maxima, banco.parcelas_minimas,
+             banco.taxa_padrao, Decimal(banco.taxa_padrao))
+            for banco in catalogo.disponiveis
+        ]
+        invalidez = [
+            (banco.nome, banco.idade_maxima, regras['parcelas_minimas']['invalidez'],
+             banco.taxa_padrao, Decimal(banco.taxa_padrao))
+            for banco in catalogo.aceitam_invalidez
+        ]
+
+        self.geral = self._compilar_faixas(geral)
+        self.invalidez = self._compilar_faixas(invalidez)
+
+        # Por modo, a entrada de cada posição de catalogo.disponiveis, para
+        # decodificar os bitsets do mapa (uma vez por bitset distinto)
+        limiar_invalidez = regras['parcelas_minimas']['invalidez'] + 5
+        self._entradas = (
+            tuple((banco.nome, banco.parcelas_minimas + 5, banco.taxa_padrao, Decimal(banco.taxa_padrao))
+                  for banco in catalogo.disponiveis),
+            tuple((banco.nome, limiar_invalidez, banco.taxa_padrao, Decimal(banco.taxa_padrao))
+                  for banco in catalogo.disponiveis)
+        )
+        self.mapa = mapa
+        self._grupos = ({}, {})
+
+    @staticmethod
+    def _compilar_faixas(entradas):
+        """Gera (cortes_idade, cortes_parcelas, faixas, por_taxa) para um modo
+
+        por_taxa[i][j] tem as posições em ordem de taxa e as taxas padrão dos
+        bancos de faixas[i][j], para o ranking (ranking.selecionar).
+        """
+        cortes_idade = tuple(sorted({idade_maxima for _, idade_maxima, _, _, _ in entradas}))
+        cortes_parcelas = tuple(sorted({parcelas for _, _, parcelas, _, _ in entradas}))
+
+        faixas = []
+        for i in range(len(cortes_idade) + 1):
+            linha = []
+            for j in range(len(cortes_parcelas) + 1):
+                if i == len(cortes_idade) or j == 0:
+                    linha.append(())
+                    continue
+                linha.append(tuple(
+                    (banco, parcelas + 5, taxa_padrao, taxa_decimal)
+                    for banco, idade_maxima, parcelas, taxa_padrao, taxa_decimal in entradas
+                    if idade_maxima >= cortes_idade[i] and parcelas <= cortes_parcelas[j - 1]
+                ))
+            faixas.append(tuple(linha))
+        por_taxa = tuple(
+            tuple((ranking.posicoes_por_taxa(taxas), taxas)
+                  for taxas in (tuple(taxa_padrao for _, _, taxa_padrao, _ in faixa) for faixa in linha))
+            for linha in faixas
+        )
+        faixas = tuple(faixas)
+        return cortes_idade, cortes_parcelas, faixas, por_taxa
+
+    def _grupo(self, bitset, is_invalidez):
+        """(elegíveis, ordem por taxa) de um bitset do mapa"""
+        grupo = self._grupos[is_invalidez].get(bitset)
+        if grupo is None:
+            bits = int.from_bytes(bitset, 'little')
+            elegiveis = tuple(
+                entrada for posicao, entrada in enumerate(self._entradas[is_invalidez]) if bits >> posicao & 1
+            )
+            taxas = tuple(taxa_padrao for _, _, taxa_padrao, _ in elegiveis)
+            grupo = self._grupos[is_invalidez][bitset] = (elegiveis, (ranking.posicoes_por_taxa(taxas), taxas))
+        return grupo
+
+    def elegiveis(self, idade, parcelas_pagas, is_invalidez):
+        """Retorna os bancos que atendem idade, parcelas e tipo de benefício (pelas faixas)"""
+        cortes_idade, cortes_parcelas, faixas, _ = self.invalidez if is_invalidez else self.geral
+        return faixas[bisect_left(cortes_idade, idade)][bisect_right(cortes_parcelas, parcelas_pagas)]
+
+    def avaliar(self, idade, parcelas_pagas, is_invalidez, saldo_devedor, valor_total, taxa,
+                top=None, ordem='catalogo'):
+        """Avalia um cliente com os valores já convertidos
+
+        Com `top` e/ou ordem='taxa', só os melhores bancos são selecionados
+        (ranking.selecionar), antes de montar os resultados.
+        """
+        # Regras globais: rejeitam antes de olhar qualquer banco
+        if saldo_devedor < self.saldo_minimo:
+            return []
+        troco = valor_total - saldo_devedor
+        if troco < self.troco_minimo:
+            return []
+
+        # Bancos elegíveis pelo mapa; fora do domínio dele (ou sem mapa), pelas faixas
+        bitset = None if self.mapa is None else self.mapa.bitset(idade, parcelas_pagas, is_invalidez)
+        if bitset is not None:
+            elegiveis, ordem_taxa = self._grupos[is_invalidez].get(bitset) or self._grupo(bitset, is_invalidez)
+        else:
+            cortes_idade, cortes_parcelas, faixas, por_taxa = self.invalidez if is_invalidez else self.geral
+            i = bisect_left(cortes_idade, idade)
+            j = bisect_right(cortes_parcelas, parcelas_pagas)
+            elegiveis, ordem_taxa = faixas[i][j], por_taxa[i][j]
+        if not elegiveis:
+            return []
+
+        # Determinar tipo de operação
+        tipo_operacao = "Portabilidade"
+        if troco > 0:
+            tipo_operacao = "Port+Refin"
+
+        # Taxa aplicável: menor entre a taxa do banco e a do cliente + 0,5
+        taxa_cliente = taxa + Decimal('0.5')
+        taxa_cliente_float = float(taxa_cliente)
+        if top is not None or ordem != 'catalogo':
+            elegiveis = ranking.selecionar(elegiveis, *ordem_taxa, taxa_cliente_float, top, ordem)
+
+        # Observações comuns a todos os bancos desta consulta
+        observacoes = []
+        if is_invalidez:
+            observacoes.append("Benefício por invalidez")
+        if troco > 0:
+            observacoes.append(f"Refinanciamento de R$ {troco:.2f}")
+        observacoes_padrao = '; '.join(observacoes) if observacoes else "Regras atendidas"
+        observacoes_historico = '; '.join(observacoes + ["Cliente com histórico positivo"])
+
+        return [
+            {
+                'banco': banco,
+                'tipo_operacao': tipo_operacao,
+                'taxa_aplicavel': taxa_cliente_float if taxa_cliente < taxa_decimal else taxa_padrao,
+                'observacoes': observacoes_historico if parcelas_pagas >= limiar_historico else observacoes_padrao
+            }
+            for banco, limiar_historico, taxa_padrao, taxa_decimal in elegiveis
+        ]
+
+
+def catalogo_do_conjunto(conjunto):
+    """Catálogo de bancos, com a regra efetiva de cada um, de um conjunto de regras"""
+    return CatalogoBancos(
+        conjunto['bancos'],
+        conjunto['regras']['bancos_bloqueados'],
+        conjunto['regras_bancos'],
+        conjunto['regras'].get('regra_banco_padrao', REGRA_BANCO_PADRAO)
+    )
+
+
+class RegrasPortabilidadeINSS:
+    def __init__(self, conjunto=None):
+        # Cache de resultados para consultas repetidas
+        self.cache = None
+        if CACHE_CONFIG['enabled'] and PERFORMANCE_CONFIG['enable_caching']:
+            self.cache = CacheTTL(CACHE_CONFIG['max_size'], CACHE_CONFIG['ttl'])
+
+        # Bancos, regras gerais e regras por banco (config.py ou arquivo externo)
+        self.aplicar_regras(conjunto or carregar_regras())
+
+    def validar_dados(self, dados):
+        """Valida os dados de entrada"""
+        return validar_consulta(dados)[1]
+
+    def validar_cpf(self, cpf):
+        """Valida formato do CPF"""
+        return validar_cpf(cpf)
+
+    def aplicar_regras(self, conjunto):
+        """Compila um novo conjunto de regras e o coloca em uso
+
+        A tabela é compilada antes da troca; consultas em andamento continuam
+        usando a tabela anterior até terminarem.
+        """
+        catalogo = catalogo_do_conjunto(conjunto)
+        versao = versao_regras(conjunto)
+        # Mapa pré-compilado desta versão (python mapa_elegibilidade.py), se houver
+        tabela = TabelaRegras(catalogo, conjunto['regras'], mapa_elegibilidade.carregar(versao, catalogo))
+        self.catalogo = catalogo
+        self.bancos = list(catalogo.nomes)
+        self.regras = conjunto['regras']
+        self.regras_bancos = conjunto['regras_bancos']
+        self.versao = versao
+        self.tabela_colunar = TabelaColunar(catalogo, conjunto['regras'])
+        self.tabela = tabela
+        if self.cache is not None:
+            self.cache.limpar()
+        return tabela
+
+    def compilar_regras(self):
+        """Recompila a tabela de regras após alterar bancos ou regras"""
+        # Bancos já catalogados mantêm o código; nomes novos viram o próprio código
+        bancos = []
+        for nome in self.bancos:
+            banco = self.catalogo.por_nome.get(nome)
+            bancos.append({'codigo': banco.codigo, 'nome': nome} if banco else nome)
+        return self.aplicar_regras({
+            'bancos': bancos,
+            'regras': self.regras,
+            'regras_bancos': self.regras_bancos
+        })
+
+    def consultar_colunar(self, lote, top=None, ordem='catalogo'):
+        """Avalia um LoteColunar inteiro: gera (linha, resultados) por cliente"""
+        return self.tabela_colunar.avaliar(lote, top, ordem)
+
+    def consultar_portabilidade(self, dados, top=None, ordem='catalogo'):
+        """Consulta portabilidade baseada nas regras
+
+        Aceita a ConsultaCliente gerada por validar_consulta (sem nova
+        conversão dos campos) ou o dict de dados do formulário. Com `top`
+        e/ou ordem='taxa', retorna só os melhores bancos (ver ranking.py).
+        """
+        # Apenas os campos que influenciam as regras, já normalizados
+        if isinstance(dados, ConsultaCliente):
+            chave = dados[:CAMPOS_REGRAS]
+        else:
+            chave = (
+                int(dados['idade']),
+                int(dados['parcelas_pagas']),
+                "invalidez" in dados.get('codigo_beneficio', '').lower(),
+                Decimal(str(dados['saldo_devedor'])),
+                Decimal(str(dados['valor_total'])),
+                Decimal(str(dados['taxa']))
+            )
+        
+        tabela = self.tabela
+        if self.cache is None:
+            return tabela.avaliar(*chave, top, ordem)
+
+        # Rankings diferentes do mesmo cliente ficam em entradas separadas
+        if top is not None or ordem != 'catalogo':
+            chave = (*chave, top, ordem)
+        
+        # O resultado guardado só vale para a tabela que o calculou
+        em_cache = self.cache.obter(chave)
+        if em_cache is not None and em_cache[0] is tabela:
+            resultados = em_cache[1]
+        else:
+            resultados = tabela.avaliar(*chave[:CAMPOS_REGRAS], top, ordem)
+            self.cache.guardar(chave, (tabela, resultados))
+        
+        # Cópias, para que alterações de quem chama não afetem o cache
+        return [dict(resultado) for resultado in resultados]
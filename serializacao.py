@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serialização das respostas JSON da consulta
+Usa o orjson quando instalado (ou o json da biblioteca padrão) e oferece o
+formato colunar, em que cada campo dos resultados vira uma lista
+"""
+
+import json
+
+from flask import Response
+
+from config import PERFORMANCE_CONFIG
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele, json da biblioteca padrão
+    orjson = None
+
+FORMATOS = ('linhas', 'colunar')
+CAMPOS_RESULTADO = ('banco', 'tipo_operacao', 'taxa_aplicavel', 'observacoes')
+
+
+def _dumps_json(dados):
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _escolher_backend(nome):
+    """Retorna (nome, função que gera bytes) para 'auto', 'orjson' ou 'json'"""
+    if nome == 'orjson' and orjson is None:
+        raise RuntimeError("orjson não instalado: use serializador 'json' ou 'auto'")
+    if nome in ('auto', 'orjson') and orjson is not None:
+        return 'orjson', orjson.dumps
+    return 'json', _dumps_json
+
+
+BACKEND, dumps = _escolher_backend(PERFORMANCE_CONFIG.get('serializador', 'auto'))
+
+
+def colunar(resultados):
+    """Converte a lista de resultados em {campo: [valores]}"""
+    campos = CAMPOS_RESULTADO
+    if resultados and 'projecoes' in resultados[0]:
+        campos += ('projecoes',)
+    return {campo: [resultado[campo] for resultado in resultados] for campo in campos}
+
+
+def resposta_consulta(resultados, formato='linhas'):
+    """Resposta do /consultar; o formato 'linhas' é o usado pelo script.js"""
+    return resposta_json({
+        'erro': False,
+        'resultados': colunar(resultados) if formato == 'colunar' else resultados,
+        'total_bancos': len(resultados)
+    })
+
+
+def resposta_json(dados, status=200):
+    """Response JSON serializada pelo backend configurado"""
+    return Response(dumps(dados), status=status, mimetype='application/json')
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modo de serviço da aplicação web
+Aplica o PERFORMANCE_CONFIG a cada requisição: limite de requisições
+simultâneas (503 imediato quando lotado), prazo por requisição e compressão
+gzip/brotli das respostas JSON
+"""
+
+import gzip
+import threading
+import time
+import zlib
+
+from flask import g, jsonify, request
+
+from config import PERFORMANCE_CONFIG
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele, apenas gzip
+    brotli = None
+
+TIPOS_COMPRIMIDOS = ('application/json', 'application/x-ndjson')
+
+
+def prazo_esgotado():
+    """True se a requisição atual já passou do request_timeout"""
+    prazo = g.get('prazo')
+    return prazo is not None and time.monotonic() > prazo
+
+
+def _codificacao_aceita(aceitas):
+    """Escolhe br ou gzip conforme o Accept-Encoding do cliente"""
+    if brotli is not None and aceitas['br']:
+        return 'br'
+    if aceitas['gzip']:
+        return 'gzip'
+    return None
+
+
+def _comprimir_fluxo(partes, codificacao, nivel):
+    """Comprime uma resposta em streaming, enviando cada parte assim que pronta"""
+    if codificacao == 'br':
+        compressor = brotli.Compressor(quality=min(nivel, 11))
+        for parte in partes:
+            if isinstance(parte, str):
+                parte = parte.encode('utf-8')
+            dados = compressor.process(parte) + compressor.flush()
+            if dados:
+                yield dados
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # 31: formato gzip
+    for parte in partes:
+        if isinstance(parte, str):
+            parte = parte.encode('utf-8')
+        dados = compressor.compress(parte) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+
+def configurar_servico(app, configuracao=None):
+    """Registra na app os limites e a compressão do PERFORMANCE_CONFIG"""
+    configuracao = configuracao or PERFORMANCE_CONFIG
+    vagas = threading.BoundedSemaphore(configuracao['max_concurrent_requests'])
+    tempo_limite = configuracao['request_timeout']
+    comprimir = configuracao['enable_compression']
+    tamanho_minimo = configuracao.get('compression_min_size', 500)
+    nivel = configuracao.get('compression_level', 6)
+    retry_after = str(configuracao.get('retry_after', 1))
+
+    @app.before_request
+    def reservar_vaga():
+        # Sem espera: com todas as vagas ocupadas, o cliente recebe 503 na hora
+        if not vagas.acquire(blocking=False):
+            resposta = jsonify({'erro': True, 'mensagens': ["Servidor ocupado, tente novamente em instantes"]})
+            resposta.status_code = 503
+            resposta.headers['Retry-After'] = retry_after
+            return resposta
+        g.vaga = True
+        g.prazo = time.monotonic() + tempo_limite
+
+    @app.teardown_request
+    def liberar_vaga(_erro=None):
+        # Em respostas com stream_with_context, roda só ao fim do stream
+        if g.pop('vaga', False):
+            vagas.release()
+
+    if not comprimir:
+        return app
+
+    @app.after_request
+    def comprimir_resposta(resposta):
+        if (resposta.mimetype not in TIPOS_COMPRIMIDOS
+                or 'Content-Encoding' in resposta.headers
+                or resposta.status_code < 200):
+            return resposta
+        resposta.vary.add('Accept-Encoding')
+
+        codificacao = _codificacao_aceita(request.accept_encodings)
+        if codificacao is None:
+            return resposta
+
+        if resposta.is_streamed:
+            resposta.response = _comprimir_fluxo(resposta.response, codificacao, nivel)
+            resposta.headers.pop('Content-Length', None)
+        else:
+            dados = resposta.get_data()
+            if len(dados) < tamanho_minimo:
+                return resposta
+            if codificacao == 'br':
+                resposta.set_data(brotli.compress(dados, quality=min(nivel, 11)))
+            else:
+                resposta.set_data(gzip.compress(dados, compresslevel=nivel, mtime=0))
+        resposta.headers['Content-Encoding'] = codificacao
+        return resposta
+
+    return app
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulação de cenários ("e se") para um cliente
+Em vez de reavaliar o cliente em cada ponto, usa os limites das regras: com
+idade e tipo de benefício fixos, cada banco exige um mínimo de parcelas
+pagas, o troco mínimo define um valor total mínimo comum a todos os bancos e
+a taxa só muda a taxa aplicável, que passa a ser a do banco a partir de um
+ponto. Cada eixo é resolvido com uma busca binária por banco, de modo que
+uma varredura de 1000 pontos custa o mesmo que uma consulta.
+"""
+
+from bisect import bisect_left
+from decimal import Decimal
+
+from config import SIMULACAO_CONFIG
+from validacao import _PARCELAS_MAX, _PARCELAS_MIN, _TAXA, _VALORES, CAMPOS_REGRAS, validar_consulta
+
+# Eixos que podem variar na simulação; os demais campos ficam fixos
+EIXOS = ('parcelas_pagas', 'valor_total', 'taxa')
+
+# (mínimo, máximo, quantum) de cada eixo: os mesmos limites de validar_consulta
+_LIMITES_EIXOS = {
+    'parcelas_pagas': (Decimal(_PARCELAS_MIN), Decimal(_PARCELAS_MAX), Decimal(1)),
+    'valor_total': _VALORES[:3],
+    'taxa': _TAXA[:3]
+}
+
+
+def pontos_faixa(faixa, limites, inteiro=False):
+    """Pontos de uma faixa {'de', 'ate', 'passo'} (passo padrão 1)
+
+    `limites` são os (mínimo, máximo, quantum) que validar_consulta aplica ao
+    campo: a faixa inteira deve caber neles, e 'de' e 'passo' devem ser
+    múltiplos do quantum para que todos os pontos também sejam.
+    Retorna (pontos, None) ou (None, mensagem de erro).
+    """
+    minimo, maximo, quantum = limites
+    try:
+        de, ate = Decimal(str(faixa['de'])), Decimal(str(faixa['ate']))
+        passo = Decimal(str(faixa.get('passo', 1)))
+        if passo <= 0 or ate < de:
+            return None, "deve ter de <= ate e passo positivo"
+        if de != de.quantize(quantum) or passo != passo.quantize(quantum):
+            if inteiro:
+                return None, "deve ter 'de' e 'passo' inteiros"
+            return None, f"deve ter 'de' e 'passo' com no máximo {-quantum.as_tuple().exponent} casas decimais"
+        quantidade = int((ate - de) // passo) + 1
+    except (KeyError, TypeError, AttributeError, ValueError, ArithmeticError):
+        return None, "deve ter 'de', 'ate' e 'passo' numéricos"
+    if de < minimo or ate > maximo:
+        return None, f"deve ficar entre {minimo.normalize():f} e {maximo.normalize():f}"
+    if quantidade > SIMULACAO_CONFIG['pontos_maximos']:
+        return None, f"tem mais de {SIMULACAO_CONFIG['pontos_maximos']} pontos"
+    pontos = [de + passo * i for i in range(quantidade)]
+    return ([int(ponto) for ponto in pontos] if inteiro else pontos), None
+
+
+def ler_simulacao(dados):
+    """Valida o corpo {'cliente': {...}, 'faixas': {eixo: {...}}} do /simular
+
+    Retorna (consulta, pontos por eixo, erros). Eixos sem faixa ficam com o
+    valor atual do cliente como único ponto.
+    """
+    if not isinstance(dados, dict) or not isinstance(dados.get('cliente'), dict):
+        return None, None, ["Informe os dados do cliente em 'cliente'"]
+    faixas = dados.get('faixas') or {}
+    if not isinstance(faixas, dict):
+        return None, None, ["'faixas' deve ser um objeto"]
+
+    # Mesmo formato do formulário: todos os campos como texto
+    cliente = {chave: valor if isinstance(valor, str) else str(valor)
+               for chave, valor in dados['cliente'].items()}
+    consulta, erros = validar_consulta(cliente)
+    if erros:
+        return None, None, erros
+
+    atuais = {
+        'parcelas_pagas': consulta.parcelas_pagas,
+        'valor_total': consulta.valor_total,
+        'taxa': consulta.taxa
+    }
+    pontos = {}
+    for eixo in EIXOS:
+        if eixo not in faixas:
+            pontos[eixo] = [atuais[eixo]]
+            continue
+        pontos[eixo], erro = pontos_faixa(faixas[eixo], _LIMITES_EIXOS[eixo],
+                                             inteiro=eixo == 'parcelas_pagas')
+        if erro:
+            erros.append(f"Faixa de {eixo} {erro}")
+    desconhecidos = sorted(set(faixas) - set(EIXOS))
+    if desconhecidos:
+        erros.append(f"Faixas desconhecidas: {', '.join(desconhecidos)}")
+    return (None, None, erros) if erros else (consulta, pontos, [])
+
+
+def _vetor(total, inicio):
+    """[False] * inicio + [True] * (total - inicio)"""
+    return [False] * inicio + [True] * (total - inicio)
+
+
+def simular(regras, consulta, pontos):
+    """Superfície de elegibilidade de cada banco nos pontos de cada eixo
+
+    Com idade, benefício e saldo fixos, um banco é elegível no ponto
+    (parcelas_pagas[i], valor_total[j]) se, e somente se,
+    bancos[b]['elegivel_parcelas'][i] e elegivel_valor_total[j]; a taxa
+    aplicável depende só da taxa (bancos[b]['taxa_aplicavel'][k]).
+    Os resultados são os mesmos de avaliar cada ponto com a TabelaRegras.
+    """
+    idade, parcelas, invalidez, saldo, valor_total, taxa = consulta[:CAMPOS_REGRAS]
+    tabela, catalogo = regras.tabela, regras.catalogo
+    pontos_parcelas, pontos_valor, pontos_taxa = (pontos[eixo] for eixo in EIXOS)
+
+    # Regras globais: saldo mínimo (fixo) e troco mínimo (valor total mínimo)
+    saldo_atendido = saldo >= tabela.saldo_minimo
+    valor_total_minimo = saldo + tabela.troco_minimo
+    inicio_valor = bisect_left(pontos_valor, valor_total_minimo) if saldo_atendido else len(pontos_valor)
+
+    # Taxa aplicável: a do cliente (taxa + 0,5) enquanto for menor que a do banco
+    taxas_cliente = [ponto + Decimal('0.5') for ponto in pontos_taxa]
+    taxas_cliente_float = [float(taxa_cliente) for taxa_cliente in taxas_cliente]
+    parcelas_invalidez = regras.regras['parcelas_minimas']['invalidez']
+
+    bancos = []
+    for banco in catalogo.disponiveis:
+        aceita = idade <= banco.idade_maxima and (banco.aceita_invalidez or not invalidez)
+        minimas = parcelas_invalidez if invalidez else banco.parcelas_minimas
+        inicio_parcelas = bisect_left(pontos_parcelas, minimas) if aceita else len(pontos_parcelas)
+        limite_taxa = bisect_left(taxas_cliente, Decimal(banco.taxa_padrao))
+        taxas_banco = [banco.taxa_padrao] * (len(pontos_taxa) - limite_taxa)
+        bancos.append({
+            'banco': banco.nome,
+            'aceita': aceita,
+            'parcelas_minimas': minimas if aceita else None,
+            'parcelas_faltantes': max(minimas - parcelas, 0) if aceita else None,
+            'historico_positivo_a_partir_de': minimas + 5 if aceita else None,
+            'elegivel': aceita and saldo_atendido and parcelas >= minimas and valor_total >= valor_total_minimo,
+            'elegivel_parcelas': _vetor(len(pontos_parcelas), inicio_parcelas),
+            'taxa_aplicavel': taxas_cliente_float[:limite_taxa] + taxas_banco
+        })
+
+    return {
+        'erro': False,
+        'parcelas_pagas': pontos_parcelas,
+        'valor_total': [float(ponto) for ponto in pontos_valor],
+        'taxa': [float(ponto) for ponto in pontos_taxa],
+        'saldo_minimo_atendido': saldo_atendido,
+        'valor_total_minimo': float(valor_total_minimo),
+        'elegivel_valor_total': _vetor(len(pontos_valor), inicio_valor),
+        'bancos': bancos
+    }
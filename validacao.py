@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validação dos dados de consulta de portabilidade
+Converte cada campo uma única vez para um objeto tipado e imutável
+(ConsultaCliente), aplicando os limites declarados em VALIDACAO_CONFIG
+"""
+
+import re
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple
+
+from config import VALIDACAO_CONFIG
+
+# NumPy é opcional e só é importado no primeiro lote de CPFs (ver _numpy):
+# scripts e workers que não validam colunas não pagam o custo do import
+np = None
+_NUMPY_DISPONIVEL = None
+
+_NAO_DIGITOS = re.compile(r'[^0-9]')
+
+# Limites do VALIDACAO_CONFIG lidos uma única vez
+_CPF_MIN = VALIDACAO_CONFIG['CPF']['min_length']
+_CPF_MAX = VALIDACAO_CONFIG['CPF']['max_length']
+_NOME_MIN = VALIDACAO_CONFIG['NOME']['min_length']
+_NOME_MAX = VALIDACAO_CONFIG['NOME']['max_length']
+_IDADE_MIN = VALIDACAO_CONFIG['IDADE']['min']
+_IDADE_MAX = VALIDACAO_CONFIG['IDADE']['max']
+_CODIGO_BENEFICIO_MIN = VALIDACAO_CONFIG['CODIGO_BENEFICIO']['min_length']
+_CODIGO_BENEFICIO_MAX = VALIDACAO_CONFIG['CODIGO_BENEFICIO']['max_length']
+_PARCELAS_MIN = VALIDACAO_CONFIG['PARCELAS_PAGAS']['min']
+_PARCELAS_MAX = VALIDACAO_CONFIG['PARCELAS_PAGAS']['max']
+
+
+def _limites_decimais(limites):
+    """(mínimo, máximo, quantum, casas) de um campo decimal"""
+    return (
+        Decimal(str(limites['min'])),
+        Decimal(str(limites['max'])),
+        Decimal(1).scaleb(-limites['decimals']),
+        limites['decimals']
+    )
+
+
+_VALORES = _limites_decimais(VALIDACAO_CONFIG['VALORES'])
+_TAXA = _limites_decimais(VALIDACAO_CONFIG['TAXA'])
+
+_CAMPOS_DECIMAIS = (
+    ('valor_parcela', "Valor da parcela", _VALORES),
+    ('saldo_devedor', "Saldo devedor", _VALORES),
+    ('valor_total', "Valor total", _VALORES),
+    ('taxa', "Taxa", _TAXA)
+)
+
+
+class ConsultaCliente(NamedTuple):
+    """Dados de uma consulta já validados e convertidos
+
+    Os seis primeiros campos são os que influenciam as regras, na ordem dos
+    argumentos de TabelaRegras.avaliar (consulta[:CAMPOS_REGRAS]).
+    """
+    idade: int
+    parcelas_pagas: int
+    invalidez: bool
+    saldo_devedor: Decimal
+    valor_total: Decimal
+    taxa: Decimal
+    nome: str
+    cpf: str
+    codigo_beneficio: str
+    banco_atual: str
+    valor_parcela: Decimal
+
+
+CAMPOS_REGRAS = 6
+
+
+_TRINCAS = [f"{numero:03d}" for numero in range(1000)]
+
+
+def _tabela_cpf(inicio):
+    """Somas ponderadas dos dois dígitos verificadores para cada trinca
+
+    Para os dígitos nas posições inicio..inicio+2, guarda as duas somas em um
+    só inteiro (soma do 1º DV << 10 | soma do 2º DV); as somas nunca passam
+    de 1023, então as três parcelas podem ser somadas sem misturar os campos.
+    """
+    # Peso de cada posição já deslocado: 1º DV usa 10-i, 2º DV usa 11-i
+    pesos = [(10 - i << 10) + 11 - i for i in range(inicio, inicio + 3)]
+    return dict(zip(_TRINCAS, [
+        a * pesos[0] + b * pesos[1] + c * pesos[2]
+        for a in range(10) for b in range(10) for c in range(10)
+    ]))
+
+
+_CPF_TRINCA_1 = _tabela_cpf(0)
+_CPF_TRINCA_2 = _tabela_cpf(3)
+_CPF_TRINCA_3 = _tabela_cpf(6)
+
+
+def _numpy():
+    """Importa o NumPy na primeira chamada; False se não estiver instalado"""
+    global np, _NUMPY_DISPONIVEL, _PESOS_DV1, _PESOS_DV2
+    if _NUMPY_DISPONIVEL is None:
+        try:
+            import numpy
+        except ImportError:
+            _NUMPY_DISPONIVEL = False
+        else:
+            np = numpy
+            _PESOS_DV1 = np.arange(10, 1, -1)
+            _PESOS_DV2 = np.arange(11, 1, -1)
+            _NUMPY_DISPONIVEL = True
+    return _NUMPY_DISPONIVEL
+
+
+_PESOS_DV1 = _PESOS_DV2 = None
+
+
+def _digitos_verificadores_ok(cpf):
+    """Confere os dois dígitos verificadores (módulo 11) de 11 dígitos"""
+    somas = _CPF_TRINCA_1[cpf[:3]] + _CPF_TRINCA_2[cpf[3:6]] + _CPF_TRINCA_3[cpf[6:9]]
+    dv1 = (somas >> 10) * 10 % 11 % 10
+    dv2 = ((somas & 1023) + 2 * dv1) * 10 % 11 % 10
+    return cpf[9] == str(dv1) and cpf[10] == str(dv2)
+
+
+def normalizar_cpf(cpf):
+    """Retorna os 11 dígitos do CPF, ou None se o CPF for inválido"""
+    if not _CPF_MIN <= len(cpf) <= _CPF_MAX:
+        return None
+    if not (cpf.isdigit() and cpf.isascii()):
+        cpf = _NAO_DIGITOS.sub('', cpf)
+    if len(cpf) != 11:
+        return None
+    if cpf == cpf[0] * 11:
+        return None
+    if not _digitos_verificadores_ok(cpf):
+        return None
+    return cpf
+
+
+def validar_cpf(cpf):
+    """Valida o CPF, incluindo os dígitos verificadores"""
+    return normalizar_cpf(cpf) is not None
+
+
+def _normalizar_cpfs_numpy(cpfs):
+    """Versão vetorizada de normalizar_cpf para uma coluna inteira"""
+    cpfs = list(cpfs)
+    if all(isinstance(cpf, str) and len(cpf) == 11 for cpf in cpfs):
+        # Caso comum em arquivos de carteira: a coluna já vem só com dígitos
+        candidatos = cpfs
+        texto = ''.join(cpfs)
+        if not (texto.isdigit() and texto.isascii()):
+            candidatos = None
+    else:
+        candidatos = None
+
+    if candidatos is None:
+        candidatos = []
+        for cpf in cpfs:
+            cpf = cpf or ''
+            if not _CPF_MIN <= len(cpf) <= _CPF_MAX:
+                candidatos.append(None)
+                continue
+            if not (cpf.isdigit() and cpf.isascii()):
+                cpf = _NAO_DIGITOS.sub('', cpf)
+            candidatos.append(cpf if len(cpf) == 11 else None)
+        texto = ''.join(cpf for cpf in candidatos if cpf is not None)
+
+    if not texto:
+        return [None] * len(candidatos)
+
+    # Uma matriz uint8 (N x 11) com os dígitos de todos os candidatos
+    digitos = (np.frombuffer(texto.encode('ascii'), dtype=np.uint8) - 48).reshape(-1, 11)
+    digitos = digitos.astype(np.int32)
+    dv1 = (digitos[:, :9] @ _PESOS_DV1) * 10 % 11 % 10
+    dv2 = (digitos[:, :9] @ _PESOS_DV2[:9] + 2 * dv1) * 10 % 11 % 10
+    validos = iter((
+        (digitos[:, 9] == dv1)
+        & (digitos[:, 10] == dv2)
+        & ~(digitos == digitos[:, :1]).all(axis=1)
+    ).tolist())
+
+    return [cpf if cpf is not None and next(validos) else None for cpf in candidatos]
+
+
+def normalizar_cpfs(cpfs):
+    """Normaliza e valida uma coluna de CPFs de uma só vez
+
+    Retorna uma lista alinhada com a entrada: os 11 dígitos de cada CPF
+    válido ou None. Usa NumPy quando disponível.
+    """
+    if _numpy():
+        return _normalizar_cpfs_numpy(cpfs)
+    return [normalizar_cpf(cpf) if cpf else None for cpf in cpfs]
+
+
+def validar_cpfs(cpfs):
+    """Retorna uma lista de bool indicando quais CPFs da coluna são válidos"""
+    return [cpf is not None for cpf in normalizar_cpfs(cpfs)]
+
+
+def _inteiro(valor):
+    """Converte texto só com dígitos (0-9) para int; None se inválido"""
+    texto = valor if isinstance(valor, str) else str(valor)
+    if texto.isdigit() and texto.isascii():
+        return int(texto)
+    return None
+
+
+def _erro_decimal(valor, rotulo, limites):
+    """Mensagem de erro de um valor decimal rejeitado"""
+    minimo, maximo, quantum, casas = limites
+    try:
+        numero = Decimal(valor if isinstance(valor, str) else str(valor))
+        if numero.is_nan():
+            raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        return "Taxa inválida" if limites is _TAXA else f"{rotulo} inválido"
+
+    if limites is _TAXA:
+        if numero < minimo or numero > maximo:
+            return f"{rotulo} deve ser entre {minimo.normalize():f} e {maximo.normalize():f}%"
+    elif numero <= 0:
+        return f"{rotulo} deve ser maior que zero"
+    elif numero > maximo:
+        return f"{rotulo} deve ser no máximo {maximo}"
+    return f"{rotulo} deve ter no máximo {casas} casas decimais"
+
+
+_CPF_NAO_VERIFICADO = object()
+
+
+def validar_consulta(dados, cpf=_CPF_NAO_VERIFICADO):
+    """Valida e converte os dados de entrada
+
+    Retorna (consulta, erros): a ConsultaCliente quando não há erros, ou
+    None e a lista de mensagens de erro. Em lote, `cpf` recebe o valor já
+    calculado por normalizar_cpfs (os 11 dígitos ou None) para não repetir
+    a verificação.
+    """
+    erros = []
+    obter = dados.get
+
+    nome = obter('nome') or ''
+    if len(nome.strip()) < _NOME_MIN:
+        erros.append(f"Nome deve ter pelo menos {_NOME_MIN} caracteres")
+    elif len(nome) > _NOME_MAX:
+        erros.append(f"Nome deve ter no máximo {_NOME_MAX} caracteres")
+
+    if cpf is _CPF_NAO_VERIFICADO:
+        cpf = obter('cpf')
+        cpf = normalizar_cpf(cpf) if cpf else None
+    if cpf is None:
+        erros.append("CPF inválido")
+
+    idade = _inteiro(obter('idade'))
+    if idade is None or not _IDADE_MIN <= idade <= _IDADE_MAX:
+        erros.append(f"Idade deve ser entre {_IDADE_MIN} e {_IDADE_MAX} anos")
+
+    codigo_beneficio = obter('codigo_beneficio') or ''
+    if len(codigo_beneficio) < _CODIGO_BENEFICIO_MIN:
+        erros.append("Código do benefício é obrigatório")
+    elif len(codigo_beneficio) > _CODIGO_BENEFICIO_MAX:
+        erros.append(f"Código do benefício deve ter no máximo {_CODIGO_BENEFICIO_MAX} caracteres")
+
+    parcelas = _inteiro(obter('parcelas_pagas'))
+    if parcelas is None or parcelas < _PARCELAS_MIN:
+        erros.append("Quantidade de parcelas pagas deve ser um número positivo")
+    elif parcelas > _PARCELAS_MAX:
+        erros.append(f"Quantidade de parcelas pagas deve ser no máximo {_PARCELAS_MAX}")
+
+    banco_atual = obter('banco_atual')
+    if not banco_atual:
+        erros.append("Banco atual é obrigatório")
+
+    # Valores monetários e taxa: uma conversão para Decimal por campo; a
+    # mensagem detalhada só é montada quando o valor é rejeitado
+    decimais = []
+    for campo, rotulo, limites in _CAMPOS_DECIMAIS:
+        valor = obter(campo, 0)
+        minimo, maximo, quantum, _ = limites
+        try:
+            numero = Decimal(valor if isinstance(valor, str) else str(valor))
+            # Comparar NaN gera InvalidOperation
+            if minimo <= numero <= maximo and numero == numero.quantize(quantum):
+                decimais.append(numero)
+                continue
+        except (InvalidOperation, ValueError):
+            pass
+        erros.append(_erro_decimal(valor, rotulo, limites))
+        decimais.append(None)
+
+    if erros:
+        return None, erros
+
+    valor_parcela, saldo_devedor, valor_total, taxa = decimais
+    # Valores na ordem dos campos de ConsultaCliente
+    return ConsultaCliente._make((
+        idade, parcelas, "invalidez" in codigo_beneficio.lower(),
+        saldo_devedor, valor_total, taxa,
+        nome, cpf, codigo_beneficio, banco_atual, valor_parcela
+    )), erros